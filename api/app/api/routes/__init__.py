@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends
 
-from app.api.routes import accounts, auth, compliance, dashboard, fraud, graph, risk
+from app.api.routes import accounts, admin, auth, compliance, dashboard, fraud, graph, risk
 from app.utils.auth import verify_api_key
 
 api_router = APIRouter(dependencies=[Depends(verify_api_key)])
@@ -11,3 +11,4 @@ api_router.include_router(compliance.router)
 api_router.include_router(accounts.router)
 api_router.include_router(risk.router)
 api_router.include_router(graph.router)
+api_router.include_router(admin.router)
@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models.transaction import Account
+from app.utils.executors import db_executor
 
 
 def _format_volume(count: int) -> str:
@@ -25,6 +26,10 @@ router = APIRouter(prefix="/accounts", tags=["Accounts"])
 @router.get("/monitored")
 async def get_monitored_accounts(db: Session = Depends(get_db)):
     """Get monitored accounts summary"""
+    return await db_executor.run(_monitored_accounts_summary, db)
+
+
+def _monitored_accounts_summary(db: Session) -> list[dict]:
     try:
         accounts = db.query(Account).filter(Account.is_monitored.is_(True)).all()
 
@@ -73,7 +78,9 @@ async def get_monitored_accounts(db: Session = Depends(get_db)):
 @router.get("/{account_id}")
 async def get_account_details(account_id: str, db: Session = Depends(get_db)):
     """Get specific account details"""
-    account = db.query(Account).filter(Account.account_id == account_id).first()
+    account = await db_executor.run(
+        lambda: db.query(Account).filter(Account.account_id == account_id).first()
+    )
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
     return account
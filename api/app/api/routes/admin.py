@@ -0,0 +1,140 @@
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.ml_models.feature_store import feature_store
+from app.ml_models.fraud_detector import fraud_detector
+from app.models.user import User
+from app.services.alert_writer import alert_writer
+from app.services.graph_analysis import graph_updater
+from app.services.ring_detector import ring_detector
+from app.services.risk_analysis import RiskAnalysisService
+from app.services.risk_engine import risk_engine
+from app.services.shadow_scoring import ShadowScorer, shadow_scorer
+from app.services.transaction_graph import live_graph
+from app.services.transaction_ingestor import transaction_ingestor
+from app.utils.executors import PoolSaturatedError, db_executor, inference_executor
+from app.utils.logger import logger
+from app.utils.security import require_roles
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+@router.get("/executors")
+def get_executor_stats():
+    """Queue depth and throughput counters for the pools and background writers"""
+    return {
+        "executors": [db_executor.stats(), inference_executor.stats()],
+        "alert_writer": alert_writer.stats(),
+        "transaction_ingestor": transaction_ingestor.stats(),
+        "risk_engine": risk_engine.stats(),
+    }
+
+
+@router.get("/feature-store")
+def get_feature_store_stats():
+    """Size and eviction counters for the online customer feature store"""
+    return feature_store.stats()
+
+
+@router.get("/graph")
+def get_graph_stats():
+    """Size and counters of the live transaction graph and the streaming ring detector"""
+    return {
+        "live_graph": live_graph.stats(),
+        "graph_updater": graph_updater.stats(),
+        "ring_detector": ring_detector.stats(),
+    }
+
+
+@router.get("/model")
+def get_model_info():
+    """Active fraud model version in this worker and versions in the registry"""
+    registry = fraud_detector.registry
+    engine = fraud_detector.engine
+    return {
+        "active_version": fraud_detector.version,
+        "inference_backend": "compiled" if engine else "sklearn",
+        "memory_mapped": engine is not None and isinstance(engine.threshold, np.memmap),
+        "registry_current": registry.current_version(),
+        "available_versions": registry.versions(),
+    }
+
+
+@router.post("/model/reload")
+def reload_model(
+    version: str | None = None,
+    current_user: User = Depends(require_roles(["admin"])),
+):
+    """
+    Load a registry version (default: the current one), warm it up and swap it in,
+    then promote it. Other workers pick the promotion up through their model
+    watcher, so a version that fails to load here is never promoted.
+    """
+    registry = fraud_detector.registry
+    if version is not None and not registry.has_version(version):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Model version {version} not found"
+        )
+    target = version or registry.current_version()
+    if target is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="No model versions in the registry"
+        )
+
+    logger.info(f"Model reload to {target} requested by {current_user.email}")
+    previous = fraud_detector.version
+    try:
+        fraud_detector.reload(target)
+    except Exception as e:
+        logger.error(f"Model reload to {target} failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Model version {target} failed to load; it was not promoted",
+        ) from e
+    if registry.current_version() != target:
+        registry.set_current(target)
+    return {"status": "reloaded", "version": target, "previous_version": previous}
+
+
+@router.post("/risk-level-counts/rebuild")
+async def rebuild_risk_level_counts(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_roles(["admin"])),
+):
+    """
+    Recount risk profiles per level and overwrite the counters /risk/distribution
+    reads, e.g. after profiles were written outside the API
+    """
+    logger.info(f"Risk level count rebuild requested by {current_user.email}")
+    try:
+        counts = await db_executor.run(RiskAnalysisService.rebuild_risk_level_counts, db)
+    except PoolSaturatedError:
+        raise
+    except Exception as e:
+        logger.error(f"Error rebuilding risk level counts: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to rebuild risk level counts",
+        ) from e
+    return {"status": "rebuilt", "counts": counts}
+
+
+@router.get("/shadow")
+async def get_shadow_summary(challenger_version: str | None = None, db: Session = Depends(get_db)):
+    """
+    Agreement, score deltas and latency of the live model against shadow models,
+    plus this worker's shadow queue counters
+    """
+    try:
+        summaries = await db_executor.run(ShadowScorer.summarize, db, challenger_version)
+    except PoolSaturatedError:
+        raise
+    except Exception as e:
+        logger.error(f"Error summarising shadow predictions: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to summarise shadow predictions",
+        ) from e
+    return {"scorer": shadow_scorer.stats(), "comparisons": summaries}
@@ -9,6 +9,7 @@ from app.models.compliance import DetectionPosture
 from app.models.fraud import FraudAlert
 from app.models.transaction import Transaction
 from app.utils.cache import get_cached, set_cached
+from app.utils.executors import db_executor
 from app.utils.helpers import utcnow
 from app.utils.logger import logger
 
@@ -38,6 +39,10 @@ def _map_fraud_type(fraud_type: str) -> str:
 @router.get("/metrics")
 async def get_dashboard_metrics(db: Session = Depends(get_db)):
     """Get dashboard metrics"""
+    return await db_executor.run(_dashboard_metrics, db)
+
+
+def _dashboard_metrics(db: Session) -> dict:
     try:
         cached = get_cached("dashboard_metrics")
         if cached:
@@ -82,6 +87,10 @@ async def get_dashboard_metrics(db: Session = Depends(get_db)):
 @router.get("/fraud-trends")
 async def get_fraud_trends(db: Session = Depends(get_db)):
     """Get fraud trends for the last 24 hours"""
+    return await db_executor.run(_fraud_trends, db)
+
+
+def _fraud_trends(db: Session) -> list[dict]:
     try:
         cached = get_cached("fraud_trends")
         if cached:
@@ -139,6 +148,10 @@ async def get_fraud_trends(db: Session = Depends(get_db)):
 @router.get("/fraud-type-distribution")
 async def get_fraud_type_distribution(db: Session = Depends(get_db)):
     """Get fraud type distribution"""
+    return await db_executor.run(_fraud_type_distribution, db)
+
+
+def _fraud_type_distribution(db: Session) -> list[dict]:
     try:
         cached = get_cached("fraud_distribution")
         if cached:
@@ -186,6 +199,10 @@ async def get_fraud_type_distribution(db: Session = Depends(get_db)):
 @router.get("/detection-posture")
 async def get_detection_posture(db: Session = Depends(get_db)):
     """Get fraud detection capabilities posture"""
+    return await db_executor.run(_detection_posture, db)
+
+
+def _detection_posture(db: Session) -> list[dict]:
     cached = get_cached("detection_posture")
     if cached:
         return cached
@@ -1,27 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+import asyncio
+import time
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.database import get_db
+from app.ml_models.micro_batcher import fraud_batcher
 from app.models.audit import AuditLog
 from app.models.user import User
 from app.schemas.fraud import (
     FraudAlertResponse,
     FraudAlertStatus,
     FraudAnalysisRequest,
+    FraudAnalysisResult,
+    FraudBatchAnalysisRequest,
+    FraudBatchAnalysisResponse,
 )
+from app.services.alert_writer import alert_writer
 from app.services.fraud_detection import FraudDetectionService
+from app.services.transaction_ingestor import transaction_ingestor
+from app.utils.executors import PoolSaturatedError, db_executor, inference_executor
 from app.utils.logger import logger
+from app.utils.pagination import NEXT_CURSOR_HEADER, InvalidCursorError
 from app.utils.security import require_roles
 
 router = APIRouter(prefix="/fraud", tags=["Fraud Detection"])
 
 
+def alert_filters(
+    alert_status: FraudAlertStatus | None = Query(None, alias="status"),
+    alert_type: str | None = Query(None, alias="type"),
+    customer_id: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    min_score: int | None = None,
+    max_score: int | None = None,
+) -> list:
+    return FraudDetectionService.alert_filters(
+        status=alert_status.value if alert_status else None,
+        alert_type=alert_type,
+        customer_id=customer_id,
+        created_from=created_from,
+        created_to=created_to,
+        min_score=min_score,
+        max_score=max_score,
+    )
+
+
 @router.get("/alerts", response_model=list[FraudAlertResponse])
-async def get_fraud_alerts(limit: int = 50, db: Session = Depends(get_db)):
-    """Get recent fraud alerts"""
+async def get_fraud_alerts(
+    response: Response,
+    limit: int = Query(50, ge=1, le=settings.PAGE_MAX_SIZE),
+    cursor: str | None = None,
+    filters: list = Depends(alert_filters),
+    db: Session = Depends(get_db),
+):
+    """Get fraud alerts, newest first; the next page's cursor is in X-Next-Cursor"""
     try:
-        alerts = FraudDetectionService.get_recent_alerts(db, limit=limit)
+        alerts, next_cursor = await db_executor.run(
+            FraudDetectionService.list_alerts, db, filters, cursor=cursor, limit=limit
+        )
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
         return alerts
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+    except PoolSaturatedError:
+        raise
     except Exception as e:
         logger.error(f"Error fetching fraud alerts: {e}")
         raise HTTPException(
@@ -29,10 +77,18 @@ async def get_fraud_alerts(limit: int = 50, db: Session = Depends(get_db)):
         ) from e
 
 
+@router.get("/alerts/export")
+def export_fraud_alerts(filters: list = Depends(alert_filters), db: Session = Depends(get_db)):
+    """Stream every matching fraud alert as NDJSON"""
+    return StreamingResponse(
+        FraudDetectionService.export_alerts(db, filters), media_type="application/x-ndjson"
+    )
+
+
 @router.get("/alerts/{alert_id}", response_model=FraudAlertResponse)
 async def get_fraud_alert(alert_id: int, db: Session = Depends(get_db)):
     """Get specific fraud alert"""
-    alert = FraudDetectionService.get_alert_by_id(alert_id, db)
+    alert = await db_executor.run(FraudDetectionService.get_alert_by_id, alert_id, db)
     if not alert:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=f"Alert {alert_id} not found"
@@ -40,25 +96,90 @@ async def get_fraud_alert(alert_id: int, db: Session = Depends(get_db)):
     return alert
 
 
+async def _score_transaction(transaction_payload: dict) -> tuple[bool, float, list[str]]:
+    """
+    Score one transaction on the inference pool. With micro-batching, only the rules
+    and the customer state updates run there; the request then waits for its model
+    score on the event loop, so up to FRAUD_MICROBATCH_MAX_SIZE concurrent requests
+    can share one predict_batch call however few inference threads there are.
+    """
+    if not settings.FRAUD_MICROBATCH_ENABLED:
+        return await inference_executor.run(
+            FraudDetectionService.analyze_transaction, transaction_payload
+        )
+
+    transaction_data, features, risk_indicators, blocked = await inference_executor.run(
+        FraudDetectionService.prepare_transaction, transaction_payload
+    )
+    if blocked:
+        return True, 1.0, risk_indicators
+    started = time.perf_counter()
+    is_fraud, confidence = await asyncio.wrap_future(fraud_batcher.submit(features))
+    FraudDetectionService.record_prediction(
+        transaction_data, features, is_fraud, confidence, (time.perf_counter() - started) * 1000
+    )
+    return is_fraud, confidence, risk_indicators
+
+
 @router.post("/analyze", response_model=dict)
 async def analyze_transaction(
     transaction_data: FraudAnalysisRequest, db: Session = Depends(get_db)
 ):
     """Analyze a transaction for fraud"""
+    # Scoring runs on the inference pool and the alert insert on the DB pool, so the
+    # event loop stays free (and concurrent requests can meet in the micro-batcher).
     try:
         transaction_payload = transaction_data.model_dump()
-        is_fraud, confidence, risk_indicators = FraudDetectionService.analyze_transaction(
-            transaction_payload, db
-        )
+        transaction_id = transaction_payload["transaction_id"]
+
+        # Retries of an already-scored transaction get the stored decision back
+        # without re-running the model or inserting again
+        stored = FraudDetectionService.get_cached_result(transaction_id)
+        if stored is None:
+            # Flagged by an earlier call, alert not written yet
+            stored = alert_writer.pending_result(transaction_id)
+        if stored is None and settings.SCORING_CACHE_ENABLED:
+            stored = await db_executor.run(
+                FraudDetectionService.get_stored_result, transaction_id, db
+            )
+        if stored is not None:
+            is_fraud, confidence, risk_indicators, alert_id = stored
+            return {
+                "is_fraud": is_fraud,
+                "confidence": confidence,
+                "risk_indicators": risk_indicators,
+                "alert_id": alert_id,
+            }
+
+        is_fraud, confidence, risk_indicators = await _score_transaction(transaction_payload)
 
         # Create fraud alert if fraud detected
-        if is_fraud:
-            alert = FraudDetectionService.create_fraud_alert(
-                transaction_payload, is_fraud, confidence, risk_indicators, db
+        if is_fraud and settings.ALERT_WRITE_BEHIND_ENABLED:
+            # The ID is reserved now and the rows are committed in the writer's next batch
+            alert_id = await db_executor.run(
+                alert_writer.submit, transaction_payload, confidence, risk_indicators
+            )
+        elif is_fraud:
+            alert = await db_executor.run(
+                FraudDetectionService.create_fraud_alert,
+                transaction_payload,
+                is_fraud,
+                confidence,
+                risk_indicators,
+                db,
             )
             alert_id = alert.id
         else:
             alert_id = None
+            # Clean traffic is recorded in bulk by a background writer, off the hot path;
+            # when its queue is full this waits on the DB pool, then rejects the request
+            if settings.TRANSACTION_INGEST_ENABLED:
+                await db_executor.run(
+                    transaction_ingestor.record, transaction_payload, confidence, risk_indicators
+                )
+        FraudDetectionService.cache_result(
+            transaction_id, (is_fraud, confidence, risk_indicators, alert_id)
+        )
 
         return {
             "is_fraud": is_fraud,
@@ -66,6 +187,8 @@ async def analyze_transaction(
             "risk_indicators": risk_indicators,
             "alert_id": alert_id,
         }
+    except PoolSaturatedError:
+        raise
     except Exception as e:
         logger.error(f"Error analyzing transaction: {e}")
         raise HTTPException(
@@ -74,6 +197,76 @@ async def analyze_transaction(
         ) from e
 
 
+@router.post("/analyze/batch", response_model=FraudBatchAnalysisResponse)
+async def analyze_transaction_batch(
+    batch: FraudBatchAnalysisRequest, db: Session = Depends(get_db)
+):
+    """Analyze many transactions in one vectorized model call"""
+    if len(batch.transactions) > settings.FRAUD_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {settings.FRAUD_BATCH_MAX_SIZE} transactions",
+        )
+
+    reserved = 0
+    try:
+        payloads = [transaction.model_dump() for transaction in batch.transactions]
+        if settings.TRANSACTION_INGEST_ENABLED:
+            # Room for every row is held before scoring feeds the feature store, risk
+            # engine and ring detector, so a 503 here leaves nothing for a retry to
+            # count twice
+            reserved = await db_executor.run(transaction_ingestor.reserve, len(payloads))
+        analyses = await inference_executor.run(
+            FraudDetectionService.analyze_transactions, payloads
+        )
+
+        flagged_positions = [i for i, (is_fraud, _, _) in enumerate(analyses) if is_fraud]
+        if reserved:
+            transaction_ingestor.record_many(
+                [
+                    (payload, confidence, indicators)
+                    for payload, (is_fraud, confidence, indicators) in zip(
+                        payloads, analyses, strict=True
+                    )
+                    if not is_fraud
+                ],
+                reserved,
+            )
+            reserved = 0
+        alert_ids = await db_executor.run(
+            FraudDetectionService.create_fraud_alerts,
+            [(payloads[i], analyses[i][1], analyses[i][2]) for i in flagged_positions],
+            db,
+        )
+        alert_id_by_position = dict(zip(flagged_positions, alert_ids, strict=True))
+
+        results = [
+            FraudAnalysisResult(
+                transaction_id=payload["transaction_id"],
+                is_fraud=is_fraud,
+                confidence=confidence,
+                risk_indicators=risk_indicators,
+                alert_id=alert_id_by_position.get(i),
+            )
+            for i, (payload, (is_fraud, confidence, risk_indicators)) in enumerate(
+                zip(payloads, analyses, strict=True)
+            )
+        ]
+        return FraudBatchAnalysisResponse(
+            total=len(results), flagged=len(flagged_positions), results=results
+        )
+    except PoolSaturatedError:
+        raise
+    except Exception as e:
+        logger.error(f"Error analyzing transaction batch: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to analyze transaction batch",
+        ) from e
+    finally:
+        transaction_ingestor.release(reserved)
+
+
 @router.patch("/alerts/{alert_id}/status")
 async def update_alert_status(
     alert_id: int,
@@ -82,18 +275,29 @@ async def update_alert_status(
     current_user: User = Depends(require_roles(["analyst", "admin"])),
 ):
     """Update fraud alert status"""
-    alert = FraudDetectionService.update_alert_status(alert_id, new_status.value, db)
+    alert = await db_executor.run(
+        _update_alert_status_with_audit, alert_id, new_status.value, current_user.email, db
+    )
     if not alert:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=f"Alert {alert_id} not found"
         )
+    return {"message": "Status updated successfully", "alert": alert}
+
+
+def _update_alert_status_with_audit(alert_id: int, new_status: str, actor_email: str, db: Session):
+    alert = FraudDetectionService.update_alert_status(alert_id, new_status, db)
+    if not alert:
+        return None
     audit_log = AuditLog(
-        actor_email=current_user.email,
+        actor_email=actor_email,
         action="update_alert_status",
         entity_type="fraud_alert",
         entity_id=str(alert_id),
-        details={"status": new_status.value},
+        details={"status": new_status},
     )
     db.add(audit_log)
     db.commit()
-    return {"message": "Status updated successfully", "alert": alert}
+    # Reload here so serializing the response does not hit the DB on the event loop
+    db.refresh(alert)
+    return alert
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 
 from app.database import get_db
-from app.schemas.fraud import GraphDataResponse
+from app.schemas.fraud import FraudRingResponse, GraphDataResponse
 from app.services.graph_analysis import GraphAnalysisService
+from app.services.ring_detector import ring_detector
 
 router = APIRouter(prefix="/graph", tags=["Graph Intelligence"])
 
@@ -11,3 +12,20 @@ router = APIRouter(prefix="/graph", tags=["Graph Intelligence"])
 @router.get("/data", response_model=GraphDataResponse)
 def get_graph_data(db: Session = Depends(get_db)):
     return GraphAnalysisService.get_fraud_graph_data(db)
+
+
+@router.get("/rings", response_model=list[FraudRingResponse])
+def get_fraud_rings(limit: int = Query(100, ge=1, le=1000)):
+    """Rings flagged by the streaming ring detector, those with most customers first"""
+    return ring_detector.rings(limit)
+
+
+@router.get("/rings/{customer_id}", response_model=FraudRingResponse)
+def get_customer_ring(customer_id: str):
+    ring = ring_detector.ring(customer_id)
+    if ring is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Customer {customer_id} is not in a flagged ring",
+        )
+    return ring
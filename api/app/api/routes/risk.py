@@ -1,22 +1,110 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.database import get_db
-from app.models.fraud import RiskProfile
-from app.schemas.fraud import RiskProfileResponse
+from app.schemas.fraud import (
+    RiskProfileBulkRequest,
+    RiskProfileBulkResponse,
+    RiskProfileResponse,
+)
 from app.services.risk_analysis import RiskAnalysisService
+from app.utils.executors import PoolSaturatedError, db_executor
+from app.utils.logger import logger
+from app.utils.pagination import NEXT_CURSOR_HEADER, InvalidCursorError
 
 router = APIRouter(prefix="/risk", tags=["Risk Analysis"])
 
 
+def profile_filters(
+    profile_status: str | None = Query(None, alias="status"),
+    customer_id: str | None = None,
+    active_from: datetime | None = None,
+    active_to: datetime | None = None,
+    min_score: int | None = None,
+    max_score: int | None = None,
+) -> list:
+    return RiskAnalysisService.profile_filters(
+        status=profile_status,
+        customer_id=customer_id,
+        active_from=active_from,
+        active_to=active_to,
+        min_score=min_score,
+        max_score=max_score,
+    )
+
+
+def _profile_page(
+    response: Response, db: Session, filters: list, cursor: str | None, limit: int
+) -> list:
+    try:
+        profiles, next_cursor = RiskAnalysisService.list_profiles(
+            db, filters, cursor=cursor, limit=limit
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return profiles
+
+
 @router.get("/profiles", response_model=list[RiskProfileResponse])
-def get_risk_profiles(db: Session = Depends(get_db)):
-    return db.query(RiskProfile).order_by(RiskProfile.risk_score.desc()).all()
+def get_risk_profiles(
+    response: Response,
+    limit: int = Query(100, ge=1, le=settings.PAGE_MAX_SIZE),
+    cursor: str | None = None,
+    filters: list = Depends(profile_filters),
+    db: Session = Depends(get_db),
+):
+    """Risk profiles, highest score first; the next page's cursor is in X-Next-Cursor"""
+    return _profile_page(response, db, filters, cursor, limit)
+
+
+@router.get("/profiles/export")
+def export_risk_profiles(filters: list = Depends(profile_filters), db: Session = Depends(get_db)):
+    """Stream every matching risk profile as NDJSON"""
+    return StreamingResponse(
+        RiskAnalysisService.export_profiles(db, filters), media_type="application/x-ndjson"
+    )
+
+
+@router.post("/profiles/bulk", response_model=RiskProfileBulkResponse)
+async def upsert_risk_profiles(batch: RiskProfileBulkRequest, db: Session = Depends(get_db)):
+    """Recompute many customers' risk profiles and upsert them in one statement"""
+    if len(batch.customers) > settings.RISK_BULK_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {settings.RISK_BULK_MAX_SIZE} customers",
+        )
+
+    try:
+        customers = [customer.model_dump(exclude_none=True) for customer in batch.customers]
+        profiles = await db_executor.run(RiskAnalysisService.upsert_customer_risks, customers, db)
+        return RiskProfileBulkResponse(total=len(profiles), profiles=profiles)
+    except PoolSaturatedError:
+        raise
+    except Exception as e:
+        logger.error(f"Error upserting risk profiles: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to upsert risk profiles",
+        ) from e
 
 
 @router.get("/profiles/high", response_model=list[RiskProfileResponse])
-def get_high_risk_profiles(threshold: int = 70, db: Session = Depends(get_db)):
-    return RiskAnalysisService.get_high_risk_customers(db, threshold=threshold)
+def get_high_risk_profiles(
+    response: Response,
+    threshold: int = 70,
+    limit: int = Query(100, ge=1, le=settings.PAGE_MAX_SIZE),
+    cursor: str | None = None,
+    filters: list = Depends(profile_filters),
+    db: Session = Depends(get_db),
+):
+    filters = [*filters, *RiskAnalysisService.profile_filters(min_score=threshold)]
+    return _profile_page(response, db, filters, cursor, limit)
 
 
 @router.get("/profiles/{customer_id}", response_model=RiskProfileResponse)
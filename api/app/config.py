@@ -1,5 +1,6 @@
 from functools import lru_cache
 
+from pydantic import Field, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -25,14 +26,118 @@ class Settings(BaseSettings):
 
     # ML Models
     MODEL_PATH: str = "./data/models"
+    MODEL_WATCH_INTERVAL_SECONDS: float = 30.0  # 0 disables polling for new versions
+    MODEL_MMAP_MODE: str = "r"  # np.load mmap_mode for engine arrays; "" loads private copies
+    MODEL_PRELOAD: bool = False  # load before fork when served by a pre-fork server
     FRAUD_DETECTION_THRESHOLD: float = 0.75
     RISK_SCORE_THRESHOLD: int = 70
+    RISK_BULK_MAX_SIZE: int = 10000
+    FRAUD_BATCH_MAX_SIZE: int = 10000
+    PAGE_MAX_SIZE: int = 1000
+    EXPORT_CHUNK_SIZE: int = 1000
+    FRAUD_INFERENCE_BACKEND: str = "compiled"  # "compiled" or "sklearn"
+    # Graph centrality is sampled above this many nodes
+    GRAPH_EXACT_CENTRALITY_MAX_NODES: int = 5000
+    GRAPH_CENTRALITY_SAMPLES: int = 256  # pivot BFS runs shared by large components
+    GRAPH_CENTRALITY_TIME_BUDGET_SECONDS: float = 0.0  # 0 = no limit
+    GRAPH_CENTRALITY_SEED: int = 0
+    GNN_NUM_THREADS: int = 0  # torch intra-op threads for FraudGNN inference; 0 = torch default
+    # Community detection only splits connected components up to this many nodes
+    GRAPH_RING_REFINE_MAX_NODES: int = 1000
+    # Keep one graph per worker and re-analyse only the components new edges touch
+    GRAPH_LIVE_ENABLED: bool = True
+    GRAPH_LIVE_MAX_QUEUE: int = 100_000
+    GRAPH_LIVE_BATCH_SIZE: int = 5_000
+    GRAPH_LIVE_FLUSH_INTERVAL_MS: float = 1000.0
+    FRAUD_RULES_PATH: str = ""  # JSON rule file; "" uses app/ml_models/rules/
+    RISK_RULES_PATH: str = ""
+
+    # Idempotent /fraud/analyze: results cached per (transaction_id, model version)
+    SCORING_CACHE_ENABLED: bool = True
+    SCORING_CACHE_MAX_ENTRIES: int = 100_000
+    SCORING_CACHE_TTL_SECONDS: float = 600.0
+
+    # Online per-customer feature store
+    FEATURE_STORE_ENABLED: bool = True
+    FEATURE_STORE_MAX_CUSTOMERS: int = 100_000
+    FEATURE_STORE_VELOCITY_WINDOW_SECONDS: int = 3600
+
+    # Micro-batching of concurrent /fraud/analyze calls
+    FRAUD_MICROBATCH_ENABLED: bool = False
+    FRAUD_MICROBATCH_MAX_SIZE: int = 64
+    FRAUD_MICROBATCH_MAX_WAIT_MS: float = 5.0
+
+    # Write-behind persistence of fraud alerts raised by /fraud/analyze
+    ALERT_WRITE_BEHIND_ENABLED: bool = False
+    ALERT_WRITE_BEHIND_MAX_QUEUE: int = 10_000
+    ALERT_WRITE_BEHIND_BATCH_SIZE: int = 500
+    ALERT_WRITE_BEHIND_FLUSH_INTERVAL_MS: float = 50.0
+    ALERT_ID_BLOCK_SIZE: int = 100
+
+    # Background bulk ingestion of transactions that were scored but not flagged
+    TRANSACTION_INGEST_ENABLED: bool = True
+    TRANSACTION_INGEST_MAX_QUEUE: int = 100_000
+    TRANSACTION_INGEST_BATCH_SIZE: int = 5_000
+    TRANSACTION_INGEST_FLUSH_INTERVAL_MS: float = 200.0
+
+    # In-memory customer risk profiles updated by scored transactions, written in bulk
+    RISK_ENGINE_ENABLED: bool = True
+    RISK_ENGINE_MAX_CUSTOMERS: int = 100_000
+    RISK_ENGINE_MAX_QUEUE: int = 100_000
+    RISK_ENGINE_BATCH_SIZE: int = 5_000
+    RISK_ENGINE_FLUSH_INTERVAL_MS: float = 1000.0
+
+    # Streaming fraud-ring detection over customers sharing a card, IP or device
+    RING_DETECTOR_ENABLED: bool = True
+    RING_DETECTOR_MIN_CUSTOMERS: int = 3
+    RING_DETECTOR_MAX_CUSTOMERS: int = 50  # larger components are shared infrastructure
+    RING_DETECTOR_MAX_IDENTIFIERS_PER_CUSTOMER: float = 1.5
+    RING_DETECTOR_MAX_NODES: int = 2_000_000  # customers plus identifiers; then starts over
+
+    # Shadow (challenger) model scored off the request path
+    SHADOW_MODEL_VERSION: str = ""  # registry version; "" disables shadow scoring
+    SHADOW_QUEUE_MAX_SIZE: int = 10_000
+    SHADOW_BATCH_SIZE: int = 500
+    SHADOW_FLUSH_INTERVAL_SECONDS: float = 1.0
+
+    # Execution pools (keep DB_POOL_WORKERS within the SQLAlchemy connection pool size)
+    DB_POOL_WORKERS: int = 20
+    DB_POOL_MAX_QUEUE: int = 1000
+    INFERENCE_POOL_KIND: str = "thread"  # "thread" or "process"
+    INFERENCE_POOL_WORKERS: int = 4
+    INFERENCE_POOL_MAX_QUEUE: int = 1000
 
     # Redis (Optional)
     REDIS_URL: str = "redis://localhost:6379/0"
 
     # Logging
     LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"  # "text" or "json"
+    LOG_ASYNC: bool = False  # loguru enqueue=True: write log records on a background thread
+    LOG_TRANSACTION_SAMPLE_RATE: float = Field(1.0, ge=0, le=1)  # chance a per-txn line is kept
+
+    @model_validator(mode="after")
+    def check_process_inference_pool(self) -> "Settings":
+        # Scoring in child processes would update their copies of the per-worker
+        # stores, which the API process (rings, admin stats) never sees
+        if self.INFERENCE_POOL_KIND == "process":
+            stateful = [
+                name
+                for name, enabled in (
+                    ("FEATURE_STORE_ENABLED", self.FEATURE_STORE_ENABLED),
+                    ("RISK_ENGINE_ENABLED", self.RISK_ENGINE_ENABLED),
+                    ("RING_DETECTOR_ENABLED", self.RING_DETECTOR_ENABLED),
+                    ("FRAUD_MICROBATCH_ENABLED", self.FRAUD_MICROBATCH_ENABLED),
+                    ("SHADOW_MODEL_VERSION", bool(self.SHADOW_MODEL_VERSION)),
+                )
+                if enabled
+            ]
+            if stateful:
+                raise ValueError(
+                    "INFERENCE_POOL_KIND=process scores in child processes; "
+                    f"disable {', '.join(stateful)} or use a thread pool"
+                )
+        return self
 
     @property
     def allowed_origins(self) -> list[str]:
@@ -1,7 +1,8 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from app.config import settings
+from app.utils.logger import logger
 
 engine_kwargs = {
     "echo": settings.DATABASE_ECHO,
@@ -28,6 +29,49 @@ def get_db():
         db.close()
 
 
+def upgrade_schema(bind=engine) -> list[str]:
+    """
+    Add the columns and indexes models gained after their tables were created:
+    create_all() skips existing tables, so an upgraded database would otherwise miss
+    e.g. transactions.risk_indicators. Added columns are nullable and start out NULL.
+    Idempotent; returns what was added.
+    """
+    inspector = inspect(bind)
+    added = []
+    with bind.begin() as connection:
+        quote = connection.dialect.identifier_preparer.quote
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {quote(table.name)} "
+                        f"ADD COLUMN {quote(column.name)} {column_type}"
+                    )
+                )
+                added.append(f"{table.name}.{column.name}")
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(connection)
+                    added.append(index.name)
+    return added
+
+
 def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
+    added = upgrade_schema()
+    if added:
+        logger.info(f"Upgraded database schema: added {', '.join(added)}")
+
+    # Counter rows exist before any profile write, so writers and rebuilds only update them
+    from app.services.risk_analysis import RiskAnalysisService
+
+    with engine.begin() as connection:
+        RiskAnalysisService.seed_risk_level_counts(connection)
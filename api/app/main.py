@@ -7,7 +7,9 @@ from fastapi.responses import JSONResponse
 from app.api.routes import api_router
 from app.config import settings
 from app.database import init_db
+from app.utils.executors import PoolSaturatedError, db_executor, inference_executor
 from app.utils.logger import logger
+from app.utils.pagination import NEXT_CURSOR_HEADER
 
 
 @asynccontextmanager
@@ -17,21 +19,72 @@ async def lifespan(app: FastAPI):
     init_db()
     logger.info("Database initialized")
 
+    if settings.FEATURE_STORE_ENABLED:
+        from app.database import SessionLocal
+        from app.ml_models.feature_store import feature_store
+
+        db = SessionLocal()
+        try:
+            feature_store.bootstrap(db)
+        except Exception as e:
+            logger.warning(f"Could not bootstrap feature store: {e}")
+        finally:
+            db.close()
+
+    if settings.GRAPH_LIVE_ENABLED:
+        from app.database import SessionLocal
+        from app.services.transaction_graph import live_graph
+
+        db = SessionLocal()
+        try:
+            live_graph.ensure_hydrated(db)
+        except Exception as e:
+            logger.warning(f"Could not hydrate transaction graph: {e}")
+        finally:
+            db.close()
+
     # Load ML models
-    from app.ml_models.fraud_detector import fraud_detector
+    from app.ml_models.fraud_detector import fraud_detector, model_watcher
 
     try:
-        fraud_detector.load_model()
-        logger.info("ML models loaded successfully")
+        # A model preloaded before fork is already shared with this worker; keep it
+        if fraud_detector.version is None:
+            fraud_detector.load_model()
+        logger.info(f"ML models loaded successfully (fraud model {fraud_detector.version})")
     except Exception as e:
         logger.warning(f"Could not load ML models: {e}")
         logger.info("Using default models")
+    model_watcher.start()
+
+    from app.services.shadow_scoring import shadow_scorer
+
+    shadow_scorer.start()
 
     yield
 
     # Shutdown
     logger.info("Shutting down AEGIS Fraud Detection Platform...")
+    from app.ml_models.micro_batcher import fraud_batcher
+    from app.services.alert_writer import alert_writer
+    from app.services.graph_analysis import graph_updater
+    from app.services.risk_engine import risk_engine
+    from app.services.transaction_ingestor import transaction_ingestor
+
+    model_watcher.stop()
+    fraud_batcher.stop()
+    shadow_scorer.stop()
+    alert_writer.stop()
+    transaction_ingestor.stop()
+    risk_engine.stop()
+    graph_updater.stop()
+    inference_executor.shutdown()
+    db_executor.shutdown()
+
 
+if settings.MODEL_PRELOAD:
+    from app.ml_models.fraud_detector import preload_for_fork
+
+    preload_for_fork()
 
 # Create FastAPI app
 app = FastAPI(
@@ -48,9 +101,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["Content-Type", "Authorization", "X-API-Key"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 
+@app.exception_handler(PoolSaturatedError)
+async def pool_saturated_handler(request: Request, exc: PoolSaturatedError) -> JSONResponse:
+    logger.warning(f"Rejected {request.method} {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+
 @app.exception_handler(Exception)
 async def unhandled_exception_handler(request: Request, exc: Exception) -> JSONResponse:
     logger.exception(f"Unhandled error on {request.method} {request.url.path}: {exc}")
@@ -0,0 +1,364 @@
+import csv
+import json
+import os
+import shutil
+import time
+import zlib
+from collections import defaultdict
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.engine import Engine
+
+from app.database import engine as default_engine
+from app.ml_models.feature_store import CustomerFeatureStore
+from app.ml_models.fraud_detector import fraud_detector
+from app.ml_models.rule_engine import fraud_rules
+from app.models.transaction import Transaction
+from app.utils.helpers import parse_utc_timestamp
+from app.utils.logger import logger
+from app.utils.transactions import bulk_insert_transactions, ingest_row
+
+DEFAULT_CHUNK_SIZE = 20_000
+# Input bytes per partition; a worker holds one partition's records in memory
+PARTITION_BYTES = 16 * 1024 * 1024
+MIN_PARTITIONS = 64
+
+# CSV cells are strings; coerce the columns extract_features reads so a CSV row
+# scores exactly like the equivalent JSON payload
+_NUMERIC_FIELDS = {
+    "amount",
+    "transaction_velocity",
+    "avg_transaction_amount",
+    "account_age_days",
+    "distance_from_home",
+    "failed_login_attempts",
+}
+_BOOLEAN_FIELDS = {"new_device", "vpn_usage"}
+_JSON_FIELDS = {"location", "features"}
+# Same required fields as /fraud/analyze; records without them are skipped and counted
+_REQUIRED_FIELDS = ("transaction_id", "customer_id", "amount")
+
+
+def _coerce_csv_row(row: dict[str, str]) -> dict:
+    record = {}
+    for key, value in row.items():
+        if value is None or value == "":
+            record[key] = None
+        elif key in _NUMERIC_FIELDS:
+            record[key] = float(value)
+        elif key in _BOOLEAN_FIELDS:
+            record[key] = value.strip().lower() in ("1", "true", "yes", "y", "t")
+        elif key in _JSON_FIELDS:
+            record[key] = json.loads(value)
+        else:
+            record[key] = value
+    return record
+
+
+def iter_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[list]:
+    """
+    Yield the file in chunks without reading it all: raw JSONL lines, or coerced
+    dicts for CSV (quoted cells may span lines, so CSV is parsed here).
+    """
+    with open(path, newline="" if path.endswith(".csv") else None) as f:
+        if path.endswith(".csv"):
+            rows = (_coerce_csv_row(row) for row in csv.DictReader(f))
+        else:
+            rows = (line for line in f if line.strip())
+        while chunk := list(islice(rows, chunk_size)):
+            yield chunk
+
+
+def _partition_of(customer_id, partitions: int) -> int:
+    # crc32 rather than hash(), which is salted per process; a resumed run must
+    # route every customer to the same partition
+    return zlib.crc32(str(customer_id).encode()) % partitions
+
+
+def partition_path(directory: str, index: int) -> str:
+    return os.path.join(directory, f"part-{index:05d}.jsonl")
+
+
+def default_partitions(source: str) -> int:
+    """About PARTITION_BYTES of input per partition, and enough to keep every core busy."""
+    return max(MIN_PARTITIONS, os.path.getsize(source) // PARTITION_BYTES + 1)
+
+
+def partition(
+    source: str, directory: str, partitions: int, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> tuple[int, int]:
+    """
+    Split source into JSONL partition files by customer_id, keeping file order within
+    each, so one worker sees a customer's whole history. Records missing a required
+    field are skipped. Returns (rows written, rows skipped).
+    """
+    os.makedirs(directory, exist_ok=True)
+    for index in range(partitions):
+        open(partition_path(directory, index), "w").close()
+
+    rows = skipped = 0
+    for chunk in iter_chunks(source, chunk_size):
+        lines: dict[int, list[str]] = defaultdict(list)
+        for item in chunk:
+            record = json.loads(item) if isinstance(item, str) else item
+            if any(record.get(f) is None for f in _REQUIRED_FIELDS):
+                skipped += 1
+                continue
+            index = _partition_of(record["customer_id"], partitions)
+            lines[index].append(json.dumps(record, default=str) + "\n")
+            rows += 1
+        for index, partition_lines in lines.items():
+            with open(partition_path(directory, index), "a") as f:
+                f.writelines(partition_lines)
+    return rows, skipped
+
+
+def _init_worker(version: str | None):
+    fraud_detector.load_model(version)
+
+
+def _replay_time(record: dict) -> datetime:
+    timestamp = record.get("timestamp")
+    # Online, an undated transaction is stamped on arrival, after any dated history
+    return parse_utc_timestamp(timestamp) if timestamp else datetime.max
+
+
+def score_partition(
+    index: int, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, replay_features: bool = True
+) -> tuple[int, list[dict]]:
+    """
+    Score one partition in a worker the way /fraud/analyze/batch scores a batch.
+
+    Records are replayed in time order (file order on ties) through a private feature
+    store, so history features the record lacks are filled in point-in-time as the
+    serving feature store would have; then the fraud rules and one predict_batch call
+    run per chunk_size slice. Records matching a block rule score 1.0 without the model.
+    """
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    records.sort(key=_replay_time)
+    store = CustomerFeatureStore(max_customers=len(records) + 1) if replay_features else None
+
+    results = []
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start : start + chunk_size]
+        enriched = [store.enrich(record) for record in chunk] if store is not None else chunk
+        features_list = [fraud_detector.extract_features(record) for record in enriched]
+        indicators_list, blocked = fraud_rules.apply(features_list)
+        scored = [i for i in range(len(chunk)) if not blocked[i]]
+        decisions = [(True, 1.0)] * len(chunk)
+        predictions = fraud_detector.predict_batch([features_list[i] for i in scored])
+        for i, decision in zip(scored, predictions, strict=True):
+            decisions[i] = decision
+
+        for record, (is_fraud, probability), indicators in zip(
+            chunk, decisions, indicators_list, strict=True
+        ):
+            row = ingest_row(record, probability, indicators)
+            row["is_fraud"] = is_fraud
+            results.append(row)
+    return index, results
+
+
+class Checkpoint:
+    """
+    Partitioning state and completed partition indexes for one input file, partition
+    count and model version, rewritten atomically after every step so an interrupted
+    run can resume. Partition files live in <path>.parts until the run finishes.
+    """
+
+    def __init__(self, path: str, source: str, partitions: int, version: str | None):
+        self.path = path
+        self.parts_dir = f"{path}.parts"
+        self.identity = {"source": os.path.abspath(source), "partitions": partitions}
+        self.partitions = partitions
+        self.version = version
+        self.partitioned = False
+        self.skipped = 0
+        self.done: set[int] = set()
+        self.rows = 0
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            state = json.load(f)
+        if {k: state.get(k) for k in self.identity} != self.identity:
+            raise ValueError(
+                f"Checkpoint {self.path} belongs to a different input or partition count"
+            )
+        if state.get("model_version") != self.version:
+            raise ValueError(
+                f"Checkpoint {self.path} was scored with model {state.get('model_version')}, "
+                f"not {self.version}"
+            )
+        self.partitioned = state["partitioned"]
+        self.skipped = state["skipped"]
+        self.done = set(state["done"])
+        self.rows = state["rows"]
+
+    def mark_partitioned(self, skipped: int):
+        self.partitioned = True
+        self.skipped = skipped
+        self._save()
+
+    def mark(self, index: int, rows: int):
+        self.done.add(index)
+        self.rows += rows
+        self._save()
+
+    def _save(self):
+        staging = f"{self.path}.tmp"
+        with open(staging, "w") as f:
+            json.dump(
+                {
+                    **self.identity,
+                    "model_version": self.version,
+                    "partitioned": self.partitioned,
+                    "skipped": self.skipped,
+                    "done": sorted(self.done),
+                    "rows": self.rows,
+                },
+                f,
+            )
+        os.replace(staging, self.path)
+
+
+class FileSink:
+    """Append scores to a JSONL or CSV file."""
+
+    FIELDS = ("transaction_id", "fraud_probability", "is_fraud", "model_version")
+
+    def __init__(self, path: str, version: str | None):
+        self.version = version
+        self.is_csv = path.endswith(".csv")
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", newline="")
+        self._writer = csv.writer(self._file) if self.is_csv else None
+        if self.is_csv and new_file:
+            self._writer.writerow(self.FIELDS)
+
+    def write(self, rows: list[dict]):
+        values = [
+            (row["transaction_id"], row["fraud_probability"], row["is_fraud"], self.version)
+            for row in rows
+        ]
+        if self.is_csv:
+            self._writer.writerows(values)
+        else:
+            self._file.writelines(
+                json.dumps(dict(zip(self.FIELDS, value, strict=True))) + "\n" for value in values
+            )
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class DatabaseSink:
+    """Update fraud_probability of known transactions and insert unknown ones, per chunk."""
+
+    def __init__(self, engine: Engine | None = None):
+        self.engine = engine or default_engine
+
+    def write(self, rows: list[dict]):
+        with self.engine.begin() as connection:
+            inserted = bulk_insert_transactions(connection, rows)
+            if inserted < len(rows):
+                connection.execute(
+                    update(Transaction)
+                    .where(Transaction.transaction_id == bindparam("b_transaction_id"))
+                    .values(fraud_probability=bindparam("b_fraud_probability")),
+                    [
+                        {
+                            "b_transaction_id": row["transaction_id"],
+                            "b_fraud_probability": row["fraud_probability"],
+                        }
+                        for row in rows
+                    ],
+                )
+
+    def close(self):
+        pass
+
+
+def backfill(
+    source: str,
+    sink: FileSink | DatabaseSink,
+    checkpoint: Checkpoint,
+    workers: int | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    version: str | None = None,
+    replay_features: bool = True,
+) -> int:
+    """
+    Score every record in source with a process pool and write results to sink.
+
+    The input is first split by customer into checkpoint.partitions files, then each
+    partition is scored by one worker with score_partition. Partitions already
+    recorded in checkpoint are skipped. At most two partitions per worker are in
+    flight, so memory stays bounded however large the file is. Results are written
+    in the parent as partitions complete; a partition is checkpointed only after its
+    results are written (at-least-once on resume). Returns rows scored this run.
+    """
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    scored = 0
+    pending: set[Future] = set()
+
+    if not checkpoint.partitioned:
+        rows, skipped = partition(source, checkpoint.parts_dir, checkpoint.partitions, chunk_size)
+        checkpoint.mark_partitioned(skipped)
+        logger.info(
+            f"Backfill: split {rows} rows into {checkpoint.partitions} partitions "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+    if checkpoint.skipped:
+        logger.warning(
+            f"Backfill: {checkpoint.skipped} records skipped for missing "
+            f"{', '.join(_REQUIRED_FIELDS)}"
+        )
+
+    def drain(block_until: int):
+        nonlocal scored
+        while len(pending) > block_until:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                index, rows = future.result()
+                sink.write(rows)
+                checkpoint.mark(index, len(rows))
+                scored += len(rows)
+            elapsed = time.perf_counter() - started
+            logger.info(
+                f"Backfill: {checkpoint.rows} rows scored ({len(checkpoint.done)}/"
+                f"{checkpoint.partitions} partitions), {scored / elapsed:,.0f} rows/s"
+            )
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(version,)
+    ) as pool:
+        for index in range(checkpoint.partitions):
+            if index in checkpoint.done:
+                continue
+            path = partition_path(checkpoint.parts_dir, index)
+            pending.add(pool.submit(score_partition, index, path, chunk_size, replay_features))
+            drain(block_until=workers * 2)
+        drain(block_until=0)
+    shutil.rmtree(checkpoint.parts_dir, ignore_errors=True)
+
+    logger.info(
+        f"Backfill finished: {scored} rows in {time.perf_counter() - started:.1f}s "
+        f"with {workers} workers (model {version or 'current'}), "
+        f"{checkpoint.skipped} records skipped"
+    )
+    return scored
+
+
+def resolve_version(version: str | None) -> str | None:
+    """Pin the registry version up front so every worker scores with the same model."""
+    return version or fraud_detector.registry.current_version()
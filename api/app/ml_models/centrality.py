@@ -0,0 +1,180 @@
+import math
+import random
+import time
+from collections import deque
+
+import networkx as nx
+import numpy as np
+
+
+def _shortest_paths(adj: dict, source) -> tuple[list, dict, dict, dict]:
+    """Unweighted BFS from source: visit order, predecessors, path counts and distances."""
+    dist = {source: 0}
+    sigma = {source: 1}
+    preds: dict = {source: []}
+    order = []
+    queue = deque([source])
+    while queue:
+        v = queue.popleft()
+        order.append(v)
+        next_dist = dist[v] + 1
+        paths = sigma[v]
+        for w in adj[v]:
+            if w not in dist:
+                dist[w] = next_dist
+                sigma[w] = 0
+                preds[w] = []
+                queue.append(w)
+            if dist[w] == next_dist:
+                sigma[w] += paths
+                preds[w].append(v)
+    return order, preds, sigma, dist
+
+
+def _accumulate(betweenness: dict, order: list, preds: dict, sigma: dict, weight: float):
+    """Add one source's pair dependencies (Brandes), scaled by weight."""
+    delta = dict.fromkeys(order, 0.0)
+    source = order[0]
+    for w in reversed(order):
+        coefficient = (1 + delta[w]) / sigma[w]
+        for v in preds[w]:
+            delta[v] += sigma[v] * coefficient
+        if w != source:
+            betweenness[w] += delta[w] * weight
+
+
+def _adjacency_csr(adj: dict, members: list) -> tuple[np.ndarray, np.ndarray]:
+    """CSR (indptr, indices) of a component, nodes numbered in members order."""
+    index = {node: i for i, node in enumerate(members)}
+    degrees = np.fromiter((len(adj[v]) for v in members), dtype=np.int64, count=len(members))
+    indptr = np.zeros(len(members) + 1, dtype=np.int64)
+    np.cumsum(degrees, out=indptr[1:])
+    indices = np.fromiter(
+        (index[w] for v in members for w in adj[v]), dtype=np.int64, count=int(indptr[-1])
+    )
+    return indptr, indices
+
+
+def _dependencies_csr(
+    indptr: np.ndarray, indices: np.ndarray, source: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Brandes pair dependencies and BFS distances from source, a whole BFS level at a time:
+    each level gathers the frontier's neighbor lists and keeps the edges leading one
+    level deeper, which the backward pass then replays in reverse.
+    """
+    n = len(indptr) - 1
+    dist = np.full(n, -1, dtype=np.int64)
+    sigma = np.zeros(n)
+    dist[source] = 0
+    sigma[source] = 1.0
+    frontier = np.array([source], dtype=np.int64)
+    levels = []
+    depth = 0
+    while frontier.size:
+        starts = indptr[frontier]
+        counts = indptr[frontier + 1] - starts
+        # Positions in indices of every frontier node's neighbors, concatenated
+        offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        neighbors = indices[np.arange(counts.sum()) + offsets]
+        parents = np.repeat(frontier, counts)
+        dist[neighbors[dist[neighbors] == -1]] = depth + 1
+        deeper = dist[neighbors] == depth + 1
+        parents, neighbors = parents[deeper], neighbors[deeper]
+        np.add.at(sigma, neighbors, sigma[parents])
+        levels.append((parents, neighbors))
+        frontier = np.unique(neighbors)
+        depth += 1
+
+    delta = np.zeros(n)
+    for parents, children in reversed(levels):
+        np.add.at(delta, parents, sigma[parents] / sigma[children] * (1 + delta[children]))
+    delta[source] = 0.0
+    return delta, dist
+
+
+def sampled_centrality(
+    G: nx.Graph,
+    samples: int = 256,
+    time_budget_seconds: float = 0.0,
+    seed: int = 0,
+    exact_component_size: int = 50,
+) -> tuple[dict, dict]:
+    """
+    Approximate nx.betweenness_centrality(G) and nx.closeness_centrality(G) (unweighted,
+    normalized, wf_improved) from shortest paths out of sampled pivot nodes.
+
+    Connected components of up to exact_component_size nodes use every node as a pivot
+    and come out exact. Larger components share the samples budget in proportion to
+    their size, at least one pivot each. One BFS per pivot yields both measures:
+    betweenness sums the pivots' Brandes dependencies scaled by component size over
+    pivots; a pivot's closeness is exact, and other nodes use their mean distance to
+    the component's pivots. Small components run a plain Python BFS, large ones a
+    level-at-a-time NumPy BFS over their CSR adjacency. A positive time_budget_seconds
+    stops sampling once spent, after one pivot per large component; estimates are
+    scaled by the pivots done.
+    Pivots are drawn with random.Random(seed), so results are reproducible.
+    """
+    n = G.number_of_nodes()
+    betweenness = dict.fromkeys(G, 0.0)
+    closeness = dict.fromkeys(G, 0.0)
+    if n < 2:
+        return betweenness, closeness
+    adj = {node: list(neighbors) for node, neighbors in G.adjacency()}
+    rng = random.Random(seed)
+    deadline = time.perf_counter() + time_budget_seconds if time_budget_seconds > 0 else None
+    betweenness_scale = 1 / ((n - 1) * (n - 2)) if n > 2 else 0.0
+
+    def closeness_from(reachable: int, total_distance: float) -> float:
+        if total_distance <= 0:
+            return 0.0
+        return (reachable - 1) / total_distance * (reachable - 1) / (n - 1)
+
+    # Large components: (members, CSR indptr, indices, pivots done, summed dependencies
+    # and summed distances from those pivots per node), nodes numbered in members order
+    sampled: list[tuple] = []
+    # (component index, pivot): one per component first, the rest interleaved later
+    first: list[tuple[int, int]] = []
+    rest: list[tuple[int, int]] = []
+    for component in nx.connected_components(G):
+        size = len(component)
+        if size <= exact_component_size:
+            for source in component:
+                order, preds, sigma, dist = _shortest_paths(adj, source)
+                _accumulate(betweenness, order, preds, sigma, betweenness_scale)
+                closeness[source] = closeness_from(size, sum(dist.values()))
+            continue
+        # Sorted so the draw does not depend on set iteration order
+        members = sorted(component, key=str)
+        k = min(size, max(1, math.ceil(samples * size / n)))
+        pivots = rng.sample(range(size), k)
+        first.append((len(sampled), pivots[0]))
+        rest.extend((len(sampled), pivot) for pivot in pivots[1:])
+        indptr, indices = _adjacency_csr(adj, members)
+        sampled.append((members, indptr, indices, [], np.zeros(size), np.zeros(size)))
+
+    # Shuffled so a time budget cut leaves every component a similar share of pivots
+    rng.shuffle(rest)
+    exact_closeness = {}
+    for position, (index, pivot) in enumerate(first + rest):
+        if position >= len(first) and deadline and time.perf_counter() > deadline:
+            break
+        members, indptr, indices, pivots, dependencies, distances = sampled[index]
+        delta, dist = _dependencies_csr(indptr, indices, pivot)
+        dependencies += delta
+        distances += dist
+        pivots.append(pivot)
+        exact_closeness[members[pivot]] = closeness_from(len(members), float(dist.sum()))
+
+    for members, _, _, pivots, dependencies, distances in sampled:
+        size = len(members)
+        estimates = dependencies * (betweenness_scale * size / len(pivots))
+        # Mean distance to the pivots, over the size - 1 other nodes
+        totals = distances * ((size - 1) / len(pivots))
+        for node, value, total in zip(members, estimates.tolist(), totals.tolist(), strict=True):
+            betweenness[node] = value
+            if node in exact_closeness:
+                closeness[node] = exact_closeness[node]
+            else:
+                closeness[node] = closeness_from(size, total)
+    return betweenness, closeness
@@ -0,0 +1,216 @@
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.transaction import Transaction
+from app.utils.helpers import calculate_distance, parse_utc_timestamp
+from app.utils.logger import logger
+
+# Per-customer cap on timestamps kept for the velocity window
+_MAX_RECENT_EVENTS = 1024
+
+STORE_FEATURES = (
+    "transaction_velocity",
+    "avg_transaction_amount",
+    "account_age_days",
+    "distance_from_home",
+)
+
+
+def _coordinates(location: dict | None) -> tuple[float, float] | None:
+    if not isinstance(location, dict):
+        return None
+    lat = location.get("lat", location.get("latitude"))
+    lon = location.get("lon", location.get("lng", location.get("longitude")))
+    try:
+        return float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+
+
+def _event_time(transaction_data: dict) -> datetime:
+    # Naive UTC, matching the DateTime columns the store is bootstrapped from
+    return parse_utc_timestamp(transaction_data.get("timestamp"))
+
+
+class _CustomerState:
+    __slots__ = ("first_seen", "count", "mean_amount", "recent", "home", "location_count")
+
+    def __init__(self, first_seen: datetime):
+        self.first_seen = first_seen
+        self.count = 0
+        self.mean_amount = 0.0
+        self.recent: deque[datetime] = deque(maxlen=_MAX_RECENT_EVENTS)
+        self.home: tuple[float, float] | None = None
+        self.location_count = 0
+
+
+class CustomerFeatureStore:
+    """
+    In-memory per-customer behavioural features for fraud scoring.
+
+    Keeps a sliding window of recent transaction times (velocity), a running mean
+    amount, the first-seen time (account age) and a running-mean home location per
+    customer_id. Lookups and updates are O(1) amortized; customers are held in LRU
+    order and the least recently active are evicted past max_customers.
+    """
+
+    def __init__(self, max_customers: int = 100_000, velocity_window_seconds: int = 3600):
+        self.max_customers = max_customers
+        self.velocity_window = timedelta(seconds=velocity_window_seconds)
+        self._customers: OrderedDict[str, _CustomerState] = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._customers)
+
+    def clear(self):
+        with self._lock:
+            self._customers.clear()
+            self.evictions = 0
+
+    def _get_or_create(self, customer_id: str, timestamp: datetime) -> _CustomerState:
+        state = self._customers.get(customer_id)
+        if state is None:
+            state = self._customers[customer_id] = _CustomerState(timestamp)
+            if len(self._customers) > self.max_customers:
+                self._customers.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._customers.move_to_end(customer_id)
+        return state
+
+    def _prune(self, state: _CustomerState, now: datetime):
+        cutoff = now - self.velocity_window
+        while state.recent and state.recent[0] < cutoff:
+            state.recent.popleft()
+
+    def get_features(
+        self, customer_id: str, timestamp: datetime, location: dict | None = None
+    ) -> dict[str, float] | None:
+        """Features from the customer's history before this transaction, if known."""
+        with self._lock:
+            state = self._customers.get(customer_id)
+            if state is None:
+                return None
+            self._customers.move_to_end(customer_id)
+            self._prune(state, timestamp)
+
+            distance = 0.0
+            coordinates = _coordinates(location)
+            if coordinates and state.home:
+                distance = calculate_distance(*state.home, *coordinates)
+
+            return {
+                "transaction_velocity": len(state.recent),
+                "avg_transaction_amount": state.mean_amount,
+                "account_age_days": max((timestamp - state.first_seen).days, 0),
+                "distance_from_home": distance,
+            }
+
+    def record(self, transaction_data: dict):
+        """Fold a scored transaction into its customer's running features."""
+        customer_id = transaction_data.get("customer_id")
+        if not customer_id:
+            return
+        timestamp = _event_time(transaction_data)
+        amount = float(transaction_data.get("amount") or 0)
+
+        with self._lock:
+            state = self._get_or_create(customer_id, timestamp)
+            state.count += 1
+            state.mean_amount += (amount - state.mean_amount) / state.count
+            state.first_seen = min(state.first_seen, timestamp)
+            self._prune(state, timestamp)
+            state.recent.append(timestamp)
+
+            coordinates = _coordinates(transaction_data.get("location"))
+            if coordinates:
+                state.location_count += 1
+                if state.home is None:
+                    state.home = coordinates
+                else:
+                    weight = 1 / state.location_count
+                    state.home = (
+                        state.home[0] + (coordinates[0] - state.home[0]) * weight,
+                        state.home[1] + (coordinates[1] - state.home[1]) * weight,
+                    )
+
+    def enrich(self, transaction_data: dict) -> dict:
+        """
+        Fill store-backed features the caller did not supply, then record the
+        transaction. Caller-supplied values always win.
+        """
+        missing = [name for name in STORE_FEATURES if transaction_data.get(name) is None]
+        enriched = transaction_data
+        if missing and transaction_data.get("customer_id"):
+            features = self.get_features(
+                transaction_data["customer_id"],
+                _event_time(transaction_data),
+                transaction_data.get("location"),
+            )
+            if features:
+                enriched = {**transaction_data, **{name: features[name] for name in missing}}
+        self.record(transaction_data)
+        return enriched
+
+    def bootstrap(self, db: Session):
+        """Seed the store from the transactions table with aggregate queries."""
+        now = db.query(func.max(Transaction.timestamp)).scalar()
+        if now is None:
+            return
+
+        aggregates = (
+            db.query(
+                Transaction.customer_id,
+                func.count(Transaction.id),
+                func.avg(Transaction.amount),
+                func.min(Transaction.timestamp),
+            )
+            .group_by(Transaction.customer_id)
+            .order_by(func.max(Transaction.timestamp).desc())
+            .limit(self.max_customers)
+            .all()
+        )
+        recent = (
+            db.query(Transaction.customer_id, Transaction.timestamp)
+            .filter(Transaction.timestamp >= now - self.velocity_window)
+            .order_by(Transaction.timestamp)
+            .yield_per(10_000)
+        )
+
+        with self._lock:
+            self._customers.clear()
+            # Least recently active first, so LRU order matches activity
+            for customer_id, count, avg_amount, first_seen in reversed(aggregates):
+                if customer_id is None:
+                    continue
+                state = _CustomerState(first_seen or now)
+                state.count = count
+                state.mean_amount = float(avg_amount or 0)
+                self._customers[customer_id] = state
+            for customer_id, timestamp in recent:
+                state = self._customers.get(customer_id)
+                if state is not None and timestamp is not None:
+                    state.recent.append(timestamp)
+
+        logger.info(f"Feature store bootstrapped with {len(self._customers)} customers")
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "customers": len(self._customers),
+            "max_customers": self.max_customers,
+            "evictions": self.evictions,
+        }
+
+
+# Global instance
+feature_store = CustomerFeatureStore(
+    max_customers=settings.FEATURE_STORE_MAX_CUSTOMERS,
+    velocity_window_seconds=settings.FEATURE_STORE_VELOCITY_WINDOW_SECONDS,
+)
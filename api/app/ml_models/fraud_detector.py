@@ -1,4 +1,7 @@
+import gc
 import os
+import threading
+from collections.abc import Callable
 
 import joblib
 import numpy as np
@@ -6,70 +9,205 @@ from sklearn.ensemble import GradientBoostingClassifier
 from sklearn.preprocessing import StandardScaler
 
 from app.config import settings
-from app.utils.helpers import utcnow
+from app.ml_models.model_registry import ModelRegistry, ModelWatcher
+from app.ml_models.tree_engine import CompiledTreeEnsemble
+from app.utils.helpers import parse_timestamp
 from app.utils.logger import logger
 
+DEFAULT_FEATURE_NAMES = [
+    "amount",
+    "hour",
+    "day_of_week",
+    "is_weekend",
+    "transaction_velocity",
+    "avg_transaction_amount",
+    "account_age_days",
+    "distance_from_home",
+    "new_device",
+    "vpn_usage",
+    "failed_login_attempts",
+]
+
+
+class LoadedModel:
+    """
+    Everything needed to score with one model version. FraudDetector swaps whole
+    instances, so a prediction never mixes the model of one version with the scaler
+    or feature order of another.
+
+    When the compiled engine is opened from memory-mapped arrays, the sklearn model
+    and scaler are only unpickled (via loader) the first time a batch needs them, so
+    single-row workers never hold a private copy.
+    """
+
+    __slots__ = (
+        "_model",
+        "_scaler",
+        "_loader",
+        "_loader_lock",
+        "feature_names",
+        "engine",
+        "version",
+    )
+
+    def __init__(
+        self,
+        model,
+        scaler: StandardScaler | None,
+        feature_names: list[str],
+        version: str,
+        engine: CompiledTreeEnsemble | None = None,
+        loader: Callable[[], tuple[object, StandardScaler]] | None = None,
+    ):
+        self._model = model
+        self._scaler = scaler
+        self._loader = loader
+        self._loader_lock = threading.Lock()
+        self.feature_names = list(feature_names)
+        self.version = version
+        self.engine = engine
+        if engine is not None or settings.FRAUD_INFERENCE_BACKEND != "compiled":
+            return
+        if CompiledTreeEnsemble.supports(model):
+            self.engine = CompiledTreeEnsemble.compile(model, scaler, self.feature_names)
+        else:
+            logger.info(f"{type(model).__name__} cannot be compiled, using sklearn inference")
+
+    def _materialize(self):
+        if self._model is None and self._loader is not None:
+            with self._loader_lock:
+                if self._model is None:
+                    self._model, self._scaler = self._loader()
+
+    @property
+    def model(self):
+        self._materialize()
+        return self._model
+
+    @property
+    def scaler(self) -> StandardScaler | None:
+        self._materialize()
+        return self._scaler
+
+    def sklearn_parts(self) -> tuple[object, StandardScaler | None]:
+        """The sklearn model and scaler, unpickling a throwaway copy if not loaded yet"""
+        if self._model is None and self._loader is not None:
+            return self._loader()
+        return self._model, self._scaler
+
 
 class FraudDetector:
     """ML Model for fraud detection"""
 
     def __init__(self):
-        self.model = None
-        self.scaler = StandardScaler()
-        self.feature_names = [
-            "amount",
-            "hour",
-            "day_of_week",
-            "is_weekend",
-            "transaction_velocity",
-            "avg_transaction_amount",
-            "account_age_days",
-            "distance_from_home",
-            "new_device",
-            "vpn_usage",
-            "failed_login_attempts",
-        ]
         self.model_path = os.path.join(settings.MODEL_PATH, "fraud_detector.pkl")
+        self.registry = ModelRegistry(settings.MODEL_PATH)
+        self._active: LoadedModel | None = None
+        self._load_lock = threading.RLock()
 
-    def train(self, X_train: np.ndarray, y_train: np.ndarray):
+    @property
+    def model(self):
+        return self._active.model if self._active else None
+
+    @property
+    def scaler(self) -> StandardScaler | None:
+        return self._active.scaler if self._active else None
+
+    @property
+    def engine(self) -> CompiledTreeEnsemble | None:
+        return self._active.engine if self._active else None
+
+    @property
+    def feature_names(self) -> list[str]:
+        return self._active.feature_names if self._active else list(DEFAULT_FEATURE_NAMES)
+
+    @property
+    def version(self) -> str | None:
+        return self._active.version if self._active else None
+
+    def train(self, X_train: np.ndarray, y_train: np.ndarray, model=None):
         logger.info("Training fraud detection model...")
-        self.model = GradientBoostingClassifier(
-            n_estimators=200, learning_rate=0.1, max_depth=5, random_state=42
-        )
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        self.model.fit(X_train_scaled, y_train)
+        if model is None:
+            model = GradientBoostingClassifier(
+                n_estimators=200, learning_rate=0.1, max_depth=5, random_state=42
+            )
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
+        model.fit(X_train_scaled, y_train)
+        self._active = LoadedModel(model, scaler, self.feature_names, version="unsaved")
         logger.info("Model training completed")
 
-    def predict(self, features: dict[str, float]) -> tuple[bool, float]:
-        if self.model is None:
-            self.load_model()
+    def compile_model(self):
+        """Rebuild the compiled engine, e.g. after FRAUD_INFERENCE_BACKEND changes."""
+        active = self._active
+        if active is not None:
+            self._active = LoadedModel(
+                active.model, active.scaler, active.feature_names, active.version
+            )
+
+    def _ensure_loaded(self) -> LoadedModel:
+        active = self._active
+        if active is None:
+            # Concurrent first requests must not each load (and fit) a model
+            with self._load_lock:
+                if self._active is None:
+                    self.load_model()
+                active = self._active
+        return active
 
-        feature_vector = np.array([features.get(f, 0) for f in self.feature_names]).reshape(1, -1)
-        feature_vector_scaled = self.scaler.transform(feature_vector)
+    def predict(self, features: dict[str, float]) -> tuple[bool, float]:
+        active = self._ensure_loaded()
+        if active.engine is None:
+            return self._predict_batch(active, [features])[0]
 
         try:
-            fraud_probability = float(self.model.predict_proba(feature_vector_scaled)[0][1])
-            is_fraud = bool(fraud_probability >= settings.FRAUD_DETECTION_THRESHOLD)
+            fraud_probability = active.engine.predict_proba_one(features)
         except Exception as e:
             logger.error(f"Prediction error: {e}")
             # Fallback for safety
             return False, 0.0
 
-        return is_fraud, fraud_probability
+        return bool(fraud_probability >= settings.FRAUD_DETECTION_THRESHOLD), fraud_probability
+
+    def predict_batch(self, features_list: list[dict[str, float]]) -> list[tuple[bool, float]]:
+        """Score many feature dicts with a single predict_proba call, preserving order."""
+        if not features_list:
+            return []
+        return self._predict_batch(self._ensure_loaded(), features_list)
+
+    def _predict_batch(
+        self, active: LoadedModel, features_list: list[dict[str, float]]
+    ) -> list[tuple[bool, float]]:
+        feature_matrix = self.build_feature_matrix(features_list, active.feature_names)
+        feature_matrix_scaled = active.scaler.transform(feature_matrix)
+
+        try:
+            fraud_probabilities = active.model.predict_proba(feature_matrix_scaled)[:, 1]
+        except Exception as e:
+            logger.error(f"Prediction error: {e}")
+            # Fallback for safety
+            return [(False, 0.0)] * len(features_list)
+
+        threshold = settings.FRAUD_DETECTION_THRESHOLD
+        return [
+            (bool(probability >= threshold), float(probability))
+            for probability in fraud_probabilities
+        ]
+
+    def build_feature_matrix(
+        self, features_list: list[dict[str, float]], feature_names: list[str] | None = None
+    ) -> np.ndarray:
+        """Stack feature dicts into an (n, n_features) array in feature_names order."""
+        feature_names = feature_names or self.feature_names
+        return np.array(
+            [[features.get(f, 0) for f in feature_names] for features in features_list],
+            dtype=float,
+        ).reshape(len(features_list), len(feature_names))
 
     def extract_features(self, transaction_data: dict) -> dict[str, float]:
         features = {}
         features["amount"] = transaction_data.get("amount", 0)
-        from datetime import datetime
-
-        timestamp = transaction_data.get("timestamp", utcnow())
-
-        # Convert string timestamp if necessary
-        if isinstance(timestamp, str):
-            try:
-                timestamp = datetime.fromisoformat(timestamp)
-            except ValueError:
-                timestamp = utcnow()
+        timestamp = parse_timestamp(transaction_data.get("timestamp"))
 
         features["hour"] = timestamp.hour
         features["day_of_week"] = timestamp.weekday()
@@ -83,30 +221,127 @@ class FraudDetector:
         features["failed_login_attempts"] = transaction_data.get("failed_login_attempts", 0)
         return features
 
-    def save_model(self):
-        os.makedirs(settings.MODEL_PATH, exist_ok=True)
-        joblib.dump(
-            {"model": self.model, "scaler": self.scaler, "feature_names": self.feature_names},
-            self.model_path,
+    def save_model(self, version: str | None = None, activate: bool = True) -> str:
+        """
+        Publish the active model as a new registry version and optionally make it
+        CURRENT. Tree models are also written as flat .npy arrays that serving
+        workers memory-map (see MODEL_MMAP_MODE).
+        """
+        active = self._ensure_loaded()
+        engine = active.engine
+        if engine is None and CompiledTreeEnsemble.supports(active.model):
+            engine = CompiledTreeEnsemble.compile(active.model, active.scaler, active.feature_names)
+
+        version = self.registry.save(
+            {
+                "model": active.model,
+                "scaler": active.scaler,
+                "feature_names": active.feature_names,
+            },
+            version,
+            write_extra=(
+                (lambda staging: engine.save(os.path.join(staging, ModelRegistry.ENGINE_DIR)))
+                if engine is not None
+                else None
+            ),
         )
+        if activate:
+            self.registry.set_current(version)
+        self._active = LoadedModel(
+            active.model, active.scaler, active.feature_names, version, engine=active.engine
+        )
+        return version
+
+    def _read_model(self, version: str | None = None) -> LoadedModel:
+        """Load a version without activating it: registry, then legacy file, then default."""
+        version = version or self.registry.current_version()
+        if version is not None:
+            engine_dir = self.registry.engine_dir(version)
+            if (
+                settings.MODEL_MMAP_MODE
+                and settings.FRAUD_INFERENCE_BACKEND == "compiled"
+                and os.path.isdir(engine_dir)
+            ):
+                engine = CompiledTreeEnsemble.load(engine_dir, mmap_mode=settings.MODEL_MMAP_MODE)
+                logger.info(f"Model version {version} memory-mapped from {engine_dir}")
+                return LoadedModel(
+                    None,
+                    None,
+                    engine.feature_names,
+                    version,
+                    engine=engine,
+                    loader=lambda: self._unpickle(version),
+                )
+
+            data = self.registry.load(version)
+            logger.info(f"Model version {version} loaded from {self.registry.directory}")
+            return LoadedModel(data["model"], data["scaler"], data["feature_names"], version)
 
-    def load_model(self):
         if os.path.exists(self.model_path):
             data = joblib.load(self.model_path)
-            self.model = data["model"]
-            self.scaler = data["scaler"]
-            self.feature_names = data["feature_names"]
             logger.info(f"Model loaded from {self.model_path}")
-        else:
-            logger.warning("No saved model found, using default model")
-            self.model = GradientBoostingClassifier(random_state=42)
+            return LoadedModel(data["model"], data["scaler"], data["feature_names"], "legacy")
+
+        logger.warning("No saved model found, using default model")
+        model = GradientBoostingClassifier(random_state=42)
+        scaler = StandardScaler()
+
+        # Fit on one sample per class so the classifier exposes both labels
+        X_dummy = np.zeros((2, len(DEFAULT_FEATURE_NAMES)))
+        y_dummy = np.array([0, 1])
+
+        scaler.fit(X_dummy)
+        model.fit(X_dummy, y_dummy)
+        return LoadedModel(model, scaler, DEFAULT_FEATURE_NAMES, "default")
+
+    def _unpickle(self, version: str) -> tuple[object, StandardScaler]:
+        data = self.registry.load(version)
+        logger.info(f"sklearn model for version {version} loaded for batch scoring")
+        return data["model"], data["scaler"]
+
+    def load_model(self, version: str | None = None):
+        with self._load_lock:
+            self._active = self._read_model(version)
+
+    def reload(self, version: str | None = None) -> str:
+        """
+        Load a version in the calling thread, warm it up with a test prediction and
+        swap it in. Requests in flight finish on the model they started with.
+        """
+        candidate = self._read_model(version)
+        # Warm-up calls the model directly so a broken artifact raises before the swap.
+        # Batches score with the sklearn model, which a memory-mapped version only
+        # unpickles on its first batch; check a throwaway copy of it too.
+        warmup = dict.fromkeys(candidate.feature_names, 0.0)
+        if candidate.engine is not None:
+            candidate.engine.predict_proba_one(warmup)
+        model, scaler = candidate.sklearn_parts()
+        matrix = self.build_feature_matrix([warmup], candidate.feature_names)
+        model.predict_proba(scaler.transform(matrix))
+
+        with self._load_lock:
+            previous = self.version
+            self._active = candidate
+        logger.info(f"Fraud model swapped: {previous} -> {candidate.version}")
+        return candidate.version
 
-            # Fit on one sample per class so the classifier exposes both labels
-            X_dummy = np.zeros((2, len(self.feature_names)))
-            y_dummy = np.array([0, 1])
 
-            self.scaler.fit(X_dummy)
-            self.model.fit(X_dummy, y_dummy)
+def preload_for_fork():
+    """
+    Load the active model in a pre-fork server's master process (e.g. gunicorn
+    --preload) so forked workers share its pages copy-on-write. Moving everything
+    allocated so far into the permanent GC generation keeps the collector from
+    writing to those objects' headers and un-sharing the pages.
+    """
+    fraud_detector.load_model()
+    # Materialize the sklearn model now rather than separately in every worker
+    _ = fraud_detector.model
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Fraud model {fraud_detector.version} preloaded for forked workers")
 
 
 fraud_detector = FraudDetector()
+model_watcher = ModelWatcher(
+    fraud_detector, fraud_detector.registry, settings.MODEL_WATCH_INTERVAL_SECONDS
+)
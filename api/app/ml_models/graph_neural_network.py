@@ -1,8 +1,73 @@
+import warnings
+
 import networkx as nx
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
+from app.config import settings
+from app.ml_models.centrality import sampled_centrality
+
+# torch warns once per process that CSR tensors are beta; sparse @ dense is stable
+warnings.filterwarnings("ignore", message="Sparse CSR tensor support is in beta")
+
+# Input features of FraudGNN per node: node type one-hot, then log1p of degree and of
+# summed edge weight (transaction amounts)
+NODE_FEATURES = ("customer", "card", "ip", "device", "log_degree", "log_weight")
+
+
+def normalized_adjacency(G: nx.Graph, nodelist: list) -> torch.Tensor:
+    """
+    GCN propagation matrix D^(-1/2) (A + I) D^(-1/2) of G, unweighted, as a sparse CSR
+    float32 tensor with rows and columns in nodelist order. Memory is O(N + E) where a
+    dense matrix takes O(N^2).
+    """
+    n = len(nodelist)
+    index = {node: i for i, node in enumerate(nodelist)}
+    ends = np.fromiter(
+        (index[node] for edge in G.edges() for node in edge),
+        dtype=np.int64,
+        count=2 * G.number_of_edges(),
+    ).reshape(-1, 2)
+    # Self-loops are added once for every node below
+    ends = ends[ends[:, 0] != ends[:, 1]]
+    loops = np.arange(n, dtype=np.int64)
+    rows = np.concatenate([ends[:, 0], ends[:, 1], loops])
+    columns = np.concatenate([ends[:, 1], ends[:, 0], loops])
+
+    order = np.argsort(rows, kind="stable")
+    rows, columns = rows[order], columns[order]
+    counts = np.bincount(rows, minlength=n)
+    scale = (1 / np.sqrt(counts)).astype(np.float32)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return torch.sparse_csr_tensor(
+        torch.from_numpy(indptr),
+        torch.from_numpy(columns),
+        torch.from_numpy(scale[rows] * scale[columns]),
+        size=(n, n),
+    )
+
+
+def node_features(G: nx.Graph, nodelist: list) -> torch.Tensor:
+    """NODE_FEATURES of each node in nodelist, as an N x len(NODE_FEATURES) float32 tensor"""
+    n = len(nodelist)
+    x = np.zeros((n, len(NODE_FEATURES)), dtype=np.float32)
+    type_column = {node_type: i for i, node_type in enumerate(NODE_FEATURES[:4])}
+    types = np.fromiter(
+        (type_column.get(G.nodes[node].get("node_type"), -1) for node in nodelist),
+        dtype=np.int64,
+        count=n,
+    )
+    known = np.flatnonzero(types >= 0)
+    x[known, types[known]] = 1.0
+    degrees = G.degree(nodelist)
+    x[:, 4] = np.log1p(np.fromiter((d for _, d in degrees), dtype=np.float32, count=n))
+    weights = G.degree(nodelist, weight="weight")
+    x[:, 5] = np.log1p(np.fromiter((w for _, w in weights), dtype=np.float32, count=n))
+    return torch.from_numpy(x)
+
 
 class GraphConvLayer(nn.Module):
     """Graph Convolutional Layer"""
@@ -12,7 +77,7 @@ class GraphConvLayer(nn.Module):
         self.linear = nn.Linear(in_features, out_features)
 
     def forward(self, x: torch.Tensor, adj: torch.Tensor) -> torch.Tensor:
-        # GCN: H^(l+1) = σ(D^(-1/2) A D^(-1/2) H^(l) W^(l))
+        # GCN: H^(l+1) = σ(D^(-1/2) A D^(-1/2) H^(l) W^(l)); adj is dense or sparse CSR
         out = torch.mm(adj, x)
         out = self.linear(out)
         return F.relu(out)
@@ -39,51 +104,116 @@ class GraphAnalyzer:
     """Analyze transaction graphs for fraud patterns"""
 
     def __init__(self):
-        self.model = FraudGNN()
+        self.model = FraudGNN(input_dim=len(NODE_FEATURES))
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model.to(self.device)
+        # Only ever used for inference: dropout off
+        self.model.eval()
+        if settings.GNN_NUM_THREADS > 0:
+            torch.set_num_threads(settings.GNN_NUM_THREADS)
+
+    def node_probabilities(self, G: nx.Graph) -> tuple[list, torch.Tensor]:
+        """
+        FraudGNN class probabilities per node of G: the nodes, and an N x 4 tensor with
+        their rows in that order. Runs on the sparse normalized adjacency without
+        autograd, so memory grows with nodes plus edges.
+        """
+        nodes = list(G)
+        if not nodes:
+            return nodes, torch.empty((0, self.model.fc.out_features))
+        adj = normalized_adjacency(G, nodes).to(self.device)
+        x = node_features(G, nodes).to(self.device)
+        with torch.inference_mode():
+            return nodes, self.model(x, adj).cpu()
 
     def build_transaction_graph(self, transactions: list[dict]) -> nx.Graph:
         """Build a graph from transaction data"""
         G = nx.Graph()
 
         for txn in transactions:
-            # Add nodes
-            customer_id = txn["customer_id"]
-            card_id = txn.get("card_id", "unknown")
-            ip_address = txn.get("ip_address", "unknown")
+            self.add_transaction(G, txn)
 
-            G.add_node(customer_id, node_type="customer")
-            G.add_node(card_id, node_type="card")
-            G.add_node(ip_address, node_type="ip")
+        return G
 
-            # Add edges
-            G.add_edge(customer_id, card_id, weight=txn["amount"])
-            G.add_edge(customer_id, ip_address, weight=1.0)
+    def transaction_nodes(self, txn: dict) -> tuple[str, str, str]:
+        """A transaction's customer, card and IP nodes; a missing card or IP is unknown"""
+        return (
+            txn["customer_id"],
+            txn.get("card_id") or "unknown",
+            txn.get("ip_address") or "unknown",
+        )
 
-        return G
+    def add_transaction(self, G: nx.Graph, txn: dict) -> list[tuple]:
+        """Add a transaction's customer, card and IP nodes and edges to G; returns new edges"""
+        # Add nodes
+        customer_id, card_id, ip_address = self.transaction_nodes(txn)
 
-    def detect_fraud_rings(self, G: nx.Graph) -> list[list[str]]:
-        """Detect potential fraud rings using community detection"""
-        communities = list(nx.community.greedy_modularity_communities(G))
+        G.add_node(customer_id, node_type="customer")
+        G.add_node(card_id, node_type="card")
+        G.add_node(ip_address, node_type="ip")
 
-        fraud_rings = []
-        for community in communities:
-            # Check if community shows suspicious patterns
-            subgraph = G.subgraph(community)
+        # Add edges
+        new_edges = [
+            (customer_id, other)
+            for other in dict.fromkeys((card_id, ip_address))
+            if not G.has_edge(customer_id, other)
+        ]
+        G.add_edge(customer_id, card_id, weight=txn["amount"])
+        G.add_edge(customer_id, ip_address, weight=1.0)
 
-            # Criteria for fraud ring:
-            # 1. Multiple customers sharing cards/IPs
-            # 2. High connectivity
-            # 3. Similar transaction patterns
+        return new_edges
 
-            if len(community) > 3:  # At least 4 entities
-                density = nx.density(subgraph)
-                if density > 0.5:  # High connectivity
-                    fraud_rings.append(list(community))
+    def detect_fraud_rings(self, G: nx.Graph) -> list[list[str]]:
+        """
+        Detect potential fraud rings using community detection. Communities never span
+        connected components, so each component is checked on its own: a component that
+        already meets the ring criteria is one ring, and only components of up to
+        GRAPH_RING_REFINE_MAX_NODES that contain a cycle are split by modularity
+        (superlinear) into candidate communities. In a tree no 4 nodes are dense enough.
+        Larger components are left to the streaming ring detector.
+        """
+        fraud_rings = []
+        for component in nx.connected_components(G):
+            size = len(component)
+            if size <= 3:
+                continue
+            edges = sum(degree for _, degree in G.degree(component)) // 2
+            if edges > size * (size - 1) / 4:  # density > 0.5
+                fraud_rings.append(list(component))
+            elif size <= edges and size <= settings.GRAPH_RING_REFINE_MAX_NODES:
+                communities = nx.community.greedy_modularity_communities(G.subgraph(component))
+                fraud_rings.extend(
+                    list(community)
+                    for community in communities
+                    if self._is_fraud_ring(G, community)
+                )
 
         return fraud_rings
 
+    @staticmethod
+    def _is_fraud_ring(G: nx.Graph, community: set) -> bool:
+        # Criteria for fraud ring:
+        # 1. Multiple customers sharing cards/IPs
+        # 2. High connectivity
+        # 3. Similar transaction patterns
+
+        # At least 4 entities, with high connectivity
+        return len(community) > 3 and nx.density(G.subgraph(community)) > 0.5
+
+    def centrality(self, G: nx.Graph) -> tuple[dict, dict]:
+        """
+        Betweenness and closeness centrality: exact up to GRAPH_EXACT_CENTRALITY_MAX_NODES
+        nodes, sampled above it (both are O(V*E) exactly)
+        """
+        if G.number_of_nodes() <= settings.GRAPH_EXACT_CENTRALITY_MAX_NODES:
+            return nx.betweenness_centrality(G), nx.closeness_centrality(G)
+        return sampled_centrality(
+            G,
+            samples=settings.GRAPH_CENTRALITY_SAMPLES,
+            time_budget_seconds=settings.GRAPH_CENTRALITY_TIME_BUDGET_SECONDS,
+            seed=settings.GRAPH_CENTRALITY_SEED,
+        )
+
     def calculate_node_risk(self, G: nx.Graph, node: str) -> float:
         """Calculate risk score for a node based on graph features"""
         if node not in G:
@@ -95,8 +225,9 @@ class GraphAnalyzer:
 
         # Centrality measures
         try:
-            betweenness = nx.betweenness_centrality(G)[node]
-            closeness = nx.closeness_centrality(G)[node]
+            betweenness_map, closeness_map = self.centrality(G)
+            betweenness = betweenness_map[node]
+            closeness = closeness_map[node]
         except Exception:
             betweenness = 0
             closeness = 0
@@ -108,14 +239,24 @@ class GraphAnalyzer:
 
         return risk
 
-    def calculate_node_risks(self, G: nx.Graph) -> dict[str, float]:
-        """Calculate risk scores for all nodes efficiently"""
-        if G.number_of_nodes() == 0:
+    def calculate_node_risks(self, G: nx.Graph, total_nodes: int | None = None) -> dict[str, float]:
+        """
+        Calculate risk scores for all nodes efficiently. With total_nodes, G is a union
+        of whole components of a graph that many nodes large, and centrality is
+        normalized as it would be over that graph (paths never leave a component).
+        """
+        n = G.number_of_nodes()
+        if n == 0:
             return {}
 
         try:
-            betweenness = nx.betweenness_centrality(G)
-            closeness = nx.closeness_centrality(G)
+            betweenness, closeness = self.centrality(G)
+            if total_nodes and total_nodes > max(n, 2):
+                # Move networkx's 1/((n-1)(n-2)) and 1/(n-1) normalizations to total_nodes
+                scale = (n - 1) * (n - 2) / ((total_nodes - 1) * (total_nodes - 2))
+                betweenness = {node: value * scale for node, value in betweenness.items()}
+                scale = (n - 1) / (total_nodes - 1)
+                closeness = {node: value * scale for node, value in closeness.items()}
         except Exception:
             betweenness = {node: 0 for node in G.nodes()}
             closeness = {node: 0 for node in G.nodes()}
@@ -0,0 +1,60 @@
+from collections.abc import Callable
+from concurrent.futures import Future
+
+from app.config import settings
+from app.ml_models.fraud_detector import fraud_detector
+from app.utils.batching import BatchWorker
+from app.utils.logger import logger
+
+
+class MicroBatcher(BatchWorker):
+    """
+    Coalesce concurrent single-row predictions into one vectorized call.
+
+    Callers block in predict(), or await the future submit() returns, while the
+    worker thread collects requests for up to max_wait_ms (or until max_batch_size
+    arrive) and scores them with predict_batch. Async callers should submit() from
+    the event loop: a caller blocked in predict() holds its thread, so a pool of N
+    threads can never fill a batch larger than N.
+    """
+
+    thread_name = "fraud-micro-batcher"
+
+    def __init__(
+        self,
+        predict_batch: Callable[[list[dict[str, float]]], list[tuple[bool, float]]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+    ):
+        super().__init__(batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        self.predict_batch = predict_batch
+
+    def submit(self, features: dict[str, float]) -> Future:
+        """Queue one prediction; the future resolves to (is_fraud, probability)."""
+        if not self.running:
+            self.start()
+        future: Future = Future()
+        self._put((features, future))
+        return future
+
+    def predict(self, features: dict[str, float]) -> tuple[bool, float]:
+        return self.submit(features).result()
+
+    def _flush(self, batch: list[tuple[dict[str, float], Future]]):
+        try:
+            results = self.predict_batch([features for features, _ in batch])
+            for (_, future), result in zip(batch, results, strict=True):
+                future.set_result(result)
+        except Exception as e:
+            logger.error(f"Micro-batch prediction error: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+
+# Global instance
+fraud_batcher = MicroBatcher(
+    fraud_detector.predict_batch,
+    max_batch_size=settings.FRAUD_MICROBATCH_MAX_SIZE,
+    max_wait_ms=settings.FRAUD_MICROBATCH_MAX_WAIT_MS,
+)
@@ -0,0 +1,154 @@
+import os
+import shutil
+import threading
+from collections.abc import Callable
+from typing import Any
+
+import joblib
+
+from app.utils.helpers import utcnow
+from app.utils.logger import logger
+
+
+class ModelRegistry:
+    """
+    Versioned model artifacts under <root>/<name>/<version>/.
+
+    A version directory is only ever published whole (written to a temp directory,
+    then renamed), and the CURRENT file names the version serving processes should
+    run. Without a CURRENT file the newest version wins.
+    """
+
+    ARTIFACT_FILE = "model.pkl"
+    ENGINE_DIR = "engine"
+    CURRENT_FILE = "CURRENT"
+
+    def __init__(self, root: str, name: str = "fraud_detector"):
+        self.root = root
+        self.name = name
+
+    @property
+    def directory(self) -> str:
+        return os.path.join(self.root, self.name)
+
+    def version_dir(self, version: str) -> str:
+        return os.path.join(self.directory, version)
+
+    def artifact_path(self, version: str) -> str:
+        return os.path.join(self.version_dir(version), self.ARTIFACT_FILE)
+
+    def engine_dir(self, version: str) -> str:
+        return os.path.join(self.version_dir(version), self.ENGINE_DIR)
+
+    def has_version(self, version: str) -> bool:
+        return os.path.isfile(self.artifact_path(version))
+
+    def versions(self) -> list[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            entry
+            for entry in os.listdir(self.directory)
+            if not entry.startswith(".") and self.has_version(entry)
+        )
+
+    def current_version(self) -> str | None:
+        pointer = os.path.join(self.directory, self.CURRENT_FILE)
+        try:
+            with open(pointer) as f:
+                version = f.read().strip()
+            if version and self.has_version(version):
+                return version
+        except FileNotFoundError:
+            pass
+        versions = self.versions()
+        return versions[-1] if versions else None
+
+    @staticmethod
+    def new_version() -> str:
+        return utcnow().strftime("%Y%m%dT%H%M%S%f")
+
+    def save(
+        self,
+        payload: dict[str, Any],
+        version: str | None = None,
+        write_extra: Callable[[str], None] | None = None,
+    ) -> str:
+        """Publish a version; write_extra may add files to the staging directory."""
+        version = version or self.new_version()
+        if self.has_version(version):
+            raise FileExistsError(f"Model version {version} already exists")
+
+        os.makedirs(self.directory, exist_ok=True)
+        staging = os.path.join(self.directory, f".staging-{version}")
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        try:
+            joblib.dump(payload, os.path.join(staging, self.ARTIFACT_FILE))
+            if write_extra is not None:
+                write_extra(staging)
+            os.replace(staging, self.version_dir(version))
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        logger.info(f"Model version {version} saved to {self.version_dir(version)}")
+        return version
+
+    def load(self, version: str) -> dict[str, Any]:
+        if not self.has_version(version):
+            raise FileNotFoundError(f"Model version {version} not found in {self.directory}")
+        return joblib.load(self.artifact_path(version))
+
+    def set_current(self, version: str):
+        if not self.has_version(version):
+            raise FileNotFoundError(f"Model version {version} not found in {self.directory}")
+        os.makedirs(self.directory, exist_ok=True)
+        pointer = os.path.join(self.directory, self.CURRENT_FILE)
+        staging = f"{pointer}.{os.getpid()}.tmp"
+        with open(staging, "w") as f:
+            f.write(version)
+        os.replace(staging, pointer)
+
+
+class ModelWatcher:
+    """Poll the registry and hot-reload the detector when CURRENT changes."""
+
+    def __init__(self, detector, registry: ModelRegistry, interval_seconds: float):
+        self.detector = detector
+        self.registry = registry
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._failed_version: str | None = None
+
+    def start(self):
+        if self.interval_seconds <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def check(self) -> bool:
+        """Reload if the registry points at a different version. Returns True on swap."""
+        current = self.registry.current_version()
+        if current is None or current in (self.detector.version, self._failed_version):
+            return False
+        try:
+            self.detector.reload(current)
+        except Exception as e:
+            # Remember the bad version so it is not retried (and logged) every poll
+            self._failed_version = current
+            logger.error(f"Hot reload of model version {current} failed: {e}")
+            return False
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self.check()
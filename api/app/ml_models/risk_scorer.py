@@ -1,5 +1,15 @@
 import re
 
+import numpy as np
+
+from app.ml_models.rule_engine import risk_rules
+
+# Transactions per velocity window at which transaction_velocity adds its full weight,
+# the "High transaction velocity" risk factor threshold
+HIGH_VELOCITY = 10
+_TRUE_STRINGS = ("true", "yes", "y", "t")
+_FALSE_STRINGS = ("false", "no", "n", "f")
+
 
 class RiskScorer:
     """Calculate risk scores for customers"""
@@ -24,66 +34,131 @@ class RiskScorer:
             "account_age": -10,  # Negative weight (older = safer)
         }
 
+    def risk_term(self, factor: str, value) -> float:
+        """One factor's contribution to calculate_risk_score"""
+        weight = self.risk_weights[factor]
+        if factor == "account_age":
+            # Account age in days (older is safer)
+            age_years = self._normalize_account_age_days(value) / 365
+            return weight * min(age_years, 5) / 5
+        # Boolean or count factors
+        if isinstance(value, bool):
+            return weight if value else 0
+        if factor == "transaction_velocity":
+            return weight * min(value / HIGH_VELOCITY, 1)
+        return weight * min(value, 1)
+
+    def score_from_terms(self, terms) -> int:
+        """Base score plus terms (in risk_weights order), clamped between 0 and 100"""
+        score = 50  # Base score
+        for term in terms:
+            score += term
+        return max(0, min(100, int(score)))
+
     def calculate_risk_score(self, customer_data: dict) -> int:
         """
         Calculate risk score (0-100) for a customer
         """
-        score = 50  # Base score
-
-        # Apply risk factors
-        for factor, weight in self.risk_weights.items():
-            if factor in customer_data:
-                value = customer_data[factor]
-
-                if factor == "account_age":
-                    # Account age in days (older is safer)
-                    age_days = self._normalize_account_age_days(value)
-                    age_years = age_days / 365
-                    score += weight * min(age_years, 5) / 5
-                else:
-                    # Boolean or count factors
-                    if isinstance(value, bool):
-                        score += weight if value else 0
-                    else:
-                        score += weight * min(value, 1)
-
-        # Clamp score between 0 and 100
-        score = max(0, min(100, int(score)))
-
-        return score
+        return self.score_from_terms(
+            self.risk_term(factor, customer_data[factor])
+            for factor in self.risk_weights
+            if factor in customer_data
+        )
+
+    def rule_inputs(self, customer_data: dict) -> dict[str, float]:
+        """Values the risk factor rules read from customer_data"""
+        # Flags may arrive as any truthy value; the rules compare numbers
+        row = {
+            name: value if isinstance(value, (int, float)) else bool(value)
+            for name in risk_rules.feature_names
+            if (value := customer_data.get(name)) is not None
+        }
+        if "account_age" in customer_data:
+            row["account_age"] = self._normalize_account_age_days(customer_data["account_age"])
+        return row
 
     def identify_risk_factors(self, customer_data: dict) -> list[str]:
         """
-        Identify specific risk factors for a customer
+        Identify specific risk factors for a customer (rules in RISK_RULES_PATH)
         """
-        risk_factors = []
-
-        if customer_data.get("failed_logins", 0) > 3:
-            risk_factors.append("Multiple failed logins")
-
-        if customer_data.get("new_device", False):
-            risk_factors.append("New device detected")
-
-        if customer_data.get("location_change", False):
-            risk_factors.append("Unusual location")
+        factors, _ = risk_rules.apply_one(self.rule_inputs(customer_data))
+        return factors
 
-        if customer_data.get("transaction_velocity", 0) > 10:
-            risk_factors.append("High transaction velocity")
-
-        if customer_data.get("high_value_transaction", False):
-            risk_factors.append("High-value purchases")
-
-        if customer_data.get("chargeback_history", 0) > 0:
-            risk_factors.append("Chargeback history")
-
-        if customer_data.get("vpn_usage", False):
-            risk_factors.append("VPN usage")
-
-        account_age_days = self._normalize_account_age_days(customer_data.get("account_age", 365))
-        if account_age_days < 30:
-            risk_factors.append("New account")
+    def coerce_input(self, factor: str, value) -> bool | float | None:
+        """
+        A risk input as the scorer reads it: account age in days, flags and counts as
+        bools or numbers, numeric and yes/no strings parsed. None if value is neither.
+        """
+        if value is None or isinstance(value, bool):
+            return None if factor == "account_age" else value
+        if isinstance(value, (int, float)):
+            return None if np.isnan(value) else float(value)
+        if not isinstance(value, str):
+            return None
+        if factor == "account_age":
+            return self._normalize_account_age_days(value) if re.search(r"\d", value) else None
+        text = value.strip().lower()
+        try:
+            number = float(text)
+        except ValueError:
+            if text in _TRUE_STRINGS:
+                return True
+            return False if text in _FALSE_STRINGS else None
+        return None if np.isnan(number) else number
+
+    def _column_value(self, factor: str, value) -> float:
+        if factor == "account_age":
+            return self._normalize_account_age_days(value)
+        if value is None:
+            return np.nan
+        coerced = self.coerce_input(factor, value)
+        return 0.0 if coerced is None else float(coerced)
+
+    def risk_columns(self, records: list[dict]) -> dict[str, np.ndarray]:
+        """
+        Risk inputs of many customers as float arrays, one per factor the weights or
+        rules read. NaN marks a factor a record does not have.
+        """
+        factors = dict.fromkeys([*self.risk_weights, *risk_rules.feature_names])
+        return {
+            factor: np.fromiter(
+                (
+                    self._column_value(factor, record[factor]) if factor in record else np.nan
+                    for record in records
+                ),
+                dtype=np.float64,
+                count=len(records),
+            )
+            for factor in factors
+        }
 
-        return risk_factors
+    def calculate_risk_scores(self, columns: dict[str, np.ndarray], n: int) -> np.ndarray:
+        """calculate_risk_score over columnar inputs, with the same float arithmetic."""
+        score = np.full(n, 50.0)
+        for factor, weight in self.risk_weights.items():
+            values = columns.get(factor)
+            if values is None:
+                continue
+            if factor == "account_age":
+                contribution = weight * np.minimum(values / 365, 5) / 5
+            elif factor == "transaction_velocity":
+                contribution = weight * np.minimum(values / HIGH_VELOCITY, 1)
+            else:
+                contribution = weight * np.minimum(values, 1)
+            score += np.where(np.isnan(values), 0, contribution)
+        return np.clip(np.trunc(score), 0, 100).astype(np.int64)
+
+    def risk_factor_masks(self, columns: dict[str, np.ndarray], n: int) -> np.ndarray:
+        """identify_risk_factors as one bitmask per customer (bit i = rule i of RISK_RULES)."""
+        X = risk_rules.matrix_from_columns(columns, n)
+        return risk_rules.bitmasks(risk_rules.evaluate(X))
+
+    def determine_statuses(self, risk_scores: np.ndarray) -> np.ndarray:
+        return np.select(
+            [risk_scores >= 90, risk_scores >= 70, risk_scores >= 50],
+            ["Restricted", "Under Review", "Monitoring"],
+            "Normal",
+        )
 
     def determine_status(self, risk_score: int) -> str:
         """
@@ -0,0 +1,220 @@
+import json
+import operator
+import os
+from collections.abc import Callable
+from functools import reduce
+
+import numpy as np
+
+from app.config import settings
+
+RULES_DIR = os.path.join(os.path.dirname(__file__), "rules")
+
+_COMPARISONS: dict[str, Callable[[np.ndarray, np.ndarray | float], np.ndarray]] = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+ACTIONS = ("flag", "block")
+
+Predicate = Callable[[list[np.ndarray]], np.ndarray]
+
+
+class RuleError(ValueError):
+    """Raised when a rule definition is malformed."""
+
+
+def _number(value, rule_name: str, what: str) -> float:
+    # bool is an int subclass, but true/false as a threshold is a mistake in the file
+    if isinstance(value, bool) or not isinstance(value, int | float):
+        raise RuleError(f"Rule {rule_name!r}: {what} must be a number, got {value!r}")
+    return float(value)
+
+
+class CompiledRuleSet:
+    """
+    Declarative rules compiled once into vectorized NumPy predicates.
+
+    A rule is {"name", "when", "action"}. "when" is a condition tree:
+
+        {"feature": "amount", "op": ">", "value": 10000}
+        {"feature": "amount", "op": ">", "value": {"feature": "avg_transaction_amount",
+                                                    "times": 5}}
+        {"feature": "hour", "op": "between", "value": [0, 5]}
+        {"feature": "merchant_risk", "op": "in", "value": [3, 4]}
+        {"all": [...]}, {"any": [...]}, {"not": {...}}
+
+    Features are read from an (n, n_features) matrix built once per batch; missing
+    features take the rule file's "defaults" (else 0), as in build_feature_matrix.
+    Identical comparisons shared by several rules are evaluated once per batch.
+    Rules with action "block" mark a row as fraud before model inference.
+    """
+
+    def __init__(self, rules: list[dict], defaults: dict[str, float] | None = None):
+        self.defaults = dict(defaults or {})
+        self.feature_names: list[str] = []
+        self._feature_index: dict[str, int] = {}
+        self._leaves: list[Callable[[np.ndarray], np.ndarray]] = []
+        self._leaf_index: dict[str, int] = {}
+
+        self.names: list[str] = []
+        self.actions: list[str] = []
+        self._predicates: list[Predicate] = []
+        for rule in rules:
+            name = rule.get("name")
+            if not name or "when" not in rule:
+                raise RuleError(f"Rule needs a name and a 'when' condition: {rule}")
+            action = rule.get("action", "flag")
+            if action not in ACTIONS:
+                raise RuleError(f"Rule {name!r}: unknown action {action!r}")
+            self.names.append(name)
+            self.actions.append(action)
+            self._predicates.append(self._compile(rule["when"], name))
+        self._block = np.array([action == "block" for action in self.actions], dtype=bool)
+
+    @classmethod
+    def from_file(cls, path: str) -> "CompiledRuleSet":
+        with open(path) as f:
+            spec = json.load(f)
+        return cls(spec.get("rules", []), spec.get("defaults"))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _column(self, feature: str) -> int:
+        if feature not in self._feature_index:
+            self._feature_index[feature] = len(self.feature_names)
+            self.feature_names.append(feature)
+        return self._feature_index[feature]
+
+    def _leaf(self, condition: dict, rule_name: str) -> int:
+        key = json.dumps(condition, sort_keys=True)
+        if key in self._leaf_index:
+            return self._leaf_index[key]
+
+        op = condition.get("op")
+        value = condition.get("value")
+        if not isinstance(condition["feature"], str):
+            raise RuleError(f"Rule {rule_name!r}: feature must be a name, got {condition!r}")
+        if op == "between":
+            if not isinstance(value, list | tuple) or len(value) != 2:
+                raise RuleError(f"Rule {rule_name!r}: 'between' needs [low, high], got {value!r}")
+            low, high = (_number(bound, rule_name, "'between' bound") for bound in value)
+        elif op == "in":
+            if not isinstance(value, list | tuple) or not value:
+                raise RuleError(f"Rule {rule_name!r}: 'in' needs a list of values, got {value!r}")
+            choices = np.array([_number(choice, rule_name, "'in' value") for choice in value])
+        elif op in _COMPARISONS:
+            compare = _COMPARISONS[op]
+            if isinstance(value, dict):
+                if not isinstance(value.get("feature"), str):
+                    raise RuleError(f"Rule {rule_name!r}: compared feature must be a name")
+                times = _number(value.get("times", 1), rule_name, "'times'")
+            else:
+                threshold = _number(value, rule_name, f"{op!r} threshold")
+        else:
+            raise RuleError(f"Rule {rule_name!r}: unknown operator {op!r}")
+
+        column = self._column(condition["feature"])
+        if op == "between":
+            leaf = lambda X: (X[:, column] >= low) & (X[:, column] <= high)  # noqa: E731
+        elif op == "in":
+            leaf = lambda X: np.isin(X[:, column], choices)  # noqa: E731
+        elif isinstance(value, dict):
+            # Compare against another feature, optionally scaled
+            other = self._column(value["feature"])
+            leaf = lambda X: compare(X[:, column], X[:, other] * times)  # noqa: E731
+        else:
+            leaf = lambda X: compare(X[:, column], threshold)  # noqa: E731
+
+        self._leaf_index[key] = len(self._leaves)
+        self._leaves.append(leaf)
+        return self._leaf_index[key]
+
+    def _compile(self, condition: dict, rule_name: str) -> Predicate:
+        if not isinstance(condition, dict):
+            raise RuleError(f"Rule {rule_name!r}: condition must be an object, got {condition!r}")
+        if "all" in condition or "any" in condition:
+            combine = operator.and_ if "all" in condition else operator.or_
+            operands = condition["all"] if "all" in condition else condition["any"]
+            children = [self._compile(c, rule_name) for c in operands]
+            if not children:
+                raise RuleError(f"Rule {rule_name!r}: empty all/any")
+            return lambda leaves: reduce(combine, (child(leaves) for child in children))
+        if "not" in condition:
+            child = self._compile(condition["not"], rule_name)
+            return lambda leaves: ~child(leaves)
+        if "feature" in condition:
+            index = self._leaf(condition, rule_name)
+            return lambda leaves: leaves[index]
+        raise RuleError(f"Rule {rule_name!r}: cannot parse condition {condition!r}")
+
+    def build_matrix(self, rows: list[dict]) -> np.ndarray:
+        """Stack the features the rules read, in rule column order, into a float matrix."""
+        names = self.feature_names
+        # None (missing) becomes NaN on conversion and is replaced by the default
+        X = np.array([[row.get(name) for name in names] for row in rows], dtype=np.float64)
+        X = X.reshape(len(rows), len(names))
+        missing = np.isnan(X)
+        if missing.any():
+            defaults = np.array([self.defaults.get(name, 0) for name in names], dtype=np.float64)
+            X[missing] = np.broadcast_to(defaults, X.shape)[missing]
+        return X
+
+    def matrix_from_columns(self, columns: dict[str, np.ndarray], n: int) -> np.ndarray:
+        """Feature matrix from columnar arrays; absent columns and NaN take the defaults."""
+        X = np.empty((n, len(self.feature_names)), dtype=np.float64, order="F")
+        for j, name in enumerate(self.feature_names):
+            values = columns.get(name)
+            default = self.defaults.get(name, 0)
+            X[:, j] = default if values is None else np.where(np.isnan(values), default, values)
+        return X
+
+    def evaluate(self, X: np.ndarray) -> np.ndarray:
+        """(n, n_rules) boolean matrix of which rules match each row of X."""
+        n = X.shape[0]
+        if not self._predicates:
+            return np.zeros((n, 0), dtype=bool)
+        # Column-major so every predicate reads a contiguous column
+        X = np.asfortranarray(X, dtype=np.float64)
+        leaves = [leaf(X) for leaf in self._leaves]
+        matches = np.empty((len(self._predicates), n), dtype=bool)
+        for i, predicate in enumerate(self._predicates):
+            matches[i] = predicate(leaves)
+        return matches.T
+
+    def apply(self, rows: list[dict]) -> tuple[list[list[str]], np.ndarray]:
+        """Names of the matching rules per row, and which rows a block rule matched."""
+        if not rows:
+            return [], np.zeros(0, dtype=bool)
+        matches = self.evaluate(self.build_matrix(rows))
+        blocked = matches[:, self._block].any(axis=1)
+        names = self.names
+        return [[names[i] for i in np.flatnonzero(row)] for row in matches], blocked
+
+    def bitmasks(self, matches: np.ndarray) -> np.ndarray:
+        """One uint64 per row with bit i set when rule i matched (at most 64 rules)."""
+        if len(self.names) > 64:
+            raise RuleError(f"Bitmasks hold at most 64 rules, this set has {len(self.names)}")
+        weights = np.left_shift(np.uint64(1), np.arange(len(self.names), dtype=np.uint64))
+        return (matches.astype(np.uint64) * weights).sum(axis=1, dtype=np.uint64)
+
+    def names_for_mask(self, mask: int) -> list[str]:
+        return [name for i, name in enumerate(self.names) if mask >> i & 1]
+
+    def apply_one(self, row: dict) -> tuple[list[str], bool]:
+        names, blocked = self.apply([row])
+        return names[0], bool(blocked[0])
+
+
+def load_rules(path: str, bundled: str) -> CompiledRuleSet:
+    """Load a rule file, falling back to the one bundled in ml_models/rules/."""
+    return CompiledRuleSet.from_file(path or os.path.join(RULES_DIR, bundled))
+
+
+# Global instance
+fraud_rules = load_rules(settings.FRAUD_RULES_PATH, "fraud_indicators.json")
+risk_rules = load_rules(settings.RISK_RULES_PATH, "risk_factors.json")
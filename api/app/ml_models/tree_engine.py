@@ -0,0 +1,229 @@
+import json
+import math
+import os
+import threading
+from collections.abc import Iterator
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingClassifier, HistGradientBoostingClassifier
+from sklearn.preprocessing import StandardScaler
+
+
+class CompiledTreeEnsemble:
+    """
+    Flattened binary (Hist)GradientBoostingClassifier for low-latency scoring.
+
+    Every tree is packed into shared contiguous arrays (feature, threshold, left, right,
+    value) and all trees are walked in lockstep, one NumPy step per depth level. The
+    StandardScaler is folded into the thresholds, since x_scaled <= t is the same split
+    as x <= t * scale + mean, so raw feature values are scored directly. Leaves point
+    at themselves with an infinite threshold, which lets shallow trees idle in place
+    while deeper ones finish.
+    """
+
+    _ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+
+    def __init__(
+        self,
+        feature_names: list[str],
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        init_raw: float,
+        learning_rate: float,
+    ):
+        self.feature_names = list(feature_names)
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.init_raw = init_raw
+        self.learning_rate = learning_rate
+        self._local = threading.local()
+
+    @staticmethod
+    def supports(model) -> bool:
+        if isinstance(model, GradientBoostingClassifier):
+            return hasattr(model, "estimators_") and model.estimators_.shape[1] == 1
+        if isinstance(model, HistGradientBoostingClassifier):
+            return (
+                hasattr(model, "_predictors")
+                and model.n_trees_per_iteration_ == 1
+                and model.is_categorical_ is None
+            )
+        return False
+
+    @staticmethod
+    def _trees(model) -> Iterator[tuple[np.ndarray, ...]]:
+        """Yield (feature, threshold, left, right, is_leaf, value) per tree, in scaled space."""
+        if isinstance(model, GradientBoostingClassifier):
+            for estimator in model.estimators_[:, 0]:
+                tree = estimator.tree_
+                yield (
+                    tree.feature,
+                    tree.threshold,
+                    tree.children_left,
+                    tree.children_right,
+                    tree.children_left == -1,
+                    tree.value[:, 0, 0],
+                )
+        else:
+            # HistGradientBoosting leaf values already include the learning rate
+            for (predictor,) in model._predictors:
+                nodes = predictor.nodes
+                yield (
+                    nodes["feature_idx"].astype(np.intp),
+                    nodes["num_threshold"],
+                    nodes["left"].astype(np.intp),
+                    nodes["right"].astype(np.intp),
+                    nodes["is_leaf"].astype(bool),
+                    nodes["value"],
+                )
+
+    @classmethod
+    def compile(
+        cls, model, scaler: StandardScaler, feature_names: list[str]
+    ) -> "CompiledTreeEnsemble":
+        if not cls.supports(model):
+            raise ValueError("Only fitted binary gradient boosting classifiers can be compiled")
+
+        n_features = len(feature_names)
+        mean = getattr(scaler, "mean_", None)
+        scale = getattr(scaler, "scale_", None)
+        mean = np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64)
+        scale = np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64)
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+        for tree_feature, tree_threshold, tree_left, tree_right, is_leaf, value in cls._trees(
+            model
+        ):
+            nodes = np.arange(len(value))
+            feature = np.where(is_leaf, 0, tree_feature)
+
+            features.append(feature)
+            thresholds.append(
+                np.where(is_leaf, np.inf, tree_threshold * scale[feature] + mean[feature])
+            )
+            lefts.append(np.where(is_leaf, nodes, tree_left) + offset)
+            rights.append(np.where(is_leaf, nodes, tree_right) + offset)
+            values.append(np.asarray(value, dtype=np.float64))
+            roots.append(offset)
+
+            max_depth = max(max_depth, _depth(tree_left, tree_right, is_leaf))
+            offset += len(value)
+
+        learning_rate = (
+            float(model.learning_rate) if isinstance(model, GradientBoostingClassifier) else 1.0
+        )
+        engine = cls(
+            feature_names=feature_names,
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            init_raw=0.0,
+            learning_rate=learning_rate,
+        )
+
+        # The prior (init estimator / baseline) is constant, so recover it once from
+        # the public decision_function instead of reaching into model internals
+        x0 = np.zeros((1, n_features))
+        engine.init_raw = float(
+            model.decision_function(scaler.transform(x0))[0] - engine._raw(x0)[0]
+        )
+        return engine
+
+    def save(self, directory: str):
+        """Write each array as a .npy file so workers can np.load(..., mmap_mode="r") them."""
+        os.makedirs(directory, exist_ok=True)
+        for name in self._ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(
+                {
+                    "feature_names": self.feature_names,
+                    "max_depth": self.max_depth,
+                    "init_raw": self.init_raw,
+                    "learning_rate": self.learning_rate,
+                },
+                f,
+            )
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: str | None = "r") -> "CompiledTreeEnsemble":
+        """
+        Open saved arrays. With mmap_mode="r" they are read-only views of the page
+        cache, shared by every process that maps the same files.
+        """
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in cls._ARRAYS
+        }
+        return cls(**meta, **arrays)
+
+    def _row_buffer(self) -> np.ndarray:
+        # One preallocated row per thread; the scoring pools call in concurrently
+        row = getattr(self._local, "row", None)
+        if row is None:
+            row = self._local.row = np.empty(len(self.feature_names), dtype=np.float64)
+        return row
+
+    def predict_proba_one(self, features: dict[str, float]) -> float:
+        """Fraud probability for one feature dict (unscaled values)."""
+        row = self._row_buffer()
+        for i, name in enumerate(self.feature_names):
+            row[i] = features.get(name, 0)
+
+        idx = self.roots
+        for _ in range(self.max_depth):
+            go_left = row[self.feature[idx]] <= self.threshold[idx]
+            idx = np.where(go_left, self.left[idx], self.right[idx])
+
+        return _sigmoid(self.init_raw + self.learning_rate * float(self.value[idx].sum()))
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Fraud probabilities for an (n, n_features) matrix of unscaled values."""
+        return 1.0 / (1.0 + np.exp(-self._raw(X)))
+
+    def _raw(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        rows = np.arange(X.shape[0])[:, None]
+        idx = np.broadcast_to(self.roots, (X.shape[0], self.roots.size))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[idx]] <= self.threshold[idx]
+            idx = np.where(go_left, self.left[idx], self.right[idx])
+        return self.init_raw + self.learning_rate * self.value[idx].sum(axis=1)
+
+
+def _depth(left: np.ndarray, right: np.ndarray, is_leaf: np.ndarray) -> int:
+    """Longest root-to-leaf path, counted in splits."""
+    depth = 0
+    frontier = [0]
+    while True:
+        frontier = [
+            child for node in frontier if not is_leaf[node] for child in (left[node], right[node])
+        ]
+        if not frontier:
+            return depth
+        depth += 1
+
+
+def _sigmoid(x: float) -> float:
+    if x >= 0:
+        return 1.0 / (1.0 + math.exp(-x))
+    z = math.exp(x)
+    return z / (1.0 + z)
@@ -1,4 +1,4 @@
-from sqlalchemy import JSON, Column, DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy import JSON, Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import relationship
 
 from app.database import Base
@@ -7,6 +7,14 @@ from app.utils.helpers import utcnow
 
 class FraudAlert(Base):
     __tablename__ = "fraud_alerts"
+    # Keyset pagination walks (created_at, id) newest first, optionally within one
+    # status, type or customer
+    __table_args__ = (
+        Index("ix_fraud_alerts_created_at_id", "created_at", "id"),
+        Index("ix_fraud_alerts_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_fraud_alerts_type_created_at_id", "type", "created_at", "id"),
+        Index("ix_fraud_alerts_customer_id_created_at_id", "customer_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     # ADDED ForeignKey here to fix the join condition error
@@ -31,6 +39,11 @@ class FraudAlert(Base):
 
 class RiskProfile(Base):
     __tablename__ = "risk_profiles"
+    # Keyset pagination walks (risk_score, id) highest first, optionally within one status
+    __table_args__ = (
+        Index("ix_risk_profiles_risk_score_id", "risk_score", "id"),
+        Index("ix_risk_profiles_status_risk_score_id", "status", "risk_score", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(String, unique=True, index=True)
@@ -39,11 +52,22 @@ class RiskProfile(Base):
     risk_factors = Column(JSON)
     status = Column(String)
     account_age = Column(String)
+    # Latest value of each risk scorer / rule input, so partial updates can rescore
+    risk_inputs = Column(JSON)
     last_activity = Column(DateTime)
     created_at = Column(DateTime, default=utcnow)
     updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
 
 
+class RiskLevelCount(Base):
+    """Profiles per risk level, kept current by risk profile upserts"""
+
+    __tablename__ = "risk_level_counts"
+
+    level = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
 class GraphNode(Base):
     __tablename__ = "graph_nodes"
 
@@ -59,6 +83,8 @@ class GraphNode(Base):
 
 class GraphEdge(Base):
     __tablename__ = "graph_edges"
+    # Edge existence checks look up (from_node, to_node) pairs
+    __table_args__ = (Index("ix_graph_edges_from_node_to_node", "from_node", "to_node"),)
 
     id = Column(Integer, primary_key=True, index=True)
     from_node = Column(String, index=True)
@@ -66,3 +92,19 @@ class GraphEdge(Base):
     weight = Column(Float, default=1.0)
     meta_data = Column(JSON)
     created_at = Column(DateTime, default=utcnow)
+
+
+class ShadowPrediction(Base):
+    __tablename__ = "shadow_predictions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    transaction_id = Column(String, index=True)
+    champion_version = Column(String, index=True)
+    challenger_version = Column(String, index=True)
+    champion_score = Column(Float)
+    challenger_score = Column(Float)
+    champion_flagged = Column(Boolean)
+    challenger_flagged = Column(Boolean)
+    champion_latency_ms = Column(Float)
+    challenger_latency_ms = Column(Float)
+    created_at = Column(DateTime, default=utcnow)
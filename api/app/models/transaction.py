@@ -32,6 +32,8 @@ class Transaction(Base):
     # ML Features
     features = Column(JSON)
     fraud_probability = Column(Float)
+    # Fraud rule indicators at scoring time, returned again to retries
+    risk_indicators = Column(JSON)
 
     # Relationships
     fraud_alert = relationship("FraudAlert", back_populates="transaction", uselist=False)
@@ -53,6 +53,30 @@ class RiskProfileResponse(RiskProfileBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class CustomerRiskInput(BaseModel):
+    customer_id: str
+    customer_name: str | None = None
+    account_age: str | float | None = None
+    failed_logins: float | None = None
+    new_device: bool | None = None
+    location_change: bool | None = None
+    transaction_velocity: float | None = None
+    high_value_transaction: bool | None = None
+    chargeback_history: float | None = None
+    vpn_usage: bool | None = None
+
+    model_config = ConfigDict(extra="allow")
+
+
+class RiskProfileBulkRequest(BaseModel):
+    customers: list[CustomerRiskInput] = Field(min_length=1)
+
+
+class RiskProfileBulkResponse(BaseModel):
+    total: int
+    profiles: list[RiskProfileResponse]
+
+
 class GraphNodeSchema(BaseModel):
     id: str
     label: str
@@ -73,6 +97,14 @@ class GraphDataResponse(BaseModel):
     edges: list[GraphEdgeSchema]
 
 
+class FraudRingResponse(BaseModel):
+    size: int
+    customers: list[str]
+    cards: list[str]
+    ips: list[str]
+    devices: list[str]
+
+
 class FraudAnalysisRequest(BaseModel):
     transaction_id: str
     customer_id: str
@@ -83,6 +115,7 @@ class FraudAnalysisRequest(BaseModel):
     payment_method: str
     ip_address: str | None = None
     device_id: str | None = None
+    card_id: str | None = None
     location: dict[str, Any] | None = None
     features: dict[str, Any] | None = None
     status: str | None = None
@@ -90,3 +123,21 @@ class FraudAnalysisRequest(BaseModel):
     customer_name: str | None = None
 
     model_config = ConfigDict(extra="allow")
+
+
+class FraudBatchAnalysisRequest(BaseModel):
+    transactions: list[FraudAnalysisRequest] = Field(min_length=1)
+
+
+class FraudAnalysisResult(BaseModel):
+    transaction_id: str
+    is_fraud: bool
+    confidence: float
+    risk_indicators: list[str]
+    alert_id: int | None = None
+
+
+class FraudBatchAnalysisResponse(BaseModel):
+    total: int
+    flagged: int
+    results: list[FraudAnalysisResult]
@@ -0,0 +1,61 @@
+import threading
+from collections import deque
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.fraud import FraudAlert
+
+
+class AlertIdAllocator:
+    """
+    Hands out fraud_alerts primary keys before the rows are written.
+
+    On PostgreSQL IDs come from the table's own sequence, block_size at a time, so
+    they never collide with rows inserted by other workers or processes. Other
+    databases have no shareable sequence: IDs continue from MAX(id) and the blocks
+    already handed out. That is only unique while every fraud_alerts insert in the
+    database goes through one allocator, so with write-behind enabled the synchronous
+    alert paths take their IDs from alert_id_allocator too, and such databases need
+    a single writing process (e.g. SQLite in development). With write-behind off,
+    nothing uses the allocator and the database assigns IDs.
+    """
+
+    def __init__(self, session_factory: sessionmaker = SessionLocal, block_size: int = 100):
+        self.session_factory = session_factory
+        self.block_size = block_size
+        self._ids: deque[int] = deque()
+        self._high_water = 0
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        with self._lock:
+            if not self._ids:
+                self._ids.extend(self._reserve())
+            return self._ids.popleft()
+
+    def _reserve(self) -> list[int]:
+        db = self.session_factory()
+        try:
+            if db.get_bind().dialect.name == "postgresql":
+                rows = db.execute(
+                    text(
+                        "SELECT nextval(pg_get_serial_sequence('fraud_alerts', 'id')) "
+                        "FROM generate_series(1, :n)"
+                    ),
+                    {"n": self.block_size},
+                )
+                return [row[0] for row in rows]
+
+            current = db.execute(select(func.max(FraudAlert.id))).scalar() or 0
+            start = max(current, self._high_water) + 1
+            self._high_water = start + self.block_size - 1
+            return list(range(start, self._high_water + 1))
+        finally:
+            db.close()
+
+
+# Global instance, shared by every path that inserts fraud alerts
+alert_id_allocator = AlertIdAllocator(block_size=settings.ALERT_ID_BLOCK_SIZE)
@@ -0,0 +1,205 @@
+import threading
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.fraud import FraudAlert
+from app.models.transaction import Transaction
+from app.services.alert_ids import AlertIdAllocator, alert_id_allocator
+from app.services.fraud_detection import FraudDetectionService, ScoringResult
+from app.utils.batching import BatchWorker
+from app.utils.executors import PoolSaturatedError
+from app.utils.helpers import utcnow
+from app.utils.logger import logger
+from app.utils.transactions import transaction_row
+
+
+class AlertWriter(BatchWorker):
+    """
+    Write-behind persistence for flagged transactions and their fraud alerts.
+
+    submit() assigns the alert ID up front and enqueues the rows; a background
+    thread drains the queue and writes each batch with multi-row INSERTs in a single
+    transaction (one commit per batch instead of per alert). If a batch fails, its
+    alerts are written one per transaction so only the failing ones are lost, each
+    logged with its alert ID. Until its batch is
+    written, a submitted alert is pending: pending_result() returns its decision to
+    retries, and submitting the same transaction again returns the same alert ID.
+    When the queue is full, submit() waits up to put_timeout_seconds and then raises
+    PoolSaturatedError, so callers shed load instead of growing an unbounded backlog.
+    """
+
+    thread_name = "alert-writer"
+
+    def __init__(
+        self,
+        max_queue: int = 10_000,
+        batch_size: int = 500,
+        flush_interval_ms: float = 50.0,
+        put_timeout_seconds: float = 1.0,
+        session_factory: sessionmaker = SessionLocal,
+        allocator: AlertIdAllocator | None = None,
+    ):
+        super().__init__(max_queue=max_queue, batch_size=batch_size, max_wait_ms=flush_interval_ms)
+        self.put_timeout_seconds = put_timeout_seconds
+        self.session_factory = session_factory
+        self.allocator = allocator or alert_id_allocator
+        self._pending: dict[str, ScoringResult] = {}
+        self._pending_lock = threading.Lock()
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.superseded = 0
+        self.rejected = 0
+
+    def submit(self, transaction_data: dict, confidence: float, risk_indicators: list[str]) -> int:
+        """Queue a flagged transaction for persistence and return its alert ID."""
+        if not self.running:
+            self.start()
+
+        transaction_id = transaction_data["transaction_id"]
+        with self._pending_lock:
+            pending = self._pending.get(transaction_id)
+            if pending is not None:
+                return pending[3]
+            alert_id = self.allocator.next_id()
+            self._pending[transaction_id] = (True, confidence, list(risk_indicators), alert_id)
+
+        alert = FraudDetectionService.fraud_alert_row(transaction_data, confidence, risk_indicators)
+        alert["id"] = alert_id
+        now = utcnow()
+        alert["created_at"] = alert["updated_at"] = now
+        transaction = transaction_row(transaction_data, confidence, risk_indicators)
+        if not self._put((transaction, alert), timeout=self.put_timeout_seconds):
+            with self._pending_lock:
+                self._pending.pop(transaction_id, None)
+            self.rejected += 1
+            raise PoolSaturatedError("alert writer queue is full")
+        return alert_id
+
+    def pending_result(self, transaction_id: str) -> ScoringResult | None:
+        """Decision of a submitted alert whose batch is not written yet"""
+        with self._pending_lock:
+            return self._pending.get(transaction_id)
+
+    def _release(self, batch: list[tuple[dict, dict]]):
+        with self._pending_lock:
+            for _, alert in batch:
+                self._pending.pop(alert["transaction_id"], None)
+
+    def _flush(self, batch: list[tuple[dict, dict]]):
+        try:
+            self._commit(batch)
+            self.batches += 1
+        except Exception as e:
+            # One bad row must not take the rest of the batch with it
+            logger.warning(
+                f"Write-behind batch of {len(batch)} fraud alerts failed, "
+                f"writing them one at a time: {e}"
+            )
+            for item in batch:
+                try:
+                    self._commit([item])
+                except Exception as row_error:
+                    alert = item[1]
+                    self.failed += 1
+                    logger.error(
+                        f"Fraud alert {alert['id']} for transaction {alert['transaction_id']} "
+                        f"could not be written: {row_error}"
+                    )
+        finally:
+            self._release(batch)
+
+    def _commit(self, batch: list[tuple[dict, dict]]):
+        db = self.session_factory()
+        try:
+            written = self._write(db, batch)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self.written += written
+        self.superseded += len(batch) - written
+
+    @staticmethod
+    def _write(db: Session, batch: list[tuple[dict, dict]]) -> int:
+        """Insert the batch's transactions and alerts; returns the number of alerts inserted"""
+        transaction_ids = list({alert["transaction_id"] for _, alert in batch})
+        existing_transactions = set(
+            db.execute(
+                select(Transaction.transaction_id).where(
+                    Transaction.transaction_id.in_(transaction_ids)
+                )
+            ).scalars()
+        )
+        alerted = set(
+            db.execute(
+                select(FraudAlert.transaction_id).where(
+                    FraudAlert.transaction_id.in_(transaction_ids)
+                )
+            ).scalars()
+        )
+
+        new_transactions, new_alerts, rescored = [], [], []
+        for transaction, alert in batch:
+            transaction_id = alert["transaction_id"]
+            if transaction_id in alerted:
+                # Another path alerted on this transaction first; its alert stands
+                logger.warning(
+                    f"Fraud alert {alert['id']} not written: transaction {transaction_id} "
+                    "already has an alert"
+                )
+                continue
+            alerted.add(transaction_id)
+            if transaction_id in existing_transactions:
+                rescored.append(
+                    {
+                        "b_transaction_id": transaction_id,
+                        "fraud_probability": transaction["fraud_probability"],
+                        "risk_indicators": transaction["risk_indicators"],
+                    }
+                )
+            else:
+                existing_transactions.add(transaction_id)
+                new_transactions.append(transaction)
+            new_alerts.append(alert)
+
+        # Transactions first: alerts reference them by foreign key
+        if new_transactions:
+            db.execute(insert(Transaction), new_transactions)
+        if rescored:
+            db.connection().execute(
+                update(Transaction)
+                .where(Transaction.transaction_id == bindparam("b_transaction_id"))
+                .values(
+                    fraud_probability=bindparam("fraud_probability"),
+                    risk_indicators=bindparam("risk_indicators"),
+                ),
+                rescored,
+            )
+        if new_alerts:
+            db.execute(insert(FraudAlert), new_alerts)
+        return len(new_alerts)
+
+    def stats(self) -> dict:
+        return {
+            **self.queue_stats(),
+            "written": self.written,
+            "batches": self.batches,
+            "failed": self.failed,
+            "superseded": self.superseded,
+            "rejected": self.rejected,
+            "pending": len(self._pending),
+        }
+
+
+# Global instance
+alert_writer = AlertWriter(
+    max_queue=settings.ALERT_WRITE_BEHIND_MAX_QUEUE,
+    batch_size=settings.ALERT_WRITE_BEHIND_BATCH_SIZE,
+    flush_interval_ms=settings.ALERT_WRITE_BEHIND_FLUSH_INTERVAL_MS,
+)
@@ -1,44 +1,248 @@
+import time
+from collections.abc import Iterator
+from datetime import datetime
+
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app.config import settings
+from app.ml_models.feature_store import feature_store
 from app.ml_models.fraud_detector import fraud_detector
+from app.ml_models.micro_batcher import fraud_batcher
+from app.ml_models.rule_engine import fraud_rules
 from app.models.fraud import FraudAlert
 from app.models.transaction import Transaction
 from app.schemas.fraud import FraudAlertCreate
+from app.services.alert_ids import alert_id_allocator
+from app.services.graph_analysis import graph_updater
+from app.services.ring_detector import ring_detector
+from app.services.risk_engine import risk_engine, risk_inputs
+from app.services.shadow_scoring import shadow_scorer
+from app.utils.cache import TTLCache
 from app.utils.helpers import utcnow
-from app.utils.logger import logger
+from app.utils.logger import logger, transaction_logger
+from app.utils.pagination import keyset_page, stream_ndjson
+from app.utils.transactions import transaction_row
+
+# (is_fraud, confidence, risk_indicators, alert_id) per (transaction_id, model version)
+ScoringResult = tuple[bool, float, list[str], int | None]
 
 
 class FraudDetectionService:
     """Service for fraud detection operations"""
 
     @staticmethod
-    def analyze_transaction(transaction_data: dict, db: Session) -> tuple[bool, float, list[str]]:
+    def get_cached_result(transaction_id: str) -> ScoringResult | None:
+        if not settings.SCORING_CACHE_ENABLED:
+            return None
+        return scoring_cache.get((transaction_id, fraud_detector.version))
+
+    @staticmethod
+    def cache_result(transaction_id: str, result: ScoringResult):
+        if settings.SCORING_CACHE_ENABLED:
+            scoring_cache.set((transaction_id, fraud_detector.version), result)
+
+    @staticmethod
+    def get_stored_result(transaction_id: str, db: Session) -> ScoringResult | None:
+        """
+        Decision already persisted for a transaction (a retry that missed the cache),
+        read from Transaction.fraud_probability and its alert in one indexed lookup.
+        """
+        row = (
+            db.query(
+                Transaction.fraud_probability,
+                Transaction.risk_indicators,
+                FraudAlert.id,
+                FraudAlert.indicators,
+            )
+            .outerjoin(FraudAlert, FraudAlert.transaction_id == Transaction.transaction_id)
+            .filter(Transaction.transaction_id == transaction_id)
+            .first()
+        )
+        if row is None or row.fraud_probability is None:
+            return None
+
+        confidence, risk_indicators, alert_id, alert_indicators = row
+        is_fraud = alert_id is not None or confidence >= settings.FRAUD_DETECTION_THRESHOLD
+        indicators = alert_indicators if alert_id is not None else risk_indicators
+        result = (is_fraud, confidence, list(indicators or []), alert_id)
+        FraudDetectionService.cache_result(transaction_id, result)
+        return result
+
+    @staticmethod
+    def prepare_transaction(
+        transaction_data: dict,
+    ) -> tuple[dict, dict[str, float], list[str], bool]:
+        """
+        Everything before the model call: update the customer's live state (feature
+        store, risk engine, ring detector) and apply the fraud rules. Returns the
+        enriched payload, its model features, the risk indicators and whether a block
+        rule matched. This state is per process, so it runs in the serving process.
+        """
+        # Fill customer history features the caller did not send
+        sent = transaction_data
+        if settings.FEATURE_STORE_ENABLED:
+            transaction_data = feature_store.enrich(transaction_data)
+        # Keep the customer's live risk profile current; written in the background
+        if settings.RISK_ENGINE_ENABLED:
+            try:
+                risk_engine.observe(risk_inputs(sent, transaction_data))
+            except Exception as e:
+                # A profile update never fails scoring
+                logger.error(f"Risk engine update failed: {e}")
+        # Link the customer to others sharing its card, IP or device
+        if settings.RING_DETECTOR_ENABLED:
+            ring_detector.observe(transaction_data)
+        # Joins the live graph in the background, analysed once per batch
+        if settings.GRAPH_LIVE_ENABLED:
+            graph_updater.observe(transaction_data)
+
         # Extract features
         features = fraud_detector.extract_features(transaction_data)
 
-        # Predict fraud
-        is_fraud, confidence = fraud_detector.predict(features)
+        # Risk indicators; a matching block rule decides without the model
+        risk_indicators, blocked = fraud_rules.apply_one(features)
+        if blocked:
+            transaction_logger.info(f"Transaction blocked by rule: {risk_indicators}")
+        return transaction_data, features, risk_indicators, blocked
 
-        # Identify risk indicators
-        risk_indicators = FraudDetectionService._identify_risk_indicators(
-            transaction_data, features, confidence
+    @staticmethod
+    def record_prediction(
+        transaction_data: dict,
+        features: dict[str, float],
+        is_fraud: bool,
+        confidence: float,
+        latency_ms: float,
+    ):
+        """Hand a model decision to the shadow scorer, off the request path, and log it."""
+        shadow_scorer.submit(
+            transaction_data.get("transaction_id"),
+            features,
+            fraud_detector.version,
+            confidence,
+            is_fraud,
+            latency_ms,
+        )
+        transaction_logger.info(
+            f"Transaction analyzed: fraud={is_fraud}, confidence={confidence:.2f}"
+        )
+
+    @staticmethod
+    def analyze_transaction(
+        transaction_data: dict, db: Session | None = None
+    ) -> tuple[bool, float, list[str]]:
+        transaction_data, features, risk_indicators, blocked = (
+            FraudDetectionService.prepare_transaction(transaction_data)
         )
+        if blocked:
+            return True, 1.0, risk_indicators
 
-        logger.info(f"Transaction analyzed: fraud={is_fraud}, confidence={confidence:.2f}")
+        # Predict fraud, coalescing with concurrent callers when micro-batching is on
+        started = time.perf_counter()
+        if settings.FRAUD_MICROBATCH_ENABLED:
+            is_fraud, confidence = fraud_batcher.predict(features)
+        else:
+            is_fraud, confidence = fraud_detector.predict(features)
+
+        FraudDetectionService.record_prediction(
+            transaction_data, features, is_fraud, confidence, (time.perf_counter() - started) * 1000
+        )
         return is_fraud, confidence, risk_indicators
 
     @staticmethod
-    def _identify_risk_indicators(
-        transaction_data: dict, features: dict, confidence: float
-    ) -> list[str]:
-        indicators = []
-        if features.get("new_device", 0) == 1:
-            indicators.append("New device")
-        if features.get("vpn_usage", 0) == 1:
-            indicators.append("VPN usage")
-        if features.get("amount", 0) > 10000:
-            indicators.append("High-value transaction")
-        return indicators
+    def analyze_transactions(
+        transactions: list[dict], db: Session | None = None
+    ) -> list[tuple[bool, float, list[str]]]:
+        """
+        Score a batch of transactions with one vectorized rule evaluation and one
+        vectorized model call for the rows no block rule matched, preserving order.
+        """
+        sent = transactions
+        if settings.FEATURE_STORE_ENABLED:
+            transactions = [feature_store.enrich(txn) for txn in transactions]
+        if settings.RISK_ENGINE_ENABLED:
+            for txn, enriched in zip(sent, transactions, strict=True):
+                try:
+                    risk_engine.observe(risk_inputs(txn, enriched))
+                except Exception as e:
+                    logger.error(f"Risk engine update failed: {e}")
+        if settings.RING_DETECTOR_ENABLED:
+            for txn in transactions:
+                ring_detector.observe(txn)
+        if settings.GRAPH_LIVE_ENABLED:
+            for txn in transactions:
+                graph_updater.observe(txn)
+
+        features_list = [fraud_detector.extract_features(txn) for txn in transactions]
+        indicators_list, blocked = fraud_rules.apply(features_list)
+        scored = [i for i in range(len(features_list)) if not blocked[i]]
+
+        started = time.perf_counter()
+        predictions = fraud_detector.predict_batch([features_list[i] for i in scored])
+        latency_ms = (time.perf_counter() - started) * 1000 / max(len(scored), 1)
+
+        results = [(True, 1.0, indicators) for indicators in indicators_list]
+        for i, (is_fraud, confidence) in zip(scored, predictions, strict=True):
+            results[i] = (is_fraud, confidence, indicators_list[i])
+            shadow_scorer.submit(
+                transactions[i].get("transaction_id"),
+                features_list[i],
+                fraud_detector.version,
+                confidence,
+                is_fraud,
+                latency_ms,
+            )
+
+        flagged = sum(1 for is_fraud, _, _ in results if is_fraud)
+        logger.info(f"Batch analyzed: {len(results)} transactions, {flagged} flagged")
+        return results
+
+    @staticmethod
+    def _alert_status(risk_score: int) -> str:
+        if risk_score >= 90:
+            return "Blocked"
+        elif risk_score >= 75:
+            return "Under Investigation"
+        return "Pending Review"
+
+    @staticmethod
+    def fraud_alert_row(
+        transaction_data: dict, confidence: float, risk_indicators: list[str]
+    ) -> dict:
+        """Validated column values for a fraud alert, for ORM or Core bulk inserts."""
+        risk_score = int(confidence * 100)
+        fraud_alert_data = FraudAlertCreate(
+            transaction_id=transaction_data["transaction_id"],
+            type=transaction_data.get("fraud_type") or "Unknown Fraud",
+            amount=transaction_data["amount"],
+            customer_name=transaction_data.get("customer_name") or "Unknown",
+            customer_id=transaction_data["customer_id"],
+            risk_score=risk_score,
+            indicators=risk_indicators,
+            status=FraudDetectionService._alert_status(risk_score),
+            ml_confidence=confidence,
+            meta_data=transaction_data,
+        )
+        return fraud_alert_data.model_dump()
+
+    @staticmethod
+    def _build_transaction(
+        transaction_data: dict, confidence: float, risk_indicators: list[str]
+    ) -> Transaction:
+        return Transaction(**transaction_row(transaction_data, confidence, risk_indicators))
+
+    @staticmethod
+    def _build_fraud_alert(
+        transaction_data: dict, confidence: float, risk_indicators: list[str]
+    ) -> FraudAlert:
+        alert = FraudAlert(
+            **FraudDetectionService.fraud_alert_row(transaction_data, confidence, risk_indicators)
+        )
+        if settings.ALERT_WRITE_BEHIND_ENABLED:
+            # Take IDs from the allocator write-behind alerts use, so the two never
+            # collide; otherwise the database assigns them as usual
+            alert.id = alert_id_allocator.next_id()
+        return alert
 
     @staticmethod
     def create_fraud_alert(
@@ -48,55 +252,33 @@ class FraudDetectionService:
         risk_indicators: list[str],
         db: Session,
     ) -> FraudAlert:
-        risk_score = int(confidence * 100)
-
-        if risk_score >= 90:
-            status = "Blocked"
-        elif risk_score >= 75:
-            status = "Under Investigation"
-        else:
-            status = "Pending Review"
-
         transaction = (
             db.query(Transaction)
             .filter(Transaction.transaction_id == transaction_data["transaction_id"])
             .first()
         )
         if not transaction:
-            transaction = Transaction(
-                transaction_id=transaction_data["transaction_id"],
-                customer_id=transaction_data["customer_id"],
-                amount=transaction_data["amount"],
-                currency=transaction_data.get("currency", "INR"),
-                merchant_id=transaction_data.get("merchant_id", "unknown"),
-                merchant_category=transaction_data.get("merchant_category"),
-                payment_method=transaction_data.get("payment_method", "unknown"),
-                ip_address=transaction_data.get("ip_address"),
-                device_id=transaction_data.get("device_id"),
-                location=transaction_data.get("location"),
-                status=transaction_data.get("status", "pending"),
-                features=transaction_data.get("features"),
-                fraud_probability=confidence,
+            transaction = FraudDetectionService._build_transaction(
+                transaction_data, confidence, risk_indicators
             )
             db.add(transaction)
             db.flush()
         else:
+            # A retry racing past the scoring cache reuses the alert instead of violating
+            # the unique constraint on FraudAlert.transaction_id
+            existing = (
+                db.query(FraudAlert)
+                .filter(FraudAlert.transaction_id == transaction_data["transaction_id"])
+                .first()
+            )
+            if existing:
+                return existing
             transaction.fraud_probability = confidence
+            transaction.risk_indicators = risk_indicators
 
-        fraud_alert_data = FraudAlertCreate(
-            transaction_id=transaction_data["transaction_id"],
-            type=transaction_data.get("fraud_type", "Unknown Fraud"),
-            amount=transaction_data["amount"],
-            customer_name=transaction_data.get("customer_name", "Unknown"),
-            customer_id=transaction_data["customer_id"],
-            risk_score=risk_score,
-            indicators=risk_indicators,
-            status=status,
-            ml_confidence=confidence,
-            meta_data=transaction_data,
+        fraud_alert = FraudDetectionService._build_fraud_alert(
+            transaction_data, confidence, risk_indicators
         )
-
-        fraud_alert = FraudAlert(**fraud_alert_data.model_dump())
         db.add(fraud_alert)
         db.commit()
         db.refresh(fraud_alert)
@@ -104,8 +286,110 @@ class FraudDetectionService:
         return fraud_alert
 
     @staticmethod
-    def get_recent_alerts(db: Session, limit: int = 10) -> list[FraudAlert]:
-        return db.query(FraudAlert).order_by(FraudAlert.created_at.desc()).limit(limit).all()
+    def create_fraud_alerts(flagged: list[tuple[dict, float, list[str]]], db: Session) -> list[int]:
+        """
+        Bulk variant of create_fraud_alert: one lookup per table, one flush for the new
+        transactions and one commit for all alerts. Returns alert IDs in input order; a
+        transaction that already has an alert (or repeats within the batch) reuses it.
+        """
+        if not flagged:
+            return []
+
+        transaction_ids = list(dict.fromkeys(data["transaction_id"] for data, _, _ in flagged))
+        existing_transactions = {
+            txn.transaction_id: txn
+            for txn in db.query(Transaction).filter(Transaction.transaction_id.in_(transaction_ids))
+        }
+        alerts_by_txn = {
+            alert.transaction_id: alert
+            for alert in db.query(FraudAlert).filter(FraudAlert.transaction_id.in_(transaction_ids))
+        }
+
+        new_transactions = []
+        new_alerts = []
+        for transaction_data, confidence, risk_indicators in flagged:
+            transaction_id = transaction_data["transaction_id"]
+            if transaction_id in alerts_by_txn:
+                continue
+
+            transaction = existing_transactions.get(transaction_id)
+            if transaction is None:
+                transaction = FraudDetectionService._build_transaction(
+                    transaction_data, confidence, risk_indicators
+                )
+                existing_transactions[transaction_id] = transaction
+                new_transactions.append(transaction)
+            else:
+                transaction.fraud_probability = confidence
+                transaction.risk_indicators = risk_indicators
+
+            fraud_alert = FraudDetectionService._build_fraud_alert(
+                transaction_data, confidence, risk_indicators
+            )
+            alerts_by_txn[transaction_id] = fraud_alert
+            new_alerts.append(fraud_alert)
+
+        # Transactions must exist before the alerts that reference them are inserted.
+        db.add_all(new_transactions)
+        db.flush()
+        db.add_all(new_alerts)
+        db.flush()
+        # Read IDs before commit expires the instances (reading after would reload each row)
+        alert_ids = [alerts_by_txn[data["transaction_id"]].id for data, _, _ in flagged]
+        db.commit()
+
+        logger.info(f"Bulk created {len(new_alerts)} fraud alerts")
+        return alert_ids
+
+    @staticmethod
+    def alert_filters(
+        status: str | None = None,
+        alert_type: str | None = None,
+        customer_id: str | None = None,
+        created_from: datetime | None = None,
+        created_to: datetime | None = None,
+        min_score: int | None = None,
+        max_score: int | None = None,
+    ) -> list:
+        """WHERE conditions for alert listings; created_to and max_score are exclusive"""
+        conditions = []
+        if status is not None:
+            conditions.append(FraudAlert.status == status)
+        if alert_type is not None:
+            conditions.append(FraudAlert.type == alert_type)
+        if customer_id is not None:
+            conditions.append(FraudAlert.customer_id == customer_id)
+        if created_from is not None:
+            conditions.append(FraudAlert.created_at >= created_from)
+        if created_to is not None:
+            conditions.append(FraudAlert.created_at < created_to)
+        if min_score is not None:
+            conditions.append(FraudAlert.risk_score >= min_score)
+        if max_score is not None:
+            conditions.append(FraudAlert.risk_score < max_score)
+        return conditions
+
+    @staticmethod
+    def list_alerts(
+        db: Session, filters: list, cursor: str | None = None, limit: int = 50
+    ) -> tuple[list[FraudAlert], str | None]:
+        """One page of alerts, newest first, and the cursor of the next page"""
+        return keyset_page(
+            db.query(FraudAlert).filter(*filters),
+            [FraudAlert.created_at, FraudAlert.id],
+            cursor,
+            limit,
+        )
+
+    @staticmethod
+    def export_alerts(db: Session, filters: list) -> Iterator[str]:
+        """Every matching alert as NDJSON, newest first, streamed in chunks"""
+        statement = (
+            select(FraudAlert.__table__)
+            .where(*filters)
+            .order_by(FraudAlert.created_at.desc(), FraudAlert.id.desc())
+        )
+        return stream_ndjson(db.get_bind(), statement, settings.EXPORT_CHUNK_SIZE)
 
     @staticmethod
     def get_alert_by_id(alert_id: int, db: Session) -> FraudAlert:
@@ -120,3 +404,9 @@ class FraudDetectionService:
             db.commit()
             db.refresh(alert)
         return alert
+
+
+# Global instance
+scoring_cache = TTLCache(
+    max_entries=settings.SCORING_CACHE_MAX_ENTRIES, ttl_seconds=settings.SCORING_CACHE_TTL_SECONDS
+)
@@ -1,9 +1,35 @@
 import networkx as nx
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session, sessionmaker
 
+from app.config import settings
+from app.database import SessionLocal
 from app.ml_models.graph_neural_network import graph_analyzer
 from app.models.fraud import GraphEdge, GraphNode
+from app.services.ring_detector import ring_detector
+from app.services.transaction_graph import LiveTransactionGraph, live_graph
+from app.utils.batching import BatchWorker
 from app.utils.logger import logger
+from app.utils.upsert import upsert_rows
+
+# Columns refreshed on nodes that already exist; node_id and label keep first values
+_NODE_UPDATED_COLUMNS = ("group", "size", "title", "meta_data")
+# Transaction fields the live graph reads
+_GRAPH_FIELDS = ("customer_id", "card_id", "ip_address", "amount")
+# Keys per IN lookup, within SQLite's bound parameter limit (edge keys take two)
+_LOOKUP_CHUNK_SIZE = 5_000
+
+
+def risk_group(risk: float) -> tuple[str, int]:
+    """Visualization group and node size for a node risk score"""
+    if risk >= 0.8:
+        return "Detected", 30
+    if risk >= 0.6:
+        return "Investigation", 20
+    if risk >= 0.4:
+        return "Suspicious", 15
+    return "Safe", 10
 
 
 class GraphAnalysisService:
@@ -34,23 +60,54 @@ class GraphAnalysisService:
 
     @staticmethod
     def analyze_transaction_patterns(transactions: list[dict], db: Session) -> dict:
-        """Analyze transaction patterns using graph analysis"""
+        """
+        Analyze transaction patterns using graph analysis. With GRAPH_LIVE_ENABLED the
+        transactions join the live graph, and only the components they added edges to
+        are re-analysed and stored; otherwise a graph of these transactions alone is.
+        """
+
+        if settings.RING_DETECTOR_ENABLED:
+            for txn in transactions:
+                ring_detector.observe(txn)
+
+        if settings.GRAPH_LIVE_ENABLED:
+            return GraphAnalysisService.analyze_live_graph(live_graph, transactions, db)
 
         # Build transaction graph
         G = graph_analyzer.build_transaction_graph(transactions)
+        return GraphAnalysisService._analyze(G, G.number_of_nodes(), G.number_of_edges(), db)
 
+    @staticmethod
+    def analyze_live_graph(graph: LiveTransactionGraph, transactions: list[dict], db: Session):
+        """
+        Add the transactions to the live graph, re-analysing and storing only the
+        components they add edges to. The graph takes them only once that is committed.
+        """
+        graph.ensure_hydrated(db)
+        with graph.update_lock:
+            G, new_edges, total_nodes, total_edges = graph.plan(transactions)
+            result = GraphAnalysisService._analyze(G, total_nodes, total_edges, db, new_edges)
+            graph.commit(transactions)
+        return result
+
+    @staticmethod
+    def _analyze(
+        G: nx.Graph, total_nodes: int, total_edges: int, db: Session, edges: list | None = None
+    ) -> dict:
+        """Detect rings in G and store its nodes with their risks and its edges (or edges)"""
         # Detect fraud rings
         fraud_rings = graph_analyzer.detect_fraud_rings(G)
 
-        # Calculate node risks
-        node_risks = graph_analyzer.calculate_node_risks(G)
+        # Calculate node risks, normalized over the whole graph
+        node_risks = graph_analyzer.calculate_node_risks(G, total_nodes)
 
         # Store graph in database
-        GraphAnalysisService._store_graph(G, node_risks, db)
+        GraphAnalysisService._store_graph(G, node_risks, db, edges=edges)
 
         analysis_result = {
-            "total_nodes": G.number_of_nodes(),
-            "total_edges": G.number_of_edges(),
+            "total_nodes": total_nodes,
+            "total_edges": total_edges,
+            "analyzed_nodes": G.number_of_nodes(),
             "fraud_rings_detected": len(fraud_rings),
             "fraud_rings": fraud_rings,
             "high_risk_nodes": [node for node, risk in node_risks.items() if risk > 0.7],
@@ -62,64 +119,137 @@ class GraphAnalysisService:
         return analysis_result
 
     @staticmethod
-    def _store_graph(G: nx.Graph, node_risks: dict, db: Session):
-        """Store graph data in database"""
-
-        # Store nodes
-        for node in G.nodes():
+    def _store_graph(G: nx.Graph, node_risks: dict, db: Session, edges: list | None = None):
+        """
+        Store graph data in database: one upsert for the nodes (existing nodes get their
+        current risk group, size and risk) and one bulk insert of the edges not stored yet.
+        edges, as (from_node, to_node, weight), limits the edges checked (default: all of G)
+        """
+        node_rows = []
+        for node, attributes in G.nodes(data=True):
             risk = node_risks.get(node, 0)
+            group, size = risk_group(risk)
+            node_type = attributes.get("node_type", "unknown")
+            node_rows.append(
+                {
+                    "node_id": str(node),
+                    "label": f"{node_type}_{node}",
+                    "group": group,
+                    "size": size,
+                    "title": f"Risk: {risk:.2f}",
+                    "meta_data": {"node_type": node_type, "risk_score": risk},
+                }
+            )
+        edge_rows = [
+            {
+                "from_node": str(from_node),
+                "to_node": str(to_node),
+                "weight": weight,
+                "meta_data": {"weight": weight},
+            }
+            for from_node, to_node, weight in (
+                G.edges(data="weight", default=1.0) if edges is None else edges
+            )
+        ]
+
+        connection = db.connection()
+        GraphAnalysisService.upsert_graph_nodes(connection, node_rows)
+        GraphAnalysisService.insert_graph_edges(connection, edge_rows)
+        db.commit()
+        logger.info(f"Graph stored: {len(node_rows)} nodes, {len(edge_rows)} edges")
 
-            # Determine group based on risk
-            if risk >= 0.8:
-                group = "Detected"
-                size = 30
-            elif risk >= 0.6:
-                group = "Investigation"
-                size = 20
-            elif risk >= 0.4:
-                group = "Suspicious"
-                size = 15
-            else:
-                group = "Safe"
-                size = 10
-
-            node_type = G.nodes[node].get("node_type", "unknown")
-
-            # Check if node exists
-            existing_node = db.query(GraphNode).filter(GraphNode.node_id == str(node)).first()
-
-            if not existing_node:
-                graph_node = GraphNode(
-                    node_id=str(node),
-                    label=f"{node_type}_{node}",
-                    group=group,
-                    size=size,
-                    title=f"Risk: {risk:.2f}",
-                    meta_data={"node_type": node_type, "risk_score": risk},
-                )
-                db.add(graph_node)
-
-        # Store edges
-        for edge in G.edges():
-            from_node, to_node = edge
-            weight = G[from_node][to_node].get("weight", 1.0)
-
-            # Check if edge exists
-            existing_edge = (
-                db.query(GraphEdge)
-                .filter(GraphEdge.from_node == str(from_node))
-                .filter(GraphEdge.to_node == str(to_node))
-                .first()
+    @staticmethod
+    def upsert_graph_nodes(connection: Connection, rows: list[dict]) -> int:
+        """Insert or update graph nodes by node_id with upsert_rows; the caller commits."""
+        return upsert_rows(connection, GraphNode, "node_id", _NODE_UPDATED_COLUMNS, rows)
+
+    @staticmethod
+    def insert_graph_edges(connection: Connection, rows: list[dict]) -> int:
+        """
+        Insert the edges whose (from_node, to_node) pair is not stored yet, found with
+        one tuple IN lookup per chunk, in one executemany INSERT. The caller owns the
+        transaction. Returns the number of edges inserted.
+        """
+        rows = list({(row["from_node"], row["to_node"]): row for row in rows}.values())
+        pairs = [(row["from_node"], row["to_node"]) for row in rows]
+        existing = set()
+        for start in range(0, len(pairs), _LOOKUP_CHUNK_SIZE):
+            existing.update(
+                connection.execute(
+                    select(GraphEdge.from_node, GraphEdge.to_node).where(
+                        tuple_(GraphEdge.from_node, GraphEdge.to_node).in_(
+                            pairs[start : start + _LOOKUP_CHUNK_SIZE]
+                        )
+                    )
+                ).tuples()
             )
+        new_rows = [row for row, pair in zip(rows, pairs, strict=True) if pair not in existing]
+        if new_rows:
+            connection.execute(insert(GraphEdge), new_rows)
+        return len(new_rows)
+
+
+class LiveGraphUpdater(BatchWorker):
+    """
+    Feeds scored transactions into the live graph in the background. observe() queues
+    a transaction's customer, card, IP and amount and returns; a background thread
+    runs analyze_live_graph once per batch, so the components the batch adds edges to
+    are re-analysed and stored together. The ring detector is fed on the scoring path
+    and is left out here. When the queue is full the transaction is dropped and
+    counted, and a failed batch is logged and counted; neither reaches the graph.
+    """
+
+    thread_name = "live-graph-updater"
+
+    def __init__(
+        self,
+        graph: LiveTransactionGraph = live_graph,
+        max_queue: int = 100_000,
+        batch_size: int = 5_000,
+        flush_interval_ms: float = 1000.0,
+        session_factory: sessionmaker = SessionLocal,
+    ):
+        super().__init__(max_queue=max_queue, batch_size=batch_size, max_wait_ms=flush_interval_ms)
+        self.graph = graph
+        self.session_factory = session_factory
+        self.observed = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def observe(self, transaction_data: dict):
+        if not self.running:
+            self.start()
+        self.observed += 1
+        txn = {name: transaction_data.get(name) for name in _GRAPH_FIELDS}
+        if not self._put(txn):
+            self.dropped += 1
+
+    def _flush(self, batch: list[dict]):
+        db = self.session_factory()
+        try:
+            GraphAnalysisService.analyze_live_graph(self.graph, batch, db)
+            self.batches += 1
+        except Exception as e:
+            db.rollback()
+            self.failed += len(batch)
+            logger.error(f"Failed to add {len(batch)} transactions to the live graph: {e}")
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        return {
+            **self.queue_stats(),
+            "observed": self.observed,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
 
-            if not existing_edge:
-                graph_edge = GraphEdge(
-                    from_node=str(from_node),
-                    to_node=str(to_node),
-                    weight=weight,
-                    meta_data={"weight": weight},
-                )
-                db.add(graph_edge)
 
-        db.commit()
-        logger.info(f"Graph stored: {G.number_of_nodes()} nodes, {G.number_of_edges()} edges")
+# Global instance
+graph_updater = LiveGraphUpdater(
+    max_queue=settings.GRAPH_LIVE_MAX_QUEUE,
+    batch_size=settings.GRAPH_LIVE_BATCH_SIZE,
+    flush_interval_ms=settings.GRAPH_LIVE_FLUSH_INTERVAL_MS,
+)
@@ -0,0 +1,179 @@
+import threading
+
+from app.config import settings
+from app.utils.logger import logger
+
+NODE_TYPES = ("customer", "card", "ip", "device")
+CUSTOMER, CARD, IP, DEVICE = range(len(NODE_TYPES))
+# Keys of each type's members in ring summaries
+_MEMBER_KEYS = ("customers", "cards", "ips", "devices")
+# Transaction fields naming the identifiers customers are linked through
+_IDENTIFIER_FIELDS = ((CARD, "card_id"), (IP, "ip_address"), (DEVICE, "device_id"))
+
+
+class _Component:
+    __slots__ = ("counts", "members")
+
+    def __init__(self, node: tuple):
+        self.counts = [0] * len(NODE_TYPES)
+        self.counts[node[0]] = 1
+        self.members = [node]
+
+
+class StreamingRingDetector:
+    """
+    Fraud rings among customers sharing a card, IP or device, found as transactions
+    arrive with a union-find (disjoint set) over customers and identifiers.
+
+    observe() merges a transaction's customer with its card, IP and device in
+    amortized near-constant time (union by size, path halving). Each component keeps
+    its node count per type and its members, the smaller member list moved into the
+    larger on merge. A component is a ring while it links min_customers to
+    max_customers customers through at most max_identifiers_per_customer identifiers
+    per customer: several people on a few shared cards, IPs and devices, rather than
+    one customer's own ones or shared infrastructure such as a carrier NAT IP.
+    Past max_nodes the detector starts over, so memory stays bounded.
+    """
+
+    def __init__(
+        self,
+        min_customers: int = 3,
+        max_customers: int = 50,
+        max_identifiers_per_customer: float = 1.5,
+        max_nodes: int = 2_000_000,
+    ):
+        self.min_customers = min_customers
+        self.max_customers = max_customers
+        self.max_identifiers_per_customer = max_identifiers_per_customer
+        self.max_nodes = max_nodes
+        self._parent: dict[tuple, tuple] = {}
+        self._components: dict[tuple, _Component] = {}
+        self._rings: set[tuple] = set()
+        self._lock = threading.Lock()
+        self.transactions = 0
+        self.merges = 0
+        self.flagged = 0
+        self.resets = 0
+
+    def __len__(self) -> int:
+        return len(self._parent)
+
+    def clear(self):
+        with self._lock:
+            self._parent.clear()
+            self._components.clear()
+            self._rings.clear()
+
+    def _find(self, node: tuple) -> tuple:
+        parent = self._parent
+        if node not in parent:
+            parent[node] = node
+            self._components[node] = _Component(node)
+            return node
+        while parent[node] != node:
+            parent[node] = node = parent[parent[node]]
+        return node
+
+    def _union(self, a: tuple, b: tuple) -> tuple:
+        if a == b:
+            return a
+        components = self._components
+        if len(components[a].members) < len(components[b].members):
+            a, b = b, a
+        self._parent[b] = a
+        kept, merged = components[a], components.pop(b)
+        kept.counts = [x + y for x, y in zip(kept.counts, merged.counts, strict=True)]
+        kept.members.extend(merged.members)
+        self._rings.discard(b)
+        self.merges += 1
+        return a
+
+    def _is_ring(self, counts: list[int]) -> bool:
+        customers = counts[CUSTOMER]
+        return (
+            self.min_customers <= customers <= self.max_customers
+            and sum(counts) - customers <= self.max_identifiers_per_customer * customers
+        )
+
+    def observe(self, transaction: dict) -> bool:
+        """
+        Merge the transaction's customer with its card_id, ip_address and device_id.
+        Returns whether the customer is now in a ring (see ring()).
+        """
+        customer_id = transaction.get("customer_id")
+        if not customer_id:
+            return False
+        with self._lock:
+            if len(self._parent) >= self.max_nodes:
+                logger.warning(f"Ring detector reached {self.max_nodes} nodes; starting over")
+                self._parent.clear()
+                self._components.clear()
+                self._rings.clear()
+                self.resets += 1
+            self.transactions += 1
+            root = self._find((CUSTOMER, customer_id))
+            for node_type, field in _IDENTIFIER_FIELDS:
+                value = transaction.get(field)
+                if value:
+                    root = self._union(root, self._find((node_type, value)))
+
+            component = self._components[root]
+            if not self._is_ring(component.counts):
+                self._rings.discard(root)
+                return False
+            if root not in self._rings:
+                self._rings.add(root)
+                self.flagged += 1
+                logger.info(f"Fraud ring flagged: {component.counts[CUSTOMER]} customers")
+            return True
+
+    @staticmethod
+    def _summary(component: _Component) -> dict:
+        members: dict[str, list[str]] = {key: [] for key in _MEMBER_KEYS}
+        for node_type, value in component.members:
+            members[_MEMBER_KEYS[node_type]].append(value)
+        return {"size": len(component.members), **members}
+
+    def ring(self, customer_id: str) -> dict | None:
+        """
+        The ring holding customer_id, if any: its size and its customers, cards, ips
+        and devices.
+        """
+        with self._lock:
+            node = (CUSTOMER, customer_id)
+            if node not in self._parent:
+                return None
+            root = self._find(node)
+            if root not in self._rings:
+                return None
+            return self._summary(self._components[root])
+
+    def rings(self, limit: int = 100) -> list[dict]:
+        """Flagged rings, those linking the most customers first."""
+        with self._lock:
+            components = sorted(
+                (self._components[root] for root in self._rings),
+                key=lambda component: component.counts[CUSTOMER],
+                reverse=True,
+            )
+            return [self._summary(component) for component in components[:limit]]
+
+    def stats(self) -> dict:
+        return {
+            "nodes": len(self._parent),
+            "components": len(self._components),
+            "rings": len(self._rings),
+            "transactions": self.transactions,
+            "merges": self.merges,
+            "flagged": self.flagged,
+            "resets": self.resets,
+        }
+
+
+# Global instance
+ring_detector = StreamingRingDetector(
+    min_customers=settings.RING_DETECTOR_MIN_CUSTOMERS,
+    max_customers=settings.RING_DETECTOR_MAX_CUSTOMERS,
+    max_identifiers_per_customer=settings.RING_DETECTOR_MAX_IDENTIFIERS_PER_CUSTOMER,
+    max_nodes=settings.RING_DETECTOR_MAX_NODES,
+)
@@ -1,9 +1,89 @@
+from collections import Counter
+from collections.abc import Iterator
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import bindparam, case, func, select, text, update
+from sqlalchemy.engine import Connection
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.ml_models.risk_scorer import risk_scorer
-from app.models.fraud import RiskProfile
+from app.ml_models.rule_engine import risk_rules
+from app.models.fraud import RiskLevelCount, RiskProfile
 from app.utils.helpers import utcnow
-from app.utils.logger import logger
+from app.utils.pagination import keyset_page, stream_ndjson
+from app.utils.upsert import (
+    insert_new_rows,
+    on_conflict_do_nothing,
+    on_conflict_upsert,
+    upsert_rows,
+)
+
+# Columns an upsert overwrites on an existing profile; name and account age keep their
+# first values, as before
+_UPSERT_UPDATED_COLUMNS = (
+    "risk_score",
+    "risk_factors",
+    "status",
+    "risk_inputs",
+    "last_activity",
+    "updated_at",
+)
+# customer_data keys the score and the risk factor rules read, stored with the profile
+RISK_INPUT_NAMES = tuple(dict.fromkeys([*risk_scorer.risk_weights, *risk_rules.feature_names]))
+# /risk/distribution buckets: lowest score of each level, highest level first
+RISK_LEVELS = {"critical": 90, "high": 70, "medium": 50, "low": 0}
+# Customer IDs per IN lookup, within SQLite's bound parameter limit
+_LOOKUP_CHUNK_SIZE = 10_000
+
+
+def risk_input_values(customer_data: dict) -> dict:
+    """The risk inputs customer_data carries, as stored in risk_profiles.risk_inputs."""
+    return {
+        name: customer_data[name]
+        for name in RISK_INPUT_NAMES
+        if customer_data.get(name) is not None
+    }
+
+
+def risk_level(score: int) -> str:
+    for level, minimum in RISK_LEVELS.items():
+        if score >= minimum:
+            return level
+    return "low"
+
+
+def _risk_level_case(score_column):
+    return case(
+        *[(score_column >= minimum, level) for level, minimum in RISK_LEVELS.items() if minimum],
+        else_="low",
+    )
+
+
+def _single_row_statement(on_conflict: str):
+    """
+    Textual single-row INSERT ... ON CONFLICT (customer_id) <on_conflict> RETURNING of
+    risk_profiles, valid on PostgreSQL and SQLite. The dialect insert constructs
+    cannot be cached, so each execution would recompile them; this statement is
+    compiled once.
+    """
+    table = RiskProfile.__table__
+    columns = [column for column in table.c if column.name != "id"]
+    sql = (
+        f"INSERT INTO {table.name} ({', '.join(c.name for c in columns)}) "
+        f"VALUES ({', '.join(f':{c.name}' for c in columns)}) "
+        f"ON CONFLICT (customer_id) {on_conflict} "
+        f"RETURNING {', '.join(c.name for c in table.c)}"
+    )
+    statement = text(sql).bindparams(*[bindparam(c.name, type_=c.type) for c in columns])
+    return select(RiskProfile).from_statement(statement.columns(*table.c))
+
+
+_SINGLE_INSERT = _single_row_statement("DO NOTHING")
+_SINGLE_UPSERT = _single_row_statement(
+    "DO UPDATE SET " + ", ".join(f"{name} = excluded.{name}" for name in _UPSERT_UPDATED_COLUMNS)
+)
 
 
 class RiskAnalysisService:
@@ -11,62 +91,395 @@ class RiskAnalysisService:
 
     @staticmethod
     def calculate_customer_risk(customer_data: dict, db: Session) -> RiskProfile:
-        """Calculate and store customer risk profile"""
-
-        # Calculate risk score
+        """
+        Calculate and store customer risk profile with one INSERT ... ON CONFLICT DO
+        UPDATE ... RETURNING, so concurrent calls for a new customer cannot collide
+        """
         risk_score = risk_scorer.calculate_risk_score(customer_data)
-
-        # Identify risk factors
         risk_factors = risk_scorer.identify_risk_factors(customer_data)
-
-        # Determine status
         status = risk_scorer.determine_status(risk_score)
 
-        # Check if profile exists
-        existing_profile = (
-            db.query(RiskProfile)
-            .filter(RiskProfile.customer_id == customer_data["customer_id"])
-            .first()
+        now = utcnow()
+        row = {
+            "customer_id": customer_data["customer_id"],
+            "customer_name": customer_data.get("customer_name", "Unknown"),
+            "risk_score": risk_score,
+            "risk_factors": risk_factors,
+            "status": status,
+            "account_age": str(customer_data.get("account_age", "0 days")),
+            "risk_inputs": risk_input_values(customer_data),
+            "last_activity": now,
+            "created_at": now,
+            "updated_at": now,
+        }
+        return RiskAnalysisService._upsert_returning([row], db)[0]
+
+    @staticmethod
+    def upsert_customer_risks(customers: list[dict], db: Session) -> list[RiskProfile]:
+        """Bulk calculate_customer_risk: score all customers at once, upsert them in one go."""
+        return RiskAnalysisService._upsert_returning(
+            RiskAnalysisService.risk_profile_rows(customers), db
         )
 
-        if existing_profile:
-            # Update existing profile
-            existing_profile.risk_score = risk_score
-            existing_profile.risk_factors = risk_factors
-            existing_profile.status = status
-            existing_profile.last_activity = utcnow()
-            existing_profile.updated_at = utcnow()
-            db.commit()
-            db.refresh(existing_profile)
-            return existing_profile
+    @staticmethod
+    def _upsert_returning(rows: list[dict], db: Session) -> list[RiskProfile]:
+        if not rows:
+            return []
+        # Last write wins for a customer repeated within the batch
+        rows = list({row["customer_id"]: row for row in rows}.values())
+        dialect = db.get_bind().dialect.name
+
+        if dialect in ("postgresql", "sqlite"):
+            # The steps of upsert_risk_profiles, with RETURNING. RETURNING in parameter
+            # order would force one statement per row; batched statements return rows
+            # in any order, so match them up by customer_id
+            connection = db.connection()
+            stored = RiskAnalysisService._lock_profiles(
+                connection, [row["customer_id"] for row in rows]
+            )
+            created = RiskAnalysisService._write_returning(
+                db,
+                [row for row in rows if row["customer_id"] not in stored],
+                _SINGLE_INSERT,
+                on_conflict_do_nothing(dialect, RiskProfile, "customer_id"),
+            )
+            by_customer = {profile.customer_id: profile for profile in created}
+            raced = [
+                row["customer_id"]
+                for row in rows
+                if row["customer_id"] not in stored and row["customer_id"] not in by_customer
+            ]
+            if raced:
+                stored.update(RiskAnalysisService._lock_profiles(connection, raced))
+            updated = RiskAnalysisService._write_returning(
+                db,
+                [row for row in rows if row["customer_id"] not in by_customer],
+                _SINGLE_UPSERT,
+                on_conflict_upsert(dialect, RiskProfile, "customer_id", _UPSERT_UPDATED_COLUMNS),
+            )
+            by_customer.update((profile.customer_id, profile) for profile in updated)
+            RiskAnalysisService._move_level_counts(connection, rows, stored)
+            profiles = [by_customer[row["customer_id"]] for row in rows]
         else:
-            # Create new profile
-            new_profile = RiskProfile(
-                customer_id=customer_data["customer_id"],
-                customer_name=customer_data.get("customer_name", "Unknown"),
-                risk_score=risk_score,
-                risk_factors=risk_factors,
-                status=status,
-                account_age=customer_data.get("account_age", "0 days"),
-                last_activity=utcnow(),
+            RiskAnalysisService.upsert_risk_profiles(db.connection(), rows)
+            by_customer = {
+                profile.customer_id: profile
+                for profile in db.query(RiskProfile)
+                .filter(RiskProfile.customer_id.in_([row["customer_id"] for row in rows]))
+                .populate_existing()
+            }
+            profiles = [by_customer[row["customer_id"]] for row in rows]
+
+        # Detach before commit so the returned profiles keep their loaded values instead
+        # of being expired and reloaded one SELECT each
+        for profile in profiles:
+            db.expunge(profile)
+        db.commit()
+        return profiles
+
+    @staticmethod
+    def _write_returning(db: Session, rows: list[dict], single, batched) -> list[RiskProfile]:
+        """Execute the single-row statement for one row, else the batched one with RETURNING"""
+        options = {"populate_existing": True}
+        if not rows:
+            return []
+        if len(rows) == 1:
+            return db.scalars(single, rows[0], execution_options=options).all()
+        return db.scalars(batched.returning(RiskProfile), rows, execution_options=options).all()
+
+    @staticmethod
+    def upsert_risk_profiles(connection: Connection, rows: list[dict]) -> int:
+        """
+        Insert or update many risk profiles by customer_id. Existing profiles get the
+        new score, factors, status and activity time, like calculate_customer_risk;
+        customer_name and account_age are only set on insert. The stored profiles are
+        locked and their scores read in one lookup per chunk, new customers inserted
+        with insert_new_rows, the rest updated with upsert_rows, and the level counters
+        moved last. The caller owns the transaction. Returns the number of rows written.
+        """
+        if not rows:
+            return 0
+        # Last write wins for a customer repeated within the batch
+        rows = list({row["customer_id"]: row for row in rows}.values())
+        stored = RiskAnalysisService._lock_profiles(
+            connection, [row["customer_id"] for row in rows]
+        )
+        created = RiskAnalysisService._insert_new_profiles(connection, rows, stored)
+        RiskAnalysisService._update_profiles(connection, rows, created, stored)
+        return len(rows)
+
+    @staticmethod
+    def _insert_new_profiles(
+        connection: Connection, rows: list[dict], stored: dict, *columns
+    ) -> set[str]:
+        """
+        Insert the rows of customers missing from stored and return those inserted. A
+        customer another writer created after stored was read is locked and added to
+        stored (with the same columns) instead, so it is updated from its stored
+        values like any other.
+        """
+        missing = [row for row in rows if row["customer_id"] not in stored]
+        created = insert_new_rows(connection, RiskProfile, "customer_id", missing)
+        raced = [row["customer_id"] for row in missing if row["customer_id"] not in created]
+        if raced:
+            stored.update(RiskAnalysisService._lock_profiles(connection, raced, *columns))
+        return created
+
+    @staticmethod
+    def _update_profiles(
+        connection: Connection, rows: list[dict], created: set[str], stored: dict[str, tuple]
+    ):
+        """Update the rows not created by this write and move the level counters for all"""
+        upsert_rows(
+            connection,
+            RiskProfile,
+            "customer_id",
+            _UPSERT_UPDATED_COLUMNS,
+            [row for row in rows if row["customer_id"] not in created],
+        )
+        RiskAnalysisService._move_level_counts(connection, rows, stored)
+
+    @staticmethod
+    def merge_risk_inputs(connection: Connection, updates: list[dict]) -> list[dict]:
+        """
+        Rescore customers from partial updates ({"customer_id", "customer_name",
+        "risk_inputs"}) applied over the risk inputs stored with their profiles, and
+        upsert the results. Later updates of a customer win over earlier ones and both
+        over stored values; a customer without a stored profile starts from its updates
+        alone. Stored profiles are locked before their inputs are read, and a profile
+        another writer creates meanwhile is read and merged over, so concurrent merges
+        for one customer apply in turn. The caller owns the transaction. Returns the
+        upserted rows.
+        """
+        records: dict[str, dict] = {}
+        for change in updates:
+            record = records.setdefault(
+                change["customer_id"],
+                {
+                    "customer_id": change["customer_id"],
+                    "customer_name": change.get("customer_name") or "Unknown",
+                },
+            )
+            record.update(change["risk_inputs"])
+        if not records:
+            return []
+
+        stored = RiskAnalysisService._lock_profiles(
+            connection, list(records), RiskProfile.risk_inputs
+        )
+
+        def merged_rows(customer_ids: list[str]) -> dict[str, dict]:
+            rows = RiskAnalysisService.risk_profile_rows(
+                [
+                    {**(stored.get(customer_id, (None, None))[1] or {}), **records[customer_id]}
+                    for customer_id in customer_ids
+                ]
+            )
+            return {row["customer_id"]: row for row in rows}
+
+        rows = merged_rows(list(records))
+        missing = [customer_id for customer_id in rows if customer_id not in stored]
+        created = RiskAnalysisService._insert_new_profiles(
+            connection, list(rows.values()), stored, RiskProfile.risk_inputs
+        )
+        raced = [customer_id for customer_id in missing if customer_id not in created]
+        if raced:
+            # Created by another writer since the lookup: merge over what it stored
+            rows.update(merged_rows(raced))
+        RiskAnalysisService._update_profiles(connection, list(rows.values()), created, stored)
+        return list(rows.values())
+
+    @staticmethod
+    def _lock_profiles(
+        connection: Connection, customer_ids: list[str], *columns
+    ) -> dict[str, tuple]:
+        """
+        (risk_score, *columns) of the customers' stored profiles, locked until the
+        caller's transaction ends (SELECT ... FOR UPDATE on PostgreSQL; SQLite
+        already admits one writer at a time). One lookup per chunk of customers.
+        """
+        stored: dict[str, tuple] = {}
+        for start in range(0, len(customer_ids), _LOOKUP_CHUNK_SIZE):
+            rows = connection.execute(
+                select(RiskProfile.customer_id, RiskProfile.risk_score, *columns)
+                .where(
+                    RiskProfile.customer_id.in_(customer_ids[start : start + _LOOKUP_CHUNK_SIZE])
+                )
+                .with_for_update()
+            )
+            stored.update((customer_id, tuple(values)) for customer_id, *values in rows)
+        return stored
+
+    @staticmethod
+    def _move_level_counts(connection: Connection, rows: list[dict], stored: dict[str, tuple]):
+        """
+        Update risk_level_counts for upserted profiles, in the caller's transaction:
+        each customer leaves the level of its stored score, if stored has one (those
+        the write created do not), and
+        joins the level of its new one. Callers lock the customers' profiles before
+        reading stored, so concurrent writes of one customer move it in turn. Only
+        the levels that change are locked, in level order so writers cannot deadlock,
+        and updated with relative deltas; this runs last, so the counter rows are
+        held only until the caller commits.
+        """
+        deltas: Counter = Counter()
+        for row in rows:
+            if row["customer_id"] in stored:
+                deltas[risk_level(stored[row["customer_id"]][0] or 0)] -= 1
+            deltas[risk_level(row["risk_score"])] += 1
+        changed = {level: delta for level, delta in deltas.items() if delta}
+        if not changed:
+            return
+        connection.execute(
+            select(RiskLevelCount.level)
+            .where(RiskLevelCount.level.in_(changed))
+            .order_by(RiskLevelCount.level)
+            .with_for_update()
+        ).all()
+        connection.execute(
+            update(RiskLevelCount)
+            .where(RiskLevelCount.level.in_(changed))
+            .values(count=RiskLevelCount.count + case(changed, value=RiskLevelCount.level, else_=0))
+        )
+
+    @staticmethod
+    def _count_levels(connection: Connection) -> dict[str, int]:
+        """Profiles per risk level, with one CASE / GROUP BY"""
+        level = _risk_level_case(RiskProfile.risk_score)
+        counts = dict.fromkeys(RISK_LEVELS, 0)
+        counts.update(
+            connection.execute(select(level, func.count(RiskProfile.id)).group_by(level)).all()
+        )
+        return counts
+
+    @staticmethod
+    def seed_risk_level_counts(connection: Connection) -> set[str]:
+        """
+        Create the risk_level_counts rows that do not exist yet, counted from the
+        stored profiles, so profile writes and rebuilds only ever update them. Run at
+        startup; a worker starting alongside skips the rows another one created.
+        Returns the levels created.
+        """
+        counts = RiskAnalysisService._count_levels(connection)
+        return insert_new_rows(
+            connection,
+            RiskLevelCount,
+            "level",
+            [{"level": name, "count": count} for name, count in counts.items()],
+        )
+
+    @staticmethod
+    def rebuild_risk_level_counts(db: Session) -> dict[str, int]:
+        """
+        Recount profiles per risk level and overwrite the counters. All counter rows
+        are locked, in level order, before the recount, so writes in flight are
+        counted once they commit and later ones apply their moves after it.
+        """
+        connection = db.connection()
+        RiskAnalysisService.seed_risk_level_counts(connection)
+        connection.execute(
+            select(RiskLevelCount.level).order_by(RiskLevelCount.level).with_for_update()
+        ).all()
+        counts = RiskAnalysisService._count_levels(connection)
+        connection.execute(
+            update(RiskLevelCount)
+            .where(RiskLevelCount.level == bindparam("b_level"))
+            .values(count=bindparam("b_count")),
+            [{"b_level": name, "b_count": count} for name, count in counts.items()],
+        )
+        db.commit()
+        return counts
+
+    @staticmethod
+    def risk_profile_rows(records: list[dict]) -> list[dict]:
+        """
+        risk_profiles rows for many customers. Scores, statuses and risk factors are
+        computed on columnar NumPy arrays with the same results as the scalar scorer.
+        """
+        records = [record for record in records if record.get("customer_id") is not None]
+        if not records:
+            return []
+        n = len(records)
+        columns = risk_scorer.risk_columns(records)
+        scores = risk_scorer.calculate_risk_scores(columns, n)
+        statuses = risk_scorer.determine_statuses(scores)
+        masks = risk_scorer.risk_factor_masks(columns, n)
+        # Few distinct factor combinations exist, so decode each mask once
+        factor_lists = {mask: risk_rules.names_for_mask(mask) for mask in np.unique(masks).tolist()}
+
+        now = utcnow()
+        return [
+            {
+                "customer_id": record["customer_id"],
+                "customer_name": record.get("customer_name", "Unknown"),
+                "account_age": str(record.get("account_age", "0 days")),
+                "risk_score": score,
+                "risk_factors": factor_lists[mask],
+                "status": status,
+                "risk_inputs": risk_input_values(record),
+                "last_activity": now,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for record, score, status, mask in zip(
+                records, scores.tolist(), statuses.tolist(), masks.tolist(), strict=True
             )
-            db.add(new_profile)
-            db.commit()
-            db.refresh(new_profile)
+        ]
+
+    @staticmethod
+    def rescore_customers(records: list[dict], connection: Connection) -> int:
+        """Bulk calculate_customer_risk for offline rescoring, one upsert per call."""
+        return RiskAnalysisService.upsert_risk_profiles(
+            connection, RiskAnalysisService.risk_profile_rows(records)
+        )
 
-            logger.info(f"Risk profile created for customer {customer_data['customer_id']}")
-            return new_profile
+    @staticmethod
+    def profile_filters(
+        status: str | None = None,
+        customer_id: str | None = None,
+        active_from: datetime | None = None,
+        active_to: datetime | None = None,
+        min_score: int | None = None,
+        max_score: int | None = None,
+    ) -> list:
+        """WHERE conditions for profile listings; active_to and max_score are exclusive"""
+        conditions = []
+        if status is not None:
+            conditions.append(RiskProfile.status == status)
+        if customer_id is not None:
+            conditions.append(RiskProfile.customer_id == customer_id)
+        if active_from is not None:
+            conditions.append(RiskProfile.last_activity >= active_from)
+        if active_to is not None:
+            conditions.append(RiskProfile.last_activity < active_to)
+        if min_score is not None:
+            conditions.append(RiskProfile.risk_score >= min_score)
+        if max_score is not None:
+            conditions.append(RiskProfile.risk_score < max_score)
+        return conditions
 
     @staticmethod
-    def get_high_risk_customers(db: Session, threshold: int = 70) -> list[RiskProfile]:
-        """Get all high-risk customers"""
-        return (
-            db.query(RiskProfile)
-            .filter(RiskProfile.risk_score >= threshold)
-            .order_by(RiskProfile.risk_score.desc())
-            .all()
+    def list_profiles(
+        db: Session, filters: list, cursor: str | None = None, limit: int = 100
+    ) -> tuple[list[RiskProfile], str | None]:
+        """One page of profiles, highest score first, and the cursor of the next page"""
+        return keyset_page(
+            db.query(RiskProfile).filter(*filters),
+            [RiskProfile.risk_score, RiskProfile.id],
+            cursor,
+            limit,
         )
 
+    @staticmethod
+    def export_profiles(db: Session, filters: list) -> Iterator[str]:
+        """Every matching profile as NDJSON, highest score first, streamed in chunks"""
+        statement = (
+            select(RiskProfile.__table__)
+            .where(*filters)
+            .order_by(RiskProfile.risk_score.desc(), RiskProfile.id.desc())
+        )
+        return stream_ndjson(db.get_bind(), statement, settings.EXPORT_CHUNK_SIZE)
+
     @staticmethod
     def get_customer_risk_profile(customer_id: str, db: Session) -> RiskProfile:
         """Get risk profile for a specific customer"""
@@ -74,25 +487,11 @@ class RiskAnalysisService:
 
     @staticmethod
     def get_risk_distribution(db: Session) -> dict[str, int]:
-        """Get distribution of risk levels"""
-        profiles = db.query(RiskProfile).all()
-
-        distribution = {
-            "critical": 0,  # 90-100
-            "high": 0,  # 70-89
-            "medium": 0,  # 50-69
-            "low": 0,  # 0-49
-        }
-
-        for profile in profiles:
-            score = profile.risk_score
-            if score >= 90:
-                distribution["critical"] += 1
-            elif score >= 70:
-                distribution["high"] += 1
-            elif score >= 50:
-                distribution["medium"] += 1
-            else:
-                distribution["low"] += 1
-
-        return distribution
+        """
+        Get distribution of risk levels from the counters profile upserts maintain,
+        recounting once if they have not been built yet
+        """
+        counts = dict(db.query(RiskLevelCount.level, RiskLevelCount.count).all())
+        if counts.keys() != RISK_LEVELS.keys():
+            return RiskAnalysisService.rebuild_risk_level_counts(db)
+        return {level: counts[level] for level in RISK_LEVELS}
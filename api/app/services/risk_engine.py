@@ -0,0 +1,276 @@
+import threading
+from collections import OrderedDict
+
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import SessionLocal
+from app.ml_models.risk_scorer import risk_scorer
+from app.ml_models.rule_engine import risk_rules
+from app.services.risk_analysis import RiskAnalysisService, risk_input_values
+from app.utils.batching import BatchWorker
+from app.utils.logger import logger
+
+# Transaction amount above which a customer counts as making high-value purchases,
+# as in the "High-value transaction" fraud rule
+HIGH_VALUE_AMOUNT = 10_000
+# Distinct rule input combinations whose risk factors are remembered; risk inputs are
+# mostly flags and small counts, so few combinations recur across customers
+_FACTOR_CACHE_SIZE = 4096
+# Risk inputs named differently in transaction payloads
+_TRANSACTION_ALIASES = {
+    "failed_logins": "failed_login_attempts",
+    "account_age": "account_age_days",
+}
+
+
+def risk_inputs(transaction_data: dict, enriched: dict | None = None) -> dict:
+    """
+    Risk scorer inputs carried by a transaction payload as the caller sent it, coerced
+    as RiskScorer.coerce_input reads them; values it cannot read are dropped. Of the
+    feature-store enriched payload only the velocity is used: the store's account age
+    counts days since it first saw the customer, not the account's age. A transaction
+    over HIGH_VALUE_AMOUNT sets high_value_transaction, and smaller ones leave the
+    stored flag as it is.
+    """
+    event = {
+        "customer_id": transaction_data.get("customer_id"),
+        "customer_name": transaction_data.get("customer_name"),
+    }
+    for factor in (*risk_scorer.risk_weights, *risk_rules.feature_names):
+        value = transaction_data.get(factor)
+        if value is None and factor in _TRANSACTION_ALIASES:
+            value = transaction_data.get(_TRANSACTION_ALIASES[factor])
+        if value is None and factor == "transaction_velocity" and enriched is not None:
+            value = enriched.get(factor)
+        value = risk_scorer.coerce_input(factor, value)
+        if value is not None:
+            event[factor] = value
+    amount = transaction_data.get("amount")
+    if "high_value_transaction" not in event and amount is not None:
+        if amount > HIGH_VALUE_AMOUNT:
+            event["high_value_transaction"] = True
+    return event
+
+
+class _RiskState:
+    __slots__ = ("customer_name", "terms", "rule_inputs", "profile", "unwritten", "loaded")
+
+    def __init__(self, customer_name: str, n_terms: int):
+        self.customer_name = customer_name
+        self.terms = [0.0] * n_terms
+        self.rule_inputs: dict[str, float] = {}
+        # (risk_score, risk_factors, status) last queued for the customer
+        self.profile: tuple[int, list[str], str] | None = None
+        # Risk inputs observed here and not yet written to risk_profiles
+        self.unwritten: dict = {}
+        # Whether the stored inputs have been merged into terms and rule_inputs
+        self.loaded = False
+
+
+class IncrementalRiskEngine(BatchWorker):
+    """
+    Live customer risk profiles, kept in memory and written to risk_profiles in bulk.
+
+    observe() folds a customer's latest risk inputs into its state: one contribution
+    per RiskScorer weight plus the values the risk factor rules read. The score is
+    re-summed only when a contribution changes and the rules re-run only when one of
+    their inputs does. A customer whose inputs changed is queued with the inputs
+    not written yet; a background thread applies queued updates with
+    merge_risk_inputs, one lookup and one upsert per batch, so each profile is
+    rescored from its stored inputs plus the new ones, with the same results as
+    calculate_customer_risk on the merged inputs. The merged inputs are then loaded
+    into the customer's state, after which an event that leaves the profile
+    unchanged is not queued.
+    Customers are held in LRU order, the least recently active evicted past
+    max_customers. If the queue is full or a batch fails, the update is counted and
+    the customer's next event queues its unwritten inputs again.
+    """
+
+    thread_name = "risk-engine"
+
+    def __init__(
+        self,
+        max_customers: int = 100_000,
+        max_queue: int = 100_000,
+        batch_size: int = 5_000,
+        flush_interval_ms: float = 1000.0,
+        session_factory: sessionmaker = SessionLocal,
+    ):
+        super().__init__(max_queue=max_queue, batch_size=batch_size, max_wait_ms=flush_interval_ms)
+        self.max_customers = max_customers
+        self.session_factory = session_factory
+        self._factors = list(risk_scorer.risk_weights)
+        self._customers: OrderedDict[str, _RiskState] = OrderedDict()
+        self._state_lock = threading.Lock()
+        self._factor_cache: dict[tuple, list[str]] = {}
+        self.events = 0
+        self.rescored = 0
+        self.evictions = 0
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def __len__(self) -> int:
+        return len(self._customers)
+
+    def clear(self):
+        with self._state_lock:
+            self._customers.clear()
+
+    def _get_or_create(self, customer_id: str, event: dict) -> _RiskState:
+        state = self._customers.get(customer_id)
+        if state is None:
+            state = self._customers[customer_id] = _RiskState(
+                event.get("customer_name") or "Unknown", len(self._factors)
+            )
+            if len(self._customers) > self.max_customers:
+                self._customers.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._customers.move_to_end(customer_id)
+        return state
+
+    def _apply(self, state: _RiskState, inputs: dict) -> tuple[bool, bool]:
+        """Fold inputs into state; returns whether a score term and a rule input changed."""
+        terms_changed = False
+        for i, factor in enumerate(self._factors):
+            if factor in inputs:
+                term = risk_scorer.risk_term(factor, inputs[factor])
+                if term != state.terms[i]:
+                    state.terms[i] = term
+                    terms_changed = True
+        rules_changed = False
+        for name, value in risk_scorer.rule_inputs(inputs).items():
+            if state.rule_inputs.get(name) != value:
+                state.rule_inputs[name] = value
+                rules_changed = True
+        return terms_changed, rules_changed
+
+    def observe(self, event: dict) -> tuple[int, list[str], str] | None:
+        """
+        Fold a customer's risk inputs (calculate_customer_risk's customer_data) into
+        its live profile. Returns (risk_score, risk_factors, status) as known to this
+        worker when the customer was queued for writing, else None. Until the stored
+        inputs are loaded after the first write, the profile covers only the inputs
+        seen here.
+        """
+        customer_id = event.get("customer_id")
+        if not customer_id:
+            return None
+        with self._state_lock:
+            self.events += 1
+            state = self._get_or_create(customer_id, event)
+            terms_changed, rules_changed = self._apply(state, event)
+            if state.profile is not None and not terms_changed and not rules_changed:
+                return None
+            state.unwritten.update(risk_input_values(event))
+
+            self.rescored += 1
+            previous = state.profile
+            if previous is None or terms_changed:
+                risk_score = risk_scorer.score_from_terms(state.terms)
+                status = risk_scorer.determine_status(risk_score)
+            else:
+                risk_score, _, status = previous
+            if previous is None or rules_changed:
+                risk_factors = self._risk_factors(state.rule_inputs)
+            else:
+                risk_factors = previous[1]
+            profile = (risk_score, risk_factors, status)
+            # A partial state cannot tell whether the stored profile changes
+            if profile == previous and state.loaded:
+                return None
+            state.profile = profile
+            update = {
+                "customer_id": customer_id,
+                "customer_name": state.customer_name,
+                "risk_inputs": dict(state.unwritten),
+            }
+
+        if not self.running:
+            self.start()
+        if not self._put(update):
+            with self._state_lock:
+                # Not written; the next event queues the unwritten inputs again
+                state.profile = None
+            self.dropped += 1
+        return profile
+
+    def _risk_factors(self, rule_inputs: dict[str, float]) -> list[str]:
+        key = tuple(rule_inputs.get(name) for name in risk_rules.feature_names)
+        factors = self._factor_cache.get(key)
+        if factors is None:
+            if len(self._factor_cache) >= _FACTOR_CACHE_SIZE:
+                self._factor_cache.clear()
+            factors, _ = risk_rules.apply_one(rule_inputs)
+            self._factor_cache[key] = factors
+        return factors
+
+    def _flush(self, batch: list[dict]):
+        db = self.session_factory()
+        try:
+            rows = RiskAnalysisService.merge_risk_inputs(db.connection(), batch)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.failed += len(batch)
+            logger.error(f"Failed to write {len(batch)} risk profiles: {e}")
+            with self._state_lock:
+                for update in batch:
+                    state = self._customers.get(update["customer_id"])
+                    if state is not None:
+                        state.profile = None
+            return
+        finally:
+            db.close()
+        self.written += len(rows)
+        self.batches += 1
+        self._load(batch, rows)
+
+    def _load(self, batch: list[dict], rows: list[dict]):
+        """Drop written inputs from the customers' unwritten ones and load the merged inputs."""
+        with self._state_lock:
+            for update in batch:
+                state = self._customers.get(update["customer_id"])
+                if state is None:
+                    continue
+                for name, value in update["risk_inputs"].items():
+                    if name in state.unwritten and state.unwritten[name] == value:
+                        del state.unwritten[name]
+            for row in rows:
+                state = self._customers.get(row["customer_id"])
+                if state is None:
+                    continue
+                # Inputs observed since the update was queued stay ahead of stored ones
+                self._apply(state, {**row["risk_inputs"], **state.unwritten})
+                risk_score = risk_scorer.score_from_terms(state.terms)
+                state.profile = (
+                    risk_score,
+                    self._risk_factors(state.rule_inputs),
+                    risk_scorer.determine_status(risk_score),
+                )
+                state.loaded = True
+
+    def stats(self) -> dict:
+        return {
+            **self.queue_stats(),
+            "customers": len(self._customers),
+            "events": self.events,
+            "rescored": self.rescored,
+            "evictions": self.evictions,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+# Global instance
+risk_engine = IncrementalRiskEngine(
+    max_customers=settings.RISK_ENGINE_MAX_CUSTOMERS,
+    max_queue=settings.RISK_ENGINE_MAX_QUEUE,
+    batch_size=settings.RISK_ENGINE_BATCH_SIZE,
+    flush_interval_ms=settings.RISK_ENGINE_FLUSH_INTERVAL_MS,
+)
@@ -0,0 +1,210 @@
+import time
+
+from sqlalchemy import case, func, insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import settings
+from app.database import SessionLocal
+from app.ml_models.fraud_detector import FraudDetector
+from app.models.fraud import ShadowPrediction
+from app.utils.batching import BatchWorker
+from app.utils.helpers import utcnow
+from app.utils.logger import logger
+
+
+class ShadowScorer(BatchWorker):
+    """
+    Score a challenger model version on live traffic without touching the request path.
+
+    submit() only enqueues (and drops when the queue is full); a daemon thread scores
+    queued transactions with the challenger and writes champion/challenger pairs to
+    shadow_predictions with one executemany INSERT per batch.
+    """
+
+    thread_name = "shadow-scorer"
+
+    def __init__(
+        self,
+        version: str,
+        max_queue: int = 10_000,
+        batch_size: int = 500,
+        flush_interval_seconds: float = 1.0,
+        session_factory: sessionmaker = SessionLocal,
+        detector: FraudDetector | None = None,
+    ):
+        super().__init__(
+            max_queue=max_queue, batch_size=batch_size, max_wait_ms=flush_interval_seconds * 1000
+        )
+        self.version = version
+        self.session_factory = session_factory
+        self.detector = detector or FraudDetector()
+        self._failed = False
+        self.scored = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.version) and not self._failed
+
+    def _prepare(self) -> bool:
+        if not self.enabled:
+            return False
+        if self.detector.version != self.version:
+            try:
+                self.detector.load_model(self.version)
+            except Exception as e:
+                # A missing challenger must never affect live scoring; stay off
+                self._failed = True
+                logger.error(f"Shadow model {self.version} could not be loaded: {e}")
+                return False
+        logger.info(f"Shadow scoring started with model version {self.version}")
+        return True
+
+    def submit(
+        self,
+        transaction_id: str | None,
+        features: dict[str, float],
+        champion_version: str | None,
+        champion_score: float,
+        champion_flagged: bool,
+        champion_latency_ms: float,
+    ):
+        """Queue a live prediction for shadow scoring. Never blocks."""
+        if not self.enabled:
+            return
+        if not self.running and not self.start():
+            return
+        item = (
+            transaction_id,
+            features,
+            champion_version,
+            champion_score,
+            champion_flagged,
+            champion_latency_ms,
+        )
+        if not self._put(item):
+            self.dropped += 1
+
+    def _flush(self, batch: list[tuple]):
+        rows = []
+        created_at = utcnow()
+        for (
+            transaction_id,
+            features,
+            champion_version,
+            champion_score,
+            champion_flagged,
+            champion_latency_ms,
+        ) in batch:
+            # Score one row at a time so latency is comparable with the live path
+            started = time.perf_counter()
+            challenger_flagged, challenger_score = self.detector.predict(features)
+            rows.append(
+                {
+                    "transaction_id": transaction_id,
+                    "champion_version": champion_version,
+                    "challenger_version": self.detector.version,
+                    "champion_score": champion_score,
+                    "challenger_score": challenger_score,
+                    "champion_flagged": champion_flagged,
+                    "challenger_flagged": challenger_flagged,
+                    "champion_latency_ms": champion_latency_ms,
+                    "challenger_latency_ms": (time.perf_counter() - started) * 1000,
+                    "created_at": created_at,
+                }
+            )
+        self.scored += len(rows)
+
+        db = self.session_factory()
+        try:
+            db.execute(insert(ShadowPrediction), rows)
+            db.commit()
+            self.written += len(rows)
+        except Exception as e:
+            db.rollback()
+            self.errors += 1
+            logger.error(f"Failed to write {len(rows)} shadow predictions: {e}")
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        return {
+            "challenger_version": self.version or None,
+            **self.queue_stats(),
+            "scored": self.scored,
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+    @staticmethod
+    def summarize(db: Session, challenger_version: str | None = None) -> list[dict]:
+        """Agreement, score deltas and mean latency per champion/challenger pair."""
+        delta = ShadowPrediction.challenger_score - ShadowPrediction.champion_score
+        agree = case(
+            (ShadowPrediction.champion_flagged == ShadowPrediction.challenger_flagged, 1),
+            else_=0,
+        )
+        query = db.query(
+            ShadowPrediction.champion_version,
+            ShadowPrediction.challenger_version,
+            func.count(ShadowPrediction.id),
+            func.sum(agree),
+            func.sum(case((ShadowPrediction.champion_flagged.is_(True), 1), else_=0)),
+            func.sum(case((ShadowPrediction.challenger_flagged.is_(True), 1), else_=0)),
+            func.avg(delta),
+            func.avg(func.abs(delta)),
+            func.max(func.abs(delta)),
+            func.avg(ShadowPrediction.champion_latency_ms),
+            func.avg(ShadowPrediction.challenger_latency_ms),
+            func.max(ShadowPrediction.created_at),
+        ).group_by(ShadowPrediction.champion_version, ShadowPrediction.challenger_version)
+        if challenger_version:
+            query = query.filter(ShadowPrediction.challenger_version == challenger_version)
+
+        summaries = []
+        for (
+            champion,
+            challenger,
+            total,
+            agreed,
+            champion_flagged,
+            challenger_flagged,
+            mean_delta,
+            mean_abs_delta,
+            max_abs_delta,
+            champion_latency,
+            challenger_latency,
+            last_scored,
+        ) in query.all():
+            summaries.append(
+                {
+                    "champion_version": champion,
+                    "challenger_version": challenger,
+                    "transactions": total,
+                    "agreement_rate": round((agreed or 0) / total, 4) if total else None,
+                    "flagged": {
+                        "champion": champion_flagged or 0,
+                        "challenger": challenger_flagged or 0,
+                    },
+                    "score_delta": {
+                        "mean": mean_delta,
+                        "mean_abs": mean_abs_delta,
+                        "max_abs": max_abs_delta,
+                    },
+                    "latency_ms": {"champion": champion_latency, "challenger": challenger_latency},
+                    "last_scored_at": last_scored,
+                }
+            )
+        return summaries
+
+
+# Global instance
+shadow_scorer = ShadowScorer(
+    settings.SHADOW_MODEL_VERSION,
+    max_queue=settings.SHADOW_QUEUE_MAX_SIZE,
+    batch_size=settings.SHADOW_BATCH_SIZE,
+    flush_interval_seconds=settings.SHADOW_FLUSH_INTERVAL_SECONDS,
+)
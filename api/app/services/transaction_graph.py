@@ -0,0 +1,136 @@
+import threading
+
+import networkx as nx
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.ml_models.graph_neural_network import graph_analyzer
+from app.models.fraud import GraphEdge, GraphNode
+from app.utils.logger import logger
+
+# Stored rows read per round trip while hydrating
+_HYDRATE_CHUNK_SIZE = 10_000
+
+
+class LiveTransactionGraph:
+    """
+    Long-lived customer-card-IP graph, hydrated once from graph_nodes and graph_edges.
+
+    plan() copies out the connected components a batch of transactions adds edges
+    to and inserts the transactions' nodes and edges there, as
+    GraphAnalyzer.build_transaction_graph would: only those components changed, so
+    only they need re-analysing. Transactions between already linked entities change
+    nothing. commit() inserts the batch into the live graph once its analysis is
+    stored, so a failed write leaves the graph as the database has it; updates hold
+    update_lock from plan() to commit(). The graph is per worker; edges stored by
+    other workers appear when hydrate() runs again.
+    """
+
+    def __init__(self):
+        self.graph = nx.Graph()
+        # networkx counts edges by walking every node, so the count is kept here
+        self.edge_count = 0
+        self._lock = threading.Lock()
+        # Held by an update from plan() until commit(), so updates apply in turn
+        self.update_lock = threading.Lock()
+        self._hydrate_lock = threading.Lock()
+        self.hydrated = False
+        self.transactions = 0
+        self.new_edges = 0
+        self.analyses = 0
+        self.analyzed_nodes = 0
+
+    def __len__(self) -> int:
+        return self.graph.number_of_nodes()
+
+    def clear(self):
+        with self._lock:
+            self.graph = nx.Graph()
+            self.edge_count = 0
+            self.hydrated = False
+
+    def hydrate(self, db: Session):
+        """Replace the graph with every stored node and edge."""
+        G = nx.Graph()
+        connection = db.connection().execution_options(yield_per=_HYDRATE_CHUNK_SIZE)
+        for node_id, meta_data in connection.execute(
+            select(GraphNode.node_id, GraphNode.meta_data)
+        ):
+            G.add_node(node_id, node_type=(meta_data or {}).get("node_type", "unknown"))
+        G.add_weighted_edges_from(
+            connection.execute(select(GraphEdge.from_node, GraphEdge.to_node, GraphEdge.weight))
+        )
+        with self._lock:
+            self.graph = G
+            self.edge_count = G.number_of_edges()
+            self.hydrated = True
+        logger.info(
+            f"Transaction graph hydrated with {G.number_of_nodes()} nodes, "
+            f"{G.number_of_edges()} edges"
+        )
+
+    def ensure_hydrated(self, db: Session):
+        with self._hydrate_lock:
+            if not self.hydrated:
+                self.hydrate(db)
+
+    def plan(self, transactions: list[dict]) -> tuple[nx.Graph, list[tuple], int, int]:
+        """
+        Apply the transactions to a copy of the connected components they add edges
+        to. Returns the copy, the edges it gained as (customer, card or IP, weight),
+        and the whole graph's node and edge counts with them. The live graph itself
+        is unchanged until commit().
+        """
+        with self._lock:
+            G = self.graph
+            adding = []
+            nodes = set()
+            for txn in transactions:
+                customer, *others = graph_analyzer.transaction_nodes(txn)
+                if all(G.has_edge(customer, other) for other in others):
+                    continue
+                adding.append(txn)
+                for node in (customer, *others):
+                    if node in G and node not in nodes:
+                        nodes.update(nx.node_connected_component(G, node))
+            H = G.subgraph(nodes).copy()
+            total_nodes, total_edges = G.number_of_nodes(), self.edge_count
+            self.analyses += 1
+        known = H.number_of_nodes()
+        new_edges = {}
+        for txn in adding:
+            for edge in graph_analyzer.add_transaction(H, txn):
+                new_edges[edge] = None
+        self.analyzed_nodes += H.number_of_nodes()
+        return (
+            H,
+            [(u, v, H[u][v]["weight"]) for u, v in new_edges],
+            total_nodes + H.number_of_nodes() - known,
+            total_edges + len(new_edges),
+        )
+
+    def commit(self, transactions: list[dict]):
+        """Insert transactions into the live graph once what plan() found is stored."""
+        with self._lock:
+            G = self.graph
+            added = 0
+            for txn in transactions:
+                added += len(graph_analyzer.add_transaction(G, txn))
+            self.transactions += len(transactions)
+            self.new_edges += added
+            self.edge_count += added
+
+    def stats(self) -> dict:
+        return {
+            "hydrated": self.hydrated,
+            "nodes": self.graph.number_of_nodes(),
+            "edges": self.edge_count,
+            "transactions": self.transactions,
+            "new_edges": self.new_edges,
+            "analyses": self.analyses,
+            "analyzed_nodes": self.analyzed_nodes,
+        }
+
+
+# Global instance
+live_graph = LiveTransactionGraph()
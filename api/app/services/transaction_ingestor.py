@@ -0,0 +1,107 @@
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import SessionLocal
+from app.utils.batching import BatchWorker
+from app.utils.executors import PoolSaturatedError
+from app.utils.logger import logger
+from app.utils.transactions import bulk_insert_transactions, ingest_row
+
+
+class TransactionIngestor(BatchWorker):
+    """
+    Records every scored transaction without a commit on the request path.
+
+    record() enqueues a row and returns; a background thread writes batches with
+    bulk_insert_transactions and one commit each. When the queue is full, record()
+    waits up to put_timeout_seconds and then raises PoolSaturatedError, so callers
+    get a 503 instead of a transaction silently going unrecorded. A batch of rows
+    reserve()s room for all of them before scoring, so it is either recorded whole
+    or rejected before anything else has seen it.
+    """
+
+    thread_name = "transaction-ingestor"
+
+    def __init__(
+        self,
+        max_queue: int = 100_000,
+        batch_size: int = 5_000,
+        flush_interval_ms: float = 200.0,
+        put_timeout_seconds: float = 1.0,
+        session_factory: sessionmaker = SessionLocal,
+    ):
+        super().__init__(max_queue=max_queue, batch_size=batch_size, max_wait_ms=flush_interval_ms)
+        self.put_timeout_seconds = put_timeout_seconds
+        self.session_factory = session_factory
+        self.inserted = 0
+        self.batches = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def record(
+        self, transaction_data: dict, confidence: float, risk_indicators: list[str] | None = None
+    ):
+        if not self.running:
+            self.start()
+        row = ingest_row(transaction_data, confidence, risk_indicators)
+        if not self._put(row, timeout=self.put_timeout_seconds):
+            self.rejected += 1
+            raise PoolSaturatedError("transaction ingest queue is full")
+
+    def reserve(self, count: int) -> int:
+        """
+        Hold queue room for count rows, waiting up to put_timeout_seconds, and return
+        count; raises PoolSaturatedError when it does not free up. Pass the count to
+        record_many(), or to release() if the rows are never recorded.
+        """
+        if not self.running:
+            self.start()
+        if not self._reserve(count, timeout=self.put_timeout_seconds):
+            self.rejected += count
+            raise PoolSaturatedError("transaction ingest queue is full")
+        return count
+
+    def release(self, reserved: int):
+        self._unreserve(reserved)
+
+    def record_many(self, scored: list[tuple[dict, float, list[str]]], reserved: int):
+        """
+        Enqueue each (transaction_data, confidence, risk_indicators) into room held by
+        reserve(); never blocks or fails part-way. Unused reserved room is released.
+        """
+        if len(scored) > reserved:
+            raise ValueError(f"{len(scored)} rows exceed the {reserved} reserved")
+        for transaction_data, confidence, risk_indicators in scored:
+            self._put_reserved(ingest_row(transaction_data, confidence, risk_indicators))
+        self.release(reserved - len(scored))
+
+    def _flush(self, batch: list[dict]):
+        db = self.session_factory()
+        try:
+            inserted = bulk_insert_transactions(db.connection(), batch)
+            db.commit()
+            self.inserted += inserted
+            self.batches += 1
+        except Exception as e:
+            db.rollback()
+            self.failed += len(batch)
+            logger.error(f"Failed to ingest {len(batch)} transactions: {e}")
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        return {
+            **self.queue_stats(),
+            "inserted": self.inserted,
+            "batches": self.batches,
+            "rejected": self.rejected,
+            "failed": self.failed,
+        }
+
+
+# Global instance
+transaction_ingestor = TransactionIngestor(
+    max_queue=settings.TRANSACTION_INGEST_MAX_QUEUE,
+    batch_size=settings.TRANSACTION_INGEST_BATCH_SIZE,
+    flush_interval_ms=settings.TRANSACTION_INGEST_FLUSH_INTERVAL_MS,
+)
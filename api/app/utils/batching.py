@@ -0,0 +1,163 @@
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any
+
+from app.utils.logger import logger
+
+_STOP = object()
+
+
+class BatchWorker(ABC):
+    """
+    Base for background writers fed by request handlers.
+
+    Items are put on a bounded queue; a daemon thread collects them into batches of
+    up to batch_size, waiting at most max_wait_ms after the first item, and passes
+    each batch to _flush(). stop() flushes whatever is still queued. Subclasses
+    implement _flush() and may override _prepare() to set up before the thread runs.
+
+    max_queue bounds queued items plus capacity held by _reserve(), which lets a
+    caller claim room for several items before doing anything it cannot undo. A
+    _flush() that raises is logged and counted, and the worker carries on.
+    """
+
+    thread_name = "batch-worker"
+
+    def __init__(self, max_queue: int = 0, batch_size: int = 500, max_wait_ms: float = 50.0):
+        self.batch_size = batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_queue = max_queue
+        # Unbounded: capacity is counted in _used so it can be reserved ahead of puts
+        self._queue: queue.Queue = queue.Queue()
+        self._capacity = threading.Condition()
+        self._used = 0
+        self._worker: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.flush_errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and self._worker.is_alive()
+
+    def _prepare(self) -> bool:
+        return True
+
+    def start(self) -> bool:
+        with self._lock:
+            if self.running:
+                return True
+            if not self._prepare():
+                return False
+            self._worker = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._worker.start()
+            return True
+
+    def stop(self, timeout: float | None = 10.0):
+        """Stop the worker after flushing everything already queued."""
+        with self._lock:
+            worker = self._worker
+            if worker is None:
+                return
+            self._queue.put(_STOP)
+            worker.join(timeout)
+            self._worker = None
+
+    def _reserve(self, count: int, timeout: float | None = None) -> bool:
+        """
+        Hold capacity for count items, waiting up to timeout (None = not at all);
+        False when it does not free up in time. Fill it with _put_reserved() and
+        hand back what goes unused with _unreserve().
+        """
+        if not self.max_queue:
+            return True
+        if count > self.max_queue:
+            return False
+        with self._capacity:
+            if not self._capacity.wait_for(
+                lambda: self._used + count <= self.max_queue, timeout=timeout or 0
+            ):
+                return False
+            self._used += count
+        return True
+
+    def _unreserve(self, count: int):
+        if not self.max_queue or not count:
+            return
+        with self._capacity:
+            self._used -= count
+            self._capacity.notify_all()
+
+    def _put_reserved(self, item: Any):
+        """Enqueue an item into capacity already held by _reserve()"""
+        self._queue.put_nowait(item)
+
+    def _put(self, item: Any, timeout: float | None = None) -> bool:
+        """Enqueue an item, waiting up to timeout (None = not at all). False when full."""
+        if not self._reserve(1, timeout):
+            return False
+        self._put_reserved(item)
+        return True
+
+    def _get(self, timeout: float | None = None) -> Any:
+        item = self._queue.get(timeout=timeout)
+        if item is not _STOP:
+            self._unreserve(1)
+        return item
+
+    def _flush_safely(self, batch: list):
+        try:
+            self._flush(batch)
+        except Exception as e:
+            # A dead writer thread would leave the queue to fill until every put fails
+            self.flush_errors += 1
+            logger.error(f"{self.thread_name} failed to flush {len(batch)} items: {e}")
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait_ms / 1000
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._flush_safely(batch)
+
+        # Persist anything that raced with shutdown
+        leftovers = []
+        while True:
+            try:
+                item = self._get(timeout=0)
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftovers.append(item)
+        for start in range(0, len(leftovers), self.batch_size):
+            self._flush_safely(leftovers[start : start + self.batch_size])
+
+    @abstractmethod
+    def _flush(self, batch: list):
+        """Persist one batch of queued items."""
+
+    def queue_stats(self) -> dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize(),
+            "max_queue": self.max_queue,
+            "flush_errors": self.flush_errors,
+        }
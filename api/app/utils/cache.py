@@ -1,4 +1,7 @@
+import threading
 import time
+from collections import OrderedDict
+from collections.abc import Hashable
 from typing import Any
 
 _cache_store = {}
@@ -19,3 +22,66 @@ def set_cached(key: str, value: Any, ttl_seconds: int = 15) -> None:
         "value": value,
         "expires": time.time() + ttl_seconds,
     }
+
+
+class TTLCache:
+    """
+    Bounded, thread-safe cache whose entries expire ttl_seconds after being set.
+
+    Entries are kept in insertion order (which is also expiry order, since the TTL is
+    fixed), so expired entries are purged from the front and, once max_entries is
+    reached, the oldest entry is evicted. get and set are O(1) amortized.
+    """
+
+    def __init__(self, max_entries: int = 100_000, ttl_seconds: float = 600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _purge_expired(self, now: float):
+        while self._entries:
+            key, (expires, _) = next(iter(self._entries.items()))
+            if expires > now:
+                break
+            del self._entries[key]
+
+    def get(self, key: Hashable) -> Any | None:
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or item[0] <= now:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, value: Any):
+        now = time.monotonic()
+        with self._lock:
+            self._purge_expired(now)
+            self._entries.pop(key, None)
+            self._entries[key] = (now + self.ttl_seconds, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
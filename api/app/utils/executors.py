@@ -0,0 +1,129 @@
+import asyncio
+import functools
+import threading
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any
+
+from app.config import settings
+from app.utils.logger import logger
+
+
+class PoolSaturatedError(RuntimeError):
+    """Raised when an executor's backlog is full and new work is rejected."""
+
+
+class BoundedExecutor:
+    """
+    Thread or process pool that async handlers hand blocking work to.
+
+    Tracks in-flight work so queue depth can be reported, and rejects new work with
+    PoolSaturatedError once more than max_queue items are waiting (0 = unbounded).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int,
+        kind: str = "thread",
+        max_queue: int = 0,
+        initializer: Callable[[], None] | None = None,
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.name = name
+        self.max_workers = max_workers
+        self.kind = kind
+        self.max_queue = max_queue
+        self.initializer = initializer
+        self._pool: Executor | None = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers, initializer=self.initializer
+                )
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=f"aegis-{self.name}",
+                    initializer=self.initializer,
+                )
+        return self._pool
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            queued = max(self._in_flight - self.max_workers, 0)
+            if self.max_queue and queued >= self.max_queue:
+                self._rejected += 1
+                raise PoolSaturatedError(f"{self.name} pool is saturated")
+            self._in_flight += 1
+            self._submitted += 1
+            pool = self._get_pool()
+
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+                self._failed += 1
+            raise
+
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+        return result
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "active": min(self._in_flight, self.max_workers),
+                "queued": max(self._in_flight - self.max_workers, 0),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+            logger.info(f"{self.name} executor shut down")
+
+
+def _load_inference_worker():
+    """Process-pool initializer: each worker loads its own copy of the model once."""
+    from app.ml_models.fraud_detector import fraud_detector, model_watcher
+
+    fraud_detector.load_model()
+    model_watcher.start()
+
+
+# Global instances
+db_executor = BoundedExecutor(
+    "db",
+    max_workers=settings.DB_POOL_WORKERS,
+    max_queue=settings.DB_POOL_MAX_QUEUE,
+)
+inference_executor = BoundedExecutor(
+    "inference",
+    max_workers=settings.INFERENCE_POOL_WORKERS,
+    kind=settings.INFERENCE_POOL_KIND,
+    max_queue=settings.INFERENCE_POOL_MAX_QUEUE,
+    initializer=_load_inference_worker if settings.INFERENCE_POOL_KIND == "process" else None,
+)
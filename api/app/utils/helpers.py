@@ -8,6 +8,26 @@ def utcnow() -> datetime:
     return datetime.now(UTC).replace(tzinfo=None)
 
 
+def parse_timestamp(value: datetime | str | None) -> datetime:
+    """Coerce a transaction timestamp (datetime, ISO string or missing) to a datetime."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return utcnow()
+
+
+def parse_utc_timestamp(value: datetime | str | None) -> datetime:
+    """parse_timestamp, converted to naive UTC for the DateTime columns."""
+    timestamp = parse_timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(UTC).replace(tzinfo=None)
+    return timestamp
+
+
 def generate_transaction_id() -> str:
     """Generate unique transaction ID"""
     return f"TXN-{uuid.uuid4().hex[:12].upper()}"
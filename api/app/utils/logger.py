@@ -1,25 +1,72 @@
+import os
+import random
 import sys
 
 from loguru import logger
 
 from app.config import settings
 
+LOG_DIR = "logs"
+LOG_RETENTION_DAYS = 30
+TEXT_FORMAT = "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function} - {message}"
+COLOR_FORMAT = "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan> - <level>{message}</level>"  # noqa: E501
+
+
+class LogSampler:
+    """
+    Handler filter for per-transaction log lines: a record logged through
+    transaction_logger is kept with probability rate (1 logs all, 0 none); every
+    other record passes. The first handler to see a record decides for all of
+    them, so stdout and the log file keep the same lines.
+    """
+
+    def __init__(self, rate: float = 1.0):
+        if not 0 <= rate <= 1:
+            raise ValueError(f"Log sample rate must be between 0 and 1, got {rate}")
+        self.rate = rate
+
+    def keep(self) -> bool:
+        if self.rate >= 1 or self.rate <= 0:
+            return self.rate >= 1
+        return random.random() < self.rate
+
+    def __call__(self, record: dict) -> bool:
+        extra = record["extra"]
+        if "sampled" not in extra:
+            return True
+        if extra["sampled"] is None:
+            extra["sampled"] = self.keep()
+        return extra["sampled"]
+
+
 # Configure logger
 logger.remove()  # Remove default handler
 
+json_logs = settings.LOG_FORMAT == "json"
+sample_transaction_log = LogSampler(settings.LOG_TRANSACTION_SAMPLE_RATE)
+
 # Add custom handler with formatting
 logger.add(
     sys.stdout,
-    colorize=True,
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan> - <level>{message}</level>",  # noqa: E501
+    colorize=not json_logs,
+    format=TEXT_FORMAT if json_logs else COLOR_FORMAT,
+    serialize=json_logs,
+    enqueue=settings.LOG_ASYNC,
+    filter=sample_transaction_log,
     level=settings.LOG_LEVEL,
 )
 
 # Add file handler
 logger.add(
-    "logs/aegis_{time:YYYY-MM-DD}.log",
-    rotation="1 day",
-    retention="30 days",
+    os.path.join(LOG_DIR, "aegis_{time:YYYY-MM-DD}.log"),
+    rotation="00:00",
+    retention=f"{LOG_RETENTION_DAYS} days",
+    serialize=json_logs,
+    enqueue=settings.LOG_ASYNC,
+    filter=sample_transaction_log,
     level=settings.LOG_LEVEL,
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function} - {message}",
+    format=TEXT_FORMAT,
 )
+
+# Per-transaction lines from the scoring path, subject to LOG_TRANSACTION_SAMPLE_RATE
+transaction_logger = logger.bind(sampled=None)
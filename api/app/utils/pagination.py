@@ -0,0 +1,75 @@
+import base64
+import json
+from collections.abc import Iterator
+from datetime import date, datetime
+
+from sqlalchemy import DateTime, Select, tuple_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(values: list) -> str:
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: list) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("wrong number of values")
+        return [
+            datetime.fromisoformat(value)
+            if isinstance(column.type, DateTime) and value is not None
+            else value
+            for column, value in zip(columns, values, strict=True)
+        ]
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor!r}") from e
+
+
+def keyset_page(
+    query: Query, order_by: list, cursor: str | None, limit: int
+) -> tuple[list, str | None]:
+    """
+    One page of query in descending order_by order (the last column must be unique),
+    starting after cursor. Seeks with a row comparison instead of OFFSET, so every page
+    costs the same index range scan. Returns the rows and the cursor of the next page,
+    or None on the last page.
+    """
+    if cursor:
+        query = query.filter(tuple_(*order_by) < tuple_(*decode_cursor(cursor, order_by)))
+    rows = query.order_by(*[column.desc() for column in order_by]).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], column.key) for column in order_by])
+
+
+def _json_default(value):
+    if isinstance(value, datetime | date):
+        return value.isoformat()
+    return str(value)
+
+
+# Shared so each row skips building an encoder, which json.dumps does when given default
+_encoder = json.JSONEncoder(default=_json_default)
+
+
+def stream_ndjson(engine: Engine, statement: Select, chunk_size: int = 1_000) -> Iterator[str]:
+    """
+    Rows of statement as NDJSON, read through a server-side cursor chunk_size rows at a
+    time on a connection of its own, so memory stays flat however many rows match.
+    """
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=chunk_size).execute(
+            statement
+        )
+        for rows in result.mappings().partitions():
+            yield "".join(_encoder.encode(dict(row)) + "\n" for row in rows)
@@ -0,0 +1,145 @@
+import io
+import json
+from datetime import date, datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+
+from app.models.transaction import Transaction
+from app.utils.helpers import parse_utc_timestamp, utcnow
+
+INGEST_COLUMNS = (
+    "transaction_id",
+    "customer_id",
+    "amount",
+    "currency",
+    "merchant_id",
+    "merchant_category",
+    "payment_method",
+    "ip_address",
+    "device_id",
+    "location",
+    "timestamp",
+    "created_at",
+    "status",
+    "features",
+    "fraud_probability",
+    "risk_indicators",
+)
+_JSON_COLUMNS = {"location", "features", "risk_indicators"}
+
+
+def transaction_row(
+    transaction_data: dict, confidence: float, risk_indicators: list[str] | None = None
+) -> dict:
+    """Column values for a scored transaction, for ORM or Core bulk inserts."""
+    return {
+        "transaction_id": transaction_data["transaction_id"],
+        "customer_id": transaction_data["customer_id"],
+        "amount": transaction_data["amount"],
+        "currency": transaction_data.get("currency", "INR"),
+        "merchant_id": transaction_data.get("merchant_id", "unknown"),
+        "merchant_category": transaction_data.get("merchant_category"),
+        "payment_method": transaction_data.get("payment_method", "unknown"),
+        "ip_address": transaction_data.get("ip_address"),
+        "device_id": transaction_data.get("device_id"),
+        "location": transaction_data.get("location"),
+        "status": transaction_data.get("status", "pending"),
+        "features": transaction_data.get("features"),
+        "fraud_probability": confidence,
+        "risk_indicators": risk_indicators,
+    }
+
+
+def ingest_row(
+    transaction_data: dict, confidence: float, risk_indicators: list[str] | None = None
+) -> dict:
+    """Transaction column values for bulk_insert_transactions."""
+    row = transaction_row(transaction_data, confidence, risk_indicators)
+    row["timestamp"] = parse_utc_timestamp(transaction_data.get("timestamp"))
+    row["created_at"] = utcnow()
+    return row
+
+
+def _copy_value(column: str, value) -> str:
+    """Encode one value for COPY ... FROM STDIN in PostgreSQL's text format."""
+    if value is None:
+        return "\\N"
+    if column in _JSON_COLUMNS:
+        value = json.dumps(value, default=str)
+    elif isinstance(value, datetime | date):
+        value = value.isoformat()
+    else:
+        value = str(value)
+    return (
+        value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    )
+
+
+def _copy_transactions(connection: Connection, rows: list[dict]) -> int:
+    """
+    COPY rows into a per-session temp table, then move them into transactions with
+    ON CONFLICT DO NOTHING, so a transaction_id seen before does not abort the batch.
+    """
+    columns = ", ".join(f'"{c}"' for c in INGEST_COLUMNS)
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(c, row.get(c)) for c in INGEST_COLUMNS))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS _ingest_transactions "
+            "(LIKE transactions INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        )
+        cursor.copy_expert(f"COPY _ingest_transactions ({columns}) FROM STDIN", buffer)
+        cursor.execute(
+            f"INSERT INTO transactions ({columns}) "
+            f"SELECT {columns} FROM _ingest_transactions "
+            "ON CONFLICT (transaction_id) DO NOTHING"
+        )
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+def bulk_insert_transactions(connection: Connection, rows: list[dict]) -> int:
+    """
+    Insert scored transactions in one round trip per batch, skipping transaction_ids
+    that already exist. PostgreSQL (psycopg2) uses COPY; SQLite and other PostgreSQL
+    drivers a multi-row INSERT ... ON CONFLICT DO NOTHING; other databases an
+    executemany INSERT of the rows not found by one IN lookup.
+    Returns the number of rows inserted. The caller owns the transaction.
+    """
+    if not rows:
+        return 0
+    rows = [{c: row.get(c) for c in INGEST_COLUMNS} for row in rows]
+    dialect = connection.dialect.name
+
+    if dialect == "postgresql" and connection.dialect.driver == "psycopg2":
+        return _copy_transactions(connection, rows)
+
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql_insert if dialect == "postgresql" else sqlite_insert
+        statement = dialect_insert(Transaction).on_conflict_do_nothing(
+            index_elements=["transaction_id"]
+        )
+        return connection.execute(statement, rows).rowcount
+
+    existing = set(
+        connection.execute(
+            select(Transaction.transaction_id).where(
+                Transaction.transaction_id.in_({row["transaction_id"] for row in rows})
+            )
+        ).scalars()
+    )
+    new_rows = list(
+        {r["transaction_id"]: r for r in rows if r["transaction_id"] not in existing}.values()
+    )
+    if new_rows:
+        connection.execute(insert(Transaction), new_rows)
+    return len(new_rows)
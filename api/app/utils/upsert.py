@@ -0,0 +1,111 @@
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+
+# Keys per IN lookup, within SQLite's bound parameter limit
+_LOOKUP_CHUNK_SIZE = 10_000
+
+
+def on_conflict_upsert(dialect: str, model, key: str, updated_columns: tuple[str, ...]):
+    """INSERT ... ON CONFLICT (key) DO UPDATE of updated_columns, for PostgreSQL or SQLite."""
+    dialect_insert = postgresql_insert if dialect == "postgresql" else sqlite_insert
+    statement = dialect_insert(model)
+    return statement.on_conflict_do_update(
+        index_elements=[key],
+        set_={column: statement.excluded[column] for column in updated_columns},
+    )
+
+
+def on_conflict_do_nothing(dialect: str, model, key: str):
+    """INSERT ... ON CONFLICT (key) DO NOTHING, for PostgreSQL or SQLite."""
+    dialect_insert = postgresql_insert if dialect == "postgresql" else sqlite_insert
+    return dialect_insert(model).on_conflict_do_nothing(index_elements=[key])
+
+
+def insert_new_rows(connection: Connection, model, key: str, rows: list[dict]) -> set:
+    """
+    Insert the rows whose unique key column does not exist yet and return the keys
+    inserted. PostgreSQL and SQLite use one INSERT ... ON CONFLICT DO NOTHING
+    RETURNING: an insert of a key another transaction has just inserted waits for it
+    and is then skipped, so exactly one writer inserts each key. Other databases do an
+    IN lookup per chunk of keys, then an executemany INSERT, without that guarantee.
+    The first row wins for a key repeated within the batch. The caller owns the
+    transaction.
+    """
+    if not rows:
+        return set()
+    rows = list({row[key]: row for row in reversed(rows)}.values())
+    dialect = connection.dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        statement = on_conflict_do_nothing(dialect, model, key).returning(getattr(model, key))
+        return set(connection.execute(statement, rows).scalars())
+
+    key_column = getattr(model, key)
+    keys = [row[key] for row in rows]
+    existing = set()
+    for start in range(0, len(keys), _LOOKUP_CHUNK_SIZE):
+        existing.update(
+            connection.execute(
+                select(key_column).where(key_column.in_(keys[start : start + _LOOKUP_CHUNK_SIZE]))
+            ).scalars()
+        )
+    new_rows = [row for row in rows if row[key] not in existing]
+    if new_rows:
+        connection.execute(insert(model), new_rows)
+    return {row[key] for row in new_rows}
+
+
+def upsert_rows(
+    connection: Connection,
+    model,
+    key: str,
+    updated_columns: tuple[str, ...],
+    rows: list[dict],
+) -> int:
+    """
+    Insert rows, or update updated_columns of those whose unique key column already
+    exists; other columns keep their first values. The last row wins for a key
+    repeated within the batch. PostgreSQL and SQLite use one INSERT ... ON CONFLICT
+    DO UPDATE; other databases one IN lookup per chunk of keys, then an executemany
+    INSERT and UPDATE. The caller owns the transaction. Returns the number of rows
+    written.
+    """
+    if not rows:
+        return 0
+    rows = list({row[key]: row for row in rows}.values())
+    dialect = connection.dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        connection.execute(on_conflict_upsert(dialect, model, key, updated_columns), rows)
+        return len(rows)
+
+    key_column = getattr(model, key)
+    keys = [row[key] for row in rows]
+    existing = set()
+    for start in range(0, len(keys), _LOOKUP_CHUNK_SIZE):
+        existing.update(
+            connection.execute(
+                select(key_column).where(key_column.in_(keys[start : start + _LOOKUP_CHUNK_SIZE]))
+            ).scalars()
+        )
+    new_rows = [row for row in rows if row[key] not in existing]
+    if new_rows:
+        connection.execute(insert(model), new_rows)
+    if existing:
+        # b_ prefixes keep the bind names apart from the column names
+        connection.execute(
+            update(model)
+            .where(key_column == bindparam(f"b_{key}"))
+            .values({column: bindparam(f"b_{column}") for column in updated_columns}),
+            [
+                {
+                    f"b_{key}": row[key],
+                    **{f"b_{column}": row[column] for column in updated_columns},
+                }
+                for row in rows
+                if row[key] in existing
+            ],
+        )
+    return len(rows)
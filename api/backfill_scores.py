@@ -0,0 +1,81 @@
+import argparse
+import os
+
+from app.ml_models.backfill import (
+    DEFAULT_CHUNK_SIZE,
+    Checkpoint,
+    DatabaseSink,
+    FileSink,
+    backfill,
+    default_partitions,
+    resolve_version,
+)
+from app.utils.logger import logger
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rescore a JSONL or CSV transaction dump with the fraud model"
+    )
+    parser.add_argument("source", help="Input file (.jsonl or .csv)")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--output", help="Write scores to this .jsonl or .csv file")
+    output.add_argument(
+        "--to-database",
+        action="store_true",
+        help="Update fraud_probability in the transactions table (inserting unknown rows)",
+    )
+    parser.add_argument("--model-version", help="Registry version (default: current)")
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: all cores)")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="Records read and scored per predict_batch call",
+    )
+    parser.add_argument(
+        "--partitions",
+        type=int,
+        default=None,
+        help="Customer partitions (default: one per 16 MB of input, at least 64)",
+    )
+    parser.add_argument(
+        "--no-replay",
+        action="store_true",
+        help="Score history features as stored instead of replaying them per customer",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="Progress file used to resume an interrupted run (default: <source>.checkpoint)",
+    )
+    args = parser.parse_args()
+
+    version = resolve_version(args.model_version)
+    workers = args.workers or os.cpu_count() or 1
+    checkpoint = Checkpoint(
+        args.checkpoint or f"{args.source}.checkpoint",
+        args.source,
+        args.partitions or default_partitions(args.source),
+        version,
+    )
+    checkpoint.load()
+    if checkpoint.done:
+        logger.info(f"Resuming: {len(checkpoint.done)} partitions already scored")
+
+    sink = DatabaseSink() if args.to_database else FileSink(args.output, version)
+    try:
+        backfill(
+            args.source,
+            sink,
+            checkpoint,
+            workers=workers,
+            chunk_size=args.chunk_size,
+            version=version,
+            replay_features=not args.no_replay,
+        )
+    finally:
+        sink.close()
+
+
+if __name__ == "__main__":
+    main()
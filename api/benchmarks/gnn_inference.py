@@ -0,0 +1,120 @@
+"""
+Latency and memory of FraudGNN inference on the sparse adjacency against a dense one.
+
+    python benchmarks/gnn_inference.py --customers 3000 30000 300000 1000000
+
+Builds a customer-card-IP graph where most customers use their own card and IP and
+--ring-share of them sit in rings of 4-8 customers sharing a card and an IP, then
+scores every node with GraphAnalyzer.node_probabilities. Up to --dense-max nodes it
+also runs the same model on the adjacency made dense, which is N^2 float32. Each run
+is a fresh process; memory is its peak resident set above the built graph, read from
+/proc (Linux).
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("API_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from app.ml_models.graph_neural_network import (  # noqa: E402
+    graph_analyzer,
+    node_features,
+    normalized_adjacency,
+)
+
+
+def transactions(customers: int, ring_share: float, rng: random.Random) -> list[dict]:
+    stream = []
+    rings = 0
+    customer = 0
+    while customer < customers:
+        if rng.random() < ring_share:
+            size = rng.randint(4, 8)
+            card, ip = f"RING-CARD{rings}", f"RING-IP{rings}"
+            rings += 1
+        else:
+            size = 1
+            card, ip = f"CARD{customer}", f"IP{customer}"
+        for member in range(customer, min(customer + size, customers)):
+            for _ in range(rng.randint(1, 3)):
+                stream.append(
+                    {
+                        "customer_id": f"C{member}",
+                        "card_id": card,
+                        "ip_address": ip,
+                        "amount": round(rng.uniform(5, 2_000), 2),
+                    }
+                )
+        customer += size
+    return stream
+
+
+def _memory_kb(field: str) -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field):
+                return int(line.split()[1])
+    return 0
+
+
+def run(customers: int, ring_share: float, seed: int, dense: bool) -> tuple:
+    G = graph_analyzer.build_transaction_graph(
+        transactions(customers, ring_share, random.Random(seed))
+    )
+    # Reset the peak resident set to the current one
+    with open("/proc/self/clear_refs", "w") as clear_refs:
+        clear_refs.write("5")
+    before = _memory_kb("VmRSS:")
+    started = time.perf_counter()
+    if dense:
+        nodes = list(G)
+        adj = normalized_adjacency(G, nodes).to_dense()
+        x = node_features(G, nodes)
+        with torch.inference_mode():
+            graph_analyzer.model(x, adj)
+    else:
+        graph_analyzer.node_probabilities(G)
+    elapsed = time.perf_counter() - started
+    return G.number_of_nodes(), G.number_of_edges(), elapsed, _memory_kb("VmHWM:") - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--customers", type=int, nargs="+", default=[3_000, 30_000, 300_000, 1_000_000]
+    )
+    parser.add_argument("--ring-share", type=float, default=0.02)
+    parser.add_argument("--dense-max", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(f"torch {torch.__version__}, {torch.get_num_threads()} threads")
+
+    context = multiprocessing.get_context("spawn")
+    for customers in args.customers:
+        with context.Pool(1) as pool:
+            nodes, edges, elapsed, memory = pool.apply(
+                run, (customers, args.ring_share, args.seed, False)
+            )
+        print(
+            f"{nodes} nodes, {edges} edges\n  sparse: {elapsed:8.2f} s, {memory / 1024:8.1f} MB",
+            flush=True,
+        )
+        if nodes > args.dense_max:
+            continue
+        with context.Pool(1) as pool:
+            _, _, elapsed, memory = pool.apply(run, (customers, args.ring_share, args.seed, True))
+        print(f"  dense:  {elapsed:8.2f} s, {memory / 1024:8.1f} MB", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Latency of graph analysis per transaction batch: the live graph against a full rebuild.
+
+    python benchmarks/graph_live.py --customers 100000 --batch 100 --batches 50
+
+Stores a customer-card-IP graph where most customers use their own card and IP and
+--ring-share of them sit in rings of 4-8 customers sharing a card and an IP. The
+rebuild baseline analyses the whole transaction history with GRAPH_LIVE_ENABLED off,
+as a daily batch recomputation would. The live graph is then hydrated from the stored
+tables once and fed batches of transactions: mostly repeats of known customer-card-IP
+links, plus new customers, some joining rings. Uses a throwaway SQLite file unless
+DATABASE_URL is set.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='aegis-bench-')}/graph.db"
+)
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("API_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from app.config import settings  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.models import transaction  # noqa: E402, F401  (FraudAlert relationship target)
+from app.models.fraud import GraphEdge, GraphNode  # noqa: E402
+from app.services.graph_analysis import GraphAnalysisService  # noqa: E402
+from app.services.transaction_graph import live_graph  # noqa: E402
+
+
+def history(customers: int, ring_share: float, rng: random.Random) -> list[dict]:
+    transactions = []
+    rings = 0
+    customer = 0
+    while customer < customers:
+        if rng.random() < ring_share:
+            size = rng.randint(4, 8)
+            card, ip = f"RING-CARD{rings}", f"RING-IP{rings}"
+            rings += 1
+        else:
+            size = 1
+            card, ip = f"CARD{customer}", f"IP{customer}"
+        for member in range(customer, min(customer + size, customers)):
+            for _ in range(rng.randint(1, 3)):
+                transactions.append(_transaction(f"C{member}", card, ip, rng))
+        customer += size
+    return transactions
+
+
+def _transaction(customer_id: str, card_id: str, ip_address: str, rng: random.Random) -> dict:
+    return {
+        "customer_id": customer_id,
+        "card_id": card_id,
+        "ip_address": ip_address,
+        "amount": round(rng.uniform(5, 2_000), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--ring-share", type=float, default=0.02)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--batches", type=int, default=50)
+    parser.add_argument("--new-share", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    Base.metadata.create_all(engine, tables=[GraphNode.__table__, GraphEdge.__table__])
+
+    transactions = history(args.customers, args.ring_share, rng)
+    settings.GRAPH_LIVE_ENABLED = False
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        result = GraphAnalysisService.analyze_transaction_patterns(transactions, db)
+        rebuild = time.perf_counter() - started
+    finally:
+        db.close()
+    print(
+        f"{len(transactions)} transactions, {result['total_nodes']} nodes, "
+        f"{result['total_edges']} edges, {result['fraud_rings_detected']} rings"
+    )
+    print(f"  rebuild and analyse everything: {rebuild:8.2f} s", flush=True)
+
+    settings.GRAPH_LIVE_ENABLED = True
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        live_graph.ensure_hydrated(db)
+        print(f"  hydrate live graph:             {time.perf_counter() - started:8.2f} s")
+
+        customers = args.customers
+        timings, analyzed = [], []
+        for _ in range(args.batches):
+            batch = []
+            for _ in range(args.batch):
+                if rng.random() < args.new_share:
+                    ring = rng.randrange(10)
+                    card, ip = (
+                        (f"RING-CARD{ring}", f"RING-IP{ring}")
+                        if rng.random() < 0.1
+                        else (f"CARD{customers}", f"IP{customers}")
+                    )
+                    batch.append(_transaction(f"C{customers}", card, ip, rng))
+                    customers += 1
+                else:
+                    batch.append(rng.choice(transactions))
+            started = time.perf_counter()
+            result = GraphAnalysisService.analyze_transaction_patterns(batch, db)
+            timings.append(time.perf_counter() - started)
+            analyzed.append(result["analyzed_nodes"])
+    finally:
+        db.close()
+
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    median = statistics.median(timings)
+    print(
+        f"  live, {args.batch} transactions per batch: median {median * 1e3:.1f} ms, "
+        f"p95 {p95 * 1e3:.1f} ms, {statistics.mean(analyzed):.0f} nodes re-analysed"
+    )
+
+
+if __name__ == "__main__":
+    main()
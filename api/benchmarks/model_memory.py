@@ -0,0 +1,117 @@
+"""
+Startup time and memory of N serving workers loading the fraud model, with private
+joblib copies versus memory-mapped engine arrays.
+
+    python benchmarks/model_memory.py --workers 16 --trees 2000 --depth 8
+
+Each worker is a fresh spawned process (like uvicorn --workers) that loads the
+current registry version, scores one transaction and reports RSS, PSS and USS from
+/proc/self/smaps_rollup. RSS counts shared pages in every process; PSS splits them
+between the processes sharing them, so the PSS total is the real node footprint.
+Linux only.
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("API_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+def _memory_kb() -> dict[str, int]:
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def _worker(model_path: str, mmap_mode: str, ready, results):
+    os.environ["MODEL_PATH"] = model_path
+    os.environ["MODEL_MMAP_MODE"] = mmap_mode
+    os.environ["MODEL_WATCH_INTERVAL_SECONDS"] = "0"
+    from app.ml_models.fraud_detector import fraud_detector
+
+    start = time.perf_counter()
+    fraud_detector.load_model()
+    fraud_detector.predict(dict.fromkeys(fraud_detector.feature_names, 1.0))
+    load_ms = (time.perf_counter() - start) * 1000
+
+    # Measure once every worker has loaded, so shared pages are split between them
+    ready.wait()
+    results.put({"load_ms": load_ms, **_memory_kb()})
+    ready.wait()
+
+
+def _publish_model(model_path: str, trees: int, depth: int):
+    os.environ["MODEL_PATH"] = model_path
+    import numpy as np
+    from sklearn.ensemble import GradientBoostingClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    from app.ml_models.fraud_detector import FraudDetector, LoadedModel
+
+    rng = np.random.default_rng(0)
+    detector = FraudDetector()
+    X = rng.normal(size=(20_000, len(detector.feature_names)))
+    y = (X[:, 0] + X[:, 4] + rng.normal(scale=0.5, size=len(X)) > 1).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = GradientBoostingClassifier(n_estimators=trees, max_depth=depth, random_state=42)
+    model.fit(scaler.transform(X), y)
+    detector._active = LoadedModel(model, scaler, detector.feature_names, "unsaved")
+    return detector.save_model()
+
+
+def _run(model_path: str, mmap_mode: str, workers: int) -> list[dict]:
+    ctx = mp.get_context("spawn")
+    ready = ctx.Barrier(workers + 1)
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=_worker, args=(model_path, mmap_mode, ready, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    ready.wait()
+    samples = [results.get() for _ in processes]
+    ready.wait()
+    for process in processes:
+        process.join()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--trees", type=int, default=1000)
+    parser.add_argument("--depth", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="aegis-bench-") as model_path:
+        version = _publish_model(model_path, args.trees, args.depth)
+        print(f"model {version}: {args.trees} trees, depth {args.depth}, {args.workers} workers")
+        print(f"{'mode':<8} {'load ms':>9} {'RSS MB':>9} {'PSS MB':>9} {'USS MB/w':>9}")
+        for label, mmap_mode in (("joblib", ""), ("mmap", "r")):
+            samples = _run(model_path, mmap_mode, args.workers)
+            load_ms = sum(s["load_ms"] for s in samples) / len(samples)
+            rss = sum(s["rss"] for s in samples) / 1024
+            pss = sum(s["pss"] for s in samples) / 1024
+            uss = sum(s["uss"] for s in samples) / len(samples) / 1024
+            print(f"{label:<8} {load_ms:>9.1f} {rss:>9.1f} {pss:>9.1f} {uss:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
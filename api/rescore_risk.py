@@ -0,0 +1,53 @@
+import argparse
+import csv
+import json
+import time
+from collections.abc import Iterator
+from itertools import islice
+
+from app.database import engine
+from app.services.risk_analysis import RiskAnalysisService
+from app.utils.logger import logger
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def iter_records(path: str) -> Iterator[dict]:
+    """Customer risk inputs from a JSONL or CSV file; empty CSV cells count as absent."""
+    with open(path, newline="" if path.endswith(".csv") else None) as f:
+        if path.endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield {key: value for key, value in row.items() if value not in ("", None)}
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recompute risk profiles for many customers and upsert them in bulk"
+    )
+    parser.add_argument(
+        "source",
+        help="JSONL or CSV of customer risk inputs (customer_id plus the risk scorer factors)",
+    )
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    total = 0
+    records = iter_records(args.source)
+    while chunk := list(islice(records, args.chunk_size)):
+        with engine.begin() as connection:
+            total += RiskAnalysisService.rescore_customers(chunk, connection)
+        logger.info(
+            f"Risk rescoring: {total} profiles written, "
+            f"{total / (time.perf_counter() - started):,.0f} profiles/s"
+        )
+    elapsed = time.perf_counter() - started
+    logger.info(f"Risk rescoring finished: {total} profiles in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,7 @@ from app.models.compliance import ComplianceActivity, ComplianceFramework, Detec
 from app.models.transaction import Account, Transaction
 from app.models.user import User
 from app.services.fraud_detection import FraudDetectionService
-from app.services.risk_analysis import RiskAnalysisService
+from app.services.risk_engine import risk_engine
 from app.utils.helpers import utcnow
 from app.utils.logger import logger
 from app.utils.security import get_password_hash
@@ -114,21 +114,22 @@ def seed_database():
                     db,
                 )
 
-            # Update risk profile
-            RiskAnalysisService.calculate_customer_risk(
+            # Update the live risk profile; changed profiles are written in batches
+            risk_engine.observe(
                 {
                     "customer_id": customer["id"],
                     "customer_name": customer["name"],
                     "account_age": customer["age"],
                     "transaction_velocity": txn_data["transaction_velocity"],
                     "high_value_transaction": amount > 10000,
-                },
-                db,
+                }
             )
 
         except Exception as e:
             logger.error(f"Error processing {txn_data['transaction_id']}: {e}")
 
+    # Write the risk profiles still queued
+    risk_engine.stop()
     logger.info("Database seeded successfully")
 
     if db.query(Account).count() == 0:
@@ -1,4 +1,32 @@
-from app.utils.helpers import generate_transaction_id
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes import admin as admin_routes
+from app.api.routes import fraud as fraud_routes
+from app.config import Settings, settings
+from app.database import SessionLocal
+from app.ml_models.fraud_detector import FraudDetector, fraud_detector
+from app.ml_models.micro_batcher import MicroBatcher
+from app.ml_models.model_registry import ModelRegistry
+from app.models.fraud import FraudAlert, GraphEdge, RiskLevelCount, RiskProfile
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.services.alert_writer import alert_writer
+from app.services.fraud_detection import FraudDetectionService, scoring_cache
+from app.services.graph_analysis import graph_updater
+from app.services.risk_analysis import RiskAnalysisService
+from app.services.risk_engine import risk_engine
+from app.services.transaction_graph import live_graph
+from app.services.transaction_ingestor import transaction_ingestor
+from app.utils.cache import TTLCache
+from app.utils.executors import BoundedExecutor, PoolSaturatedError
+from app.utils.helpers import generate_transaction_id, utcnow
+from app.utils.logger import LogSampler, sample_transaction_log, transaction_logger
 from tests.conftest import TEST_USER_EMAIL, TEST_USER_PASSWORD
 
 
@@ -8,6 +36,83 @@ def test_generate_transaction_id_format():
     assert len(txn_id) == 16
 
 
+def test_ttl_cache_expires_and_evicts_oldest():
+    cache = TTLCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+    assert cache.get("a") is None
+    assert (cache.get("b"), cache.get("c")) == (2, 3)
+    assert cache.stats()["evictions"] == 1
+
+    expiring = TTLCache(ttl_seconds=0)
+    expiring.set("a", 1)
+    assert expiring.get("a") is None
+
+
+def test_bounded_executor_rejects_when_queue_is_full():
+    executor = BoundedExecutor("test", max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        assert executor.stats()["queued"] == 1
+        with pytest.raises(PoolSaturatedError):
+            await executor.run(release.wait)
+        release.set()
+        await asyncio.gather(running, queued)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        executor.shutdown()
+
+    stats = executor.stats()
+    assert stats["completed"] == 2
+    assert stats["rejected"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_log_sampler_filters_only_transaction_lines(monkeypatch):
+    from loguru import logger
+
+    monkeypatch.setattr(sample_transaction_log, "rate", 0)
+    lines = []
+    handler = logger.add(
+        lines.append, format="{message}", serialize=True, filter=sample_transaction_log
+    )
+    try:
+        transaction_logger.info("scored T1")
+        logger.bind(transaction_id="T2").info("model reloaded")
+    finally:
+        logger.remove(handler)
+
+    records = [json.loads(line)["record"] for line in lines]
+    assert [record["message"] for record in records] == ["model reloaded"]
+    assert records[0]["extra"] == {"transaction_id": "T2"}
+
+
+def test_log_sampler_keeps_the_configured_share():
+    # Any rate, not only 1/N: 0.4 and 0.7 used to round to one in 2 and one in 1
+    for rate in (0.1, 0.4, 0.7):
+        sampler = LogSampler(rate)
+        kept = sum(sampler({"extra": {"sampled": None}}) for _ in range(10_000))
+        assert kept == pytest.approx(10_000 * rate, rel=0.1)
+    every, none = LogSampler(1.0), LogSampler(0)
+    assert all(every.keep() for _ in range(10))
+    assert not any(none.keep() for _ in range(10))
+    # A record's first decision holds for every handler
+    record = {"extra": {"sampled": None}}
+    assert every(record) and none(record)
+    with pytest.raises(ValueError):
+        LogSampler(2.0)
+    with pytest.raises(ValueError, match="LOG_TRANSACTION_SAMPLE_RATE"):
+        Settings(LOG_TRANSACTION_SAMPLE_RATE=2.0)
+
+
 def test_health_check(client):
     response = client.get("/health")
     assert response.status_code == 200
@@ -30,6 +135,103 @@ def test_get_fraud_alerts(client, api_headers):
     assert isinstance(response.json(), list)
 
 
+def test_fraud_alerts_keyset_pages_filters_and_export(client, api_headers):
+    created = datetime(2024, 1, 1)
+    db = SessionLocal()
+    try:
+        db.add_all(
+            FraudAlert(
+                transaction_id=f"TXN-PAGE-{i}",
+                type="Card" if i % 2 else "Wire",
+                amount=100.0,
+                customer_name="Page Test",
+                customer_id="CUST-PAGE",
+                risk_score=50 + i,
+                indicators=[],
+                status="Pending Review",
+                # Two alerts share each timestamp, so the id breaks ties
+                created_at=created + timedelta(minutes=i // 2),
+            )
+            for i in range(5)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    seen, cursor = [], None
+    while True:
+        params = {"customer_id": "CUST-PAGE", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/v1/fraud/alerts", params=params, headers=api_headers)
+        assert response.status_code == 200
+        seen += [alert["transaction_id"] for alert in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == [f"TXN-PAGE-{i}" for i in (4, 3, 2, 1, 0)]
+
+    response = client.get(
+        "/api/v1/fraud/alerts",
+        params={"customer_id": "CUST-PAGE", "type": "Card", "min_score": 52},
+        headers=api_headers,
+    )
+    assert [alert["transaction_id"] for alert in response.json()] == ["TXN-PAGE-3"]
+    assert "X-Next-Cursor" not in response.headers
+
+    response = client.get(
+        "/api/v1/fraud/alerts/export",
+        params={"customer_id": "CUST-PAGE", "created_to": "2024-01-01T00:02:00"},
+        headers=api_headers,
+    )
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["transaction_id"] for row in rows] == [f"TXN-PAGE-{i}" for i in (3, 2, 1, 0)]
+
+    response = client.get("/api/v1/fraud/alerts", params={"cursor": "nope"}, headers=api_headers)
+    assert response.status_code == 400
+
+
+def test_risk_profiles_keyset_pages_and_threshold(client, api_headers):
+    started = utcnow() - timedelta(seconds=1)
+    customers = [
+        {"customer_id": f"PAGE-RISK-{i}", "failed_logins": i, "vpn_usage": True} for i in range(4)
+    ]
+    client.post("/api/v1/risk/profiles/bulk", json={"customers": customers}, headers=api_headers)
+
+    seen, cursor = [], None
+    while True:
+        params = {"active_from": started.isoformat(), "limit": 3}
+        response = client.get(
+            "/api/v1/risk/profiles", params={**params, "cursor": cursor or ""}, headers=api_headers
+        )
+        page = response.json()
+        seen += page
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert len(seen) == 4
+    scores = [(profile["risk_score"], profile["id"]) for profile in seen]
+    assert scores == sorted(scores, reverse=True)
+
+    threshold = seen[1]["risk_score"]
+    response = client.get(
+        "/api/v1/risk/profiles/high",
+        params={"threshold": threshold, "active_from": started.isoformat()},
+        headers=api_headers,
+    )
+    assert all(profile["risk_score"] >= threshold for profile in response.json())
+    assert {profile["customer_id"] for profile in seen[:2]} <= {
+        profile["customer_id"] for profile in response.json()
+    }
+
+    response = client.get(
+        "/api/v1/risk/profiles/export",
+        params={"active_from": started.isoformat()},
+        headers=api_headers,
+    )
+    exported = [json.loads(line)["customer_id"] for line in response.text.splitlines()]
+    assert exported == [profile["customer_id"] for profile in seen]
+
+
 def test_analyze_transaction(client, api_headers):
     payload = {
         "transaction_id": generate_transaction_id(),
@@ -47,6 +249,326 @@ def test_analyze_transaction(client, api_headers):
     assert isinstance(body["confidence"], float)
 
 
+def test_analyze_transaction_coerces_string_risk_inputs(client, api_headers):
+    payload = {
+        "transaction_id": generate_transaction_id(),
+        "customer_id": "CUST-TEST-STR",
+        "amount": 450.0,
+        "merchant_id": "M-001",
+        "payment_method": "upi",
+        "new_device": "yes",
+        "vpn_usage": "true",
+        "failed_login_attempts": "3",
+        "location_change": "unknown",
+    }
+    response = client.post("/api/v1/fraud/analyze", json=payload, headers=api_headers)
+    assert response.status_code == 200
+
+    risk_engine.stop()
+    db = SessionLocal()
+    try:
+        profile = db.query(RiskProfile).filter_by(customer_id="CUST-TEST-STR").one()
+        # Parsed as the scorer reads them; the unreadable flag is dropped
+        assert profile.risk_inputs["new_device"] is True
+        assert profile.risk_inputs["vpn_usage"] is True
+        assert profile.risk_inputs["failed_logins"] == 3
+        assert "location_change" not in profile.risk_inputs
+    finally:
+        db.close()
+
+
+def test_analyze_transaction_survives_risk_engine_failure(client, api_headers, monkeypatch):
+    def fail(event):
+        raise RuntimeError("risk engine down")
+
+    monkeypatch.setattr(risk_engine, "observe", fail)
+    payload = {
+        "transaction_id": generate_transaction_id(),
+        "customer_id": "CUST-TEST-STR",
+        "amount": 450.0,
+        "merchant_id": "M-001",
+        "payment_method": "upi",
+    }
+    response = client.post("/api/v1/fraud/analyze", json=payload, headers=api_headers)
+    assert response.status_code == 200
+
+
+def test_analyzed_transactions_feed_the_live_graph(client, api_headers):
+    # Hydrated at startup rather than on the first analysis
+    assert live_graph.hydrated
+    payload = {
+        "transaction_id": generate_transaction_id(),
+        "customer_id": "CUST-GRAPH-1",
+        "amount": 320.0,
+        "merchant_id": "M-001",
+        "payment_method": "credit_card",
+        "card_id": "CARD-GRAPH-1",
+        "ip_address": "10.9.8.7",
+    }
+    response = client.post("/api/v1/fraud/analyze", json=payload, headers=api_headers)
+    assert response.status_code == 200
+
+    graph_updater.stop()
+    assert live_graph.graph.has_edge("CUST-GRAPH-1", "CARD-GRAPH-1")
+    db = SessionLocal()
+    try:
+        stored = db.query(GraphEdge).filter(GraphEdge.from_node == "CUST-GRAPH-1")
+        assert {edge.to_node for edge in stored} == {"CARD-GRAPH-1", "10.9.8.7"}
+    finally:
+        db.close()
+
+
+def test_analyze_transaction_retry_returns_stored_decision(client, api_headers, monkeypatch):
+    monkeypatch.setattr(settings, "FRAUD_DETECTION_THRESHOLD", 0.0)
+    payload = {
+        "transaction_id": generate_transaction_id(),
+        "customer_id": "CUST-TEST-003",
+        "amount": 900.0,
+        "merchant_id": "M-001",
+        "payment_method": "upi",
+    }
+    first = client.post("/api/v1/fraud/analyze", json=payload, headers=api_headers).json()
+    assert first["alert_id"]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("retry must not be re-scored")
+
+    monkeypatch.setattr(FraudDetectionService, "analyze_transaction", fail)
+    retry = client.post("/api/v1/fraud/analyze", json=payload, headers=api_headers)
+    assert retry.status_code == 200
+    assert retry.json() == first
+
+    # Once evicted from memory, the decision comes back from the database
+    scoring_cache.clear()
+    retry = client.post("/api/v1/fraud/analyze", json=payload, headers=api_headers)
+    assert retry.status_code == 200
+    assert retry.json()["alert_id"] == first["alert_id"]
+    assert retry.json()["confidence"] == pytest.approx(first["confidence"])
+
+
+def test_analyze_transaction_with_write_behind_alerts(client, api_headers, monkeypatch):
+    monkeypatch.setattr(settings, "FRAUD_DETECTION_THRESHOLD", 0.0)
+    monkeypatch.setattr(settings, "ALERT_WRITE_BEHIND_ENABLED", True)
+    payload = {
+        "transaction_id": generate_transaction_id(),
+        "customer_id": "CUST-TEST-004",
+        "amount": 700.0,
+        "merchant_id": "M-001",
+        "payment_method": "upi",
+    }
+    response = client.post("/api/v1/fraud/analyze", json=payload, headers=api_headers)
+    assert response.status_code == 200
+    alert_id = response.json()["alert_id"]
+    assert alert_id
+
+    alert_writer.stop()
+    alert = client.get(f"/api/v1/fraud/alerts/{alert_id}", headers=api_headers).json()
+    assert alert["transaction_id"] == payload["transaction_id"]
+
+
+def test_write_behind_retry_before_flush_returns_pending_alert(client, api_headers, monkeypatch):
+    monkeypatch.setattr(settings, "FRAUD_DETECTION_THRESHOLD", 0.0)
+    monkeypatch.setattr(settings, "ALERT_WRITE_BEHIND_ENABLED", True)
+    # Hold the batch open so the alert is still unwritten when the retry arrives
+    monkeypatch.setattr(alert_writer, "max_wait_ms", 60_000)
+    payload = {
+        "transaction_id": generate_transaction_id(),
+        "customer_id": "CUST-TEST-006",
+        "amount": 800.0,
+        "merchant_id": "M-001",
+        "payment_method": "upi",
+    }
+    first = client.post("/api/v1/fraud/analyze", json=payload, headers=api_headers).json()
+    scoring_cache.clear()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("retry must not be re-scored")
+
+    monkeypatch.setattr(FraudDetectionService, "analyze_transaction", fail)
+    retry = client.post("/api/v1/fraud/analyze", json=payload, headers=api_headers)
+    assert retry.json() == first
+    assert alert_writer.pending_result(payload["transaction_id"])[3] == first["alert_id"]
+
+    alert_writer.stop()
+    assert alert_writer.pending_result(payload["transaction_id"]) is None
+    alert = client.get(f"/api/v1/fraud/alerts/{first['alert_id']}", headers=api_headers).json()
+    assert alert["transaction_id"] == payload["transaction_id"]
+
+
+def test_retry_of_clean_transaction_from_database_keeps_indicators(
+    client, api_headers, monkeypatch
+):
+    monkeypatch.setattr(settings, "FRAUD_DETECTION_THRESHOLD", 1.1)
+    payload = {
+        "transaction_id": generate_transaction_id(),
+        "customer_id": "CUST-TEST-007",
+        "amount": 20_000.0,
+        "merchant_id": "M-001",
+        "payment_method": "upi",
+    }
+    first = client.post("/api/v1/fraud/analyze", json=payload, headers=api_headers).json()
+    assert first["alert_id"] is None
+    assert first["risk_indicators"] == ["High-value transaction"]
+
+    transaction_ingestor.stop()
+    scoring_cache.clear()
+    retry = client.post("/api/v1/fraud/analyze", json=payload, headers=api_headers)
+    assert retry.json()["risk_indicators"] == first["risk_indicators"]
+    assert retry.json()["confidence"] == pytest.approx(first["confidence"])
+
+
+def test_analyze_transaction_records_clean_transactions(client, api_headers):
+    payload = {
+        "transaction_id": generate_transaction_id(),
+        "customer_id": "CUST-TEST-005",
+        "amount": 120.0,
+        "merchant_id": "M-001",
+        "payment_method": "upi",
+    }
+    response = client.post("/api/v1/fraud/analyze", json=payload, headers=api_headers)
+    assert response.status_code == 200
+    assert response.json()["alert_id"] is None
+
+    transaction_ingestor.stop()
+    db = SessionLocal()
+    try:
+        stored = (
+            db.query(Transaction)
+            .filter(Transaction.transaction_id == payload["transaction_id"])
+            .one()
+        )
+    finally:
+        db.close()
+    assert stored.fraud_probability == pytest.approx(response.json()["confidence"])
+
+
+def test_batch_rejected_by_full_ingest_queue_is_not_scored(client, api_headers, monkeypatch):
+    monkeypatch.setattr(transaction_ingestor, "max_queue", 1)
+    monkeypatch.setattr(transaction_ingestor, "put_timeout_seconds", 0.01)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("a rejected batch must not reach the feature store or model")
+
+    monkeypatch.setattr(FraudDetectionService, "analyze_transactions", fail)
+    transactions = [
+        {
+            "transaction_id": generate_transaction_id(),
+            "customer_id": "CUST-TEST-008",
+            "amount": 40.0,
+            "merchant_id": "M-001",
+            "payment_method": "upi",
+        }
+        for _ in range(2)
+    ]
+    response = client.post(
+        "/api/v1/fraud/analyze/batch", json={"transactions": transactions}, headers=api_headers
+    )
+    assert response.status_code == 503
+    assert transaction_ingestor.stats()["queued"] == 0
+
+
+def test_analyze_transaction_with_micro_batching(client, api_headers, monkeypatch):
+    monkeypatch.setattr(settings, "FRAUD_MICROBATCH_ENABLED", True)
+    payload = {
+        "transaction_id": generate_transaction_id(),
+        "customer_id": "CUST-TEST-002",
+        "amount": 150.0,
+        "merchant_id": "M-001",
+        "payment_method": "upi",
+    }
+    response = client.post("/api/v1/fraud/analyze", json=payload, headers=api_headers)
+    assert response.status_code == 200
+    assert isinstance(response.json()["confidence"], float)
+
+
+def test_micro_batches_grow_past_the_inference_pool_size(monkeypatch):
+    monkeypatch.setattr(settings, "FRAUD_MICROBATCH_ENABLED", True)
+    sizes = []
+
+    def predict_batch(features_list):
+        sizes.append(len(features_list))
+        return [(False, 0.1)] * len(features_list)
+
+    batcher = MicroBatcher(predict_batch, max_batch_size=16, max_wait_ms=500)
+    monkeypatch.setattr(fraud_routes, "fraud_batcher", batcher)
+    monkeypatch.setattr(fraud_routes, "inference_executor", BoundedExecutor("test", max_workers=2))
+    payloads = [
+        {"transaction_id": f"TXN-MB-{i}", "customer_id": f"CUST-MB-{i}", "amount": 50.0}
+        for i in range(16)
+    ]
+
+    async def score_all():
+        return await asyncio.gather(*map(fraud_routes._score_transaction, payloads))
+
+    results = asyncio.run(score_all())
+    batcher.stop()
+    assert [confidence for _, confidence, _ in results] == [0.1] * 16
+    # Requests wait in the batcher without holding one of the two inference threads
+    assert max(sizes) > 2
+
+
+def test_process_inference_pool_rejects_per_process_state():
+    with pytest.raises(ValueError, match="RING_DETECTOR_ENABLED"):
+        Settings(INFERENCE_POOL_KIND="process")
+    Settings(
+        INFERENCE_POOL_KIND="process",
+        FEATURE_STORE_ENABLED=False,
+        RISK_ENGINE_ENABLED=False,
+        RING_DETECTOR_ENABLED=False,
+    )
+
+
+def _batch_payload(count: int) -> list[dict]:
+    return [
+        {
+            "transaction_id": generate_transaction_id(),
+            "customer_id": f"CUST-BATCH-{i:03d}",
+            "amount": 100.0 + i,
+            "merchant_id": "M-001",
+            "payment_method": "credit_card",
+        }
+        for i in range(count)
+    ]
+
+
+def test_analyze_transaction_batch_preserves_order(client, api_headers):
+    transactions = _batch_payload(5)
+    response = client.post(
+        "/api/v1/fraud/analyze/batch", json={"transactions": transactions}, headers=api_headers
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] == 5
+    assert [r["transaction_id"] for r in body["results"]] == [
+        t["transaction_id"] for t in transactions
+    ]
+
+
+def test_analyze_transaction_batch_creates_alerts_in_bulk(client, api_headers, monkeypatch):
+    monkeypatch.setattr(settings, "FRAUD_DETECTION_THRESHOLD", 0.0)
+    transactions = _batch_payload(3)
+    transactions.append(dict(transactions[0]))  # retried transaction within the batch
+    response = client.post(
+        "/api/v1/fraud/analyze/batch", json={"transactions": transactions}, headers=api_headers
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    alert_ids = [r["alert_id"] for r in results]
+    assert all(alert_ids)
+    assert len(set(alert_ids[:3])) == 3
+    assert alert_ids[3] == alert_ids[0]
+
+
+def test_analyze_transaction_batch_rejects_oversized_batch(client, api_headers, monkeypatch):
+    monkeypatch.setattr(settings, "FRAUD_BATCH_MAX_SIZE", 2)
+    response = client.post(
+        "/api/v1/fraud/analyze/batch",
+        json={"transactions": _batch_payload(3)},
+        headers=api_headers,
+    )
+    assert response.status_code == 413
+
+
 def test_dashboard_metrics(client, api_headers):
     response = client.get("/api/v1/dashboard/metrics", headers=api_headers)
     assert response.status_code == 200
@@ -61,6 +583,44 @@ def test_risk_distribution(client, api_headers):
     assert set(response.json()) == {"critical", "high", "medium", "low"}
 
 
+def test_bulk_upsert_risk_profiles(client, api_headers):
+    customers = [
+        {"customer_id": "BULK-RISK-1", "customer_name": "Asha", "failed_logins": 5},
+        {"customer_id": "BULK-RISK-2", "account_age": "10 days", "vpn_usage": True},
+    ]
+    response = client.post(
+        "/api/v1/risk/profiles/bulk", json={"customers": customers}, headers=api_headers
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] == 2
+    first, second = body["profiles"]
+    assert first["customer_id"] == "BULK-RISK-1"
+    assert "Multiple failed logins" in first["risk_factors"]
+    assert second["customer_name"] == "Unknown"
+    assert set(second["risk_factors"]) == {"New account", "VPN usage"}
+
+    # Upserting again updates the scores in place and keeps the original name
+    customers[0] = {"customer_id": "BULK-RISK-1", "customer_name": "Other", "failed_logins": 0}
+    body = client.post(
+        "/api/v1/risk/profiles/bulk", json={"customers": customers}, headers=api_headers
+    ).json()
+    assert body["profiles"][0]["id"] == first["id"]
+    assert body["profiles"][0]["customer_name"] == "Asha"
+    assert body["profiles"][0]["risk_factors"] == []
+    profile = client.get("/api/v1/risk/profiles/BULK-RISK-1", headers=api_headers).json()
+    assert profile["risk_score"] == body["profiles"][0]["risk_score"]
+
+
+def test_bulk_upsert_risk_profiles_rejects_oversized_batch(client, api_headers, monkeypatch):
+    monkeypatch.setattr(settings, "RISK_BULK_MAX_SIZE", 1)
+    customers = [{"customer_id": "BULK-RISK-X"}, {"customer_id": "BULK-RISK-Y"}]
+    response = client.post(
+        "/api/v1/risk/profiles/bulk", json={"customers": customers}, headers=api_headers
+    )
+    assert response.status_code == 413
+
+
 def test_monitored_accounts(client, api_headers):
     response = client.get("/api/v1/accounts/monitored", headers=api_headers)
     assert response.status_code == 200
@@ -80,6 +640,31 @@ def test_graph_data(client, api_headers):
     assert "nodes" in body and "edges" in body
 
 
+def test_graph_rings_from_scored_transactions(client, api_headers):
+    for i in range(3):
+        payload = {
+            "transaction_id": generate_transaction_id(),
+            "customer_id": f"CUST-RING-{i}",
+            "amount": 120.0,
+            "merchant_id": "M-001",
+            "payment_method": "credit_card",
+            "ip_address": "203.0.113.77",
+            "device_id": "DEV-RING",
+        }
+        response = client.post("/api/v1/fraud/analyze", json=payload, headers=api_headers)
+        assert response.status_code == 200
+
+    response = client.get("/api/v1/graph/rings/CUST-RING-2", headers=api_headers)
+    assert response.status_code == 200
+    ring = response.json()
+    assert sorted(ring["customers"]) == ["CUST-RING-0", "CUST-RING-1", "CUST-RING-2"]
+    assert (ring["ips"], ring["devices"]) == (["203.0.113.77"], ["DEV-RING"])
+    response = client.get("/api/v1/graph/rings", headers=api_headers)
+    assert ring in response.json()
+    response = client.get("/api/v1/graph/rings/CUST-TEST-001", headers=api_headers)
+    assert response.status_code == 404
+
+
 def test_login_and_me(client, api_headers, test_user):
     response = client.post(
         "/api/v1/auth/login",
@@ -105,3 +690,78 @@ def test_login_rejects_bad_password(client, api_headers, test_user):
         headers=api_headers,
     )
     assert response.status_code == 401
+
+
+def test_executor_stats(client, api_headers):
+    response = client.get("/api/v1/admin/executors", headers=api_headers)
+    assert response.status_code == 200
+    names = {pool["name"] for pool in response.json()["executors"]}
+    assert names == {"db", "inference"}
+
+
+def test_model_info(client, api_headers):
+    response = client.get("/api/v1/admin/model", headers=api_headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["active_version"]
+    assert "available_versions" in body
+
+
+def test_shadow_summary(client, api_headers):
+    response = client.get("/api/v1/admin/shadow", headers=api_headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["scorer"]["challenger_version"] is None
+    assert isinstance(body["comparisons"], list)
+
+
+def test_model_reload_requires_admin(client, api_headers, test_user):
+    login = client.post(
+        "/api/v1/auth/login",
+        json={"email": TEST_USER_EMAIL, "password": TEST_USER_PASSWORD},
+        headers=api_headers,
+    )
+    token = login.json()["access_token"]
+    response = client.post(
+        "/api/v1/admin/model/reload",
+        headers={**api_headers, "Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 403
+
+
+def test_admin_rebuilds_drifted_risk_level_counts(client):
+    db = SessionLocal()
+    try:
+        expected = RiskAnalysisService.rebuild_risk_level_counts(db)
+        db.query(RiskLevelCount).filter(RiskLevelCount.level == "low").update({"count": 999})
+        db.commit()
+        assert RiskAnalysisService.get_risk_distribution(db)["low"] == 999
+
+        admin = User(email="admin@example.com", role="admin")
+        body = asyncio.run(admin_routes.rebuild_risk_level_counts(db=db, current_user=admin))
+        assert body == {"status": "rebuilt", "counts": expected}
+        assert RiskAnalysisService.get_risk_distribution(db) == expected
+    finally:
+        db.close()
+
+
+def test_model_reload_promotes_only_a_version_that_loads(tmp_path, monkeypatch):
+    registry = ModelRegistry(str(tmp_path))
+    publisher = FraudDetector()
+    publisher.registry = registry
+    publisher._active = fraud_detector._ensure_loaded()
+    publisher.save_model(version="good")
+    registry.save({"model": None, "scaler": None, "feature_names": ["amount"]}, version="broken")
+    monkeypatch.setattr(fraud_detector, "registry", registry)
+    monkeypatch.setattr(fraud_detector, "_active", fraud_detector._active)
+    admin = User(email="admin@example.com", role="admin")
+
+    with pytest.raises(HTTPException) as failed:
+        admin_routes.reload_model(version="broken", current_user=admin)
+    assert failed.value.status_code == 500
+    assert registry.current_version() == "good"
+    assert fraud_detector.version != "broken"
+
+    publisher.save_model(version="next", activate=False)
+    result = admin_routes.reload_model(version="next", current_user=admin)
+    assert result["version"] == fraud_detector.version == registry.current_version() == "next"
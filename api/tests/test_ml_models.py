@@ -1,4 +1,35 @@
+import csv
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import networkx as nx
+import numpy as np
+import pytest
+import torch
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import Base
+from app.ml_models import backfill as backfill_module
+from app.ml_models.backfill import Checkpoint, FileSink, backfill
+from app.ml_models.centrality import sampled_centrality
+from app.ml_models.feature_store import CustomerFeatureStore
+from app.ml_models.fraud_detector import FraudDetector
+from app.ml_models.graph_neural_network import GraphAnalyzer, node_features, normalized_adjacency
+from app.ml_models.micro_batcher import MicroBatcher
+from app.ml_models.model_registry import ModelRegistry, ModelWatcher
 from app.ml_models.risk_scorer import RiskScorer
+from app.ml_models.rule_engine import CompiledRuleSet, RuleError
+from app.ml_models.training import train_from_database
+from app.models.fraud import FraudAlert
+from app.models.transaction import Transaction
+from app.services import fraud_detection
+from app.services.fraud_detection import FraudDetectionService
+from app.utils.helpers import utcnow
 
 
 def test_risk_scorer_handles_string_account_age():
@@ -18,3 +49,442 @@ def test_risk_scorer_flags_new_account():
     }
     factors = scorer.identify_risk_factors(data)
     assert "New account" in factors
+
+
+def test_rule_engine_matches_per_row_evaluation():
+    rules = CompiledRuleSet(
+        [
+            {"name": "big", "when": {"feature": "amount", "op": ">", "value": 1000}},
+            {
+                "name": "spike",
+                "when": {
+                    "all": [
+                        {"feature": "amount", "op": ">", "value": 1000},
+                        {
+                            "feature": "amount",
+                            "op": ">=",
+                            "value": {"feature": "avg_transaction_amount", "times": 5},
+                        },
+                    ]
+                },
+                "action": "block",
+            },
+            {"name": "night", "when": {"feature": "hour", "op": "between", "value": [0, 5]}},
+            {
+                "name": "odd",
+                "when": {
+                    "any": [
+                        {"feature": "hour", "op": "in", "value": [13, 14]},
+                        {"not": {"feature": "vpn_usage", "op": "==", "value": 0}},
+                    ]
+                },
+            },
+        ],
+        defaults={"avg_transaction_amount": 100},
+    )
+    rows = [
+        {"amount": 6000, "avg_transaction_amount": 1000, "hour": 3, "vpn_usage": 0},
+        {"amount": 2000, "avg_transaction_amount": 1000, "hour": 13, "vpn_usage": 0},
+        {"amount": 10, "hour": 22, "vpn_usage": 1},
+        {"amount": 5000, "hour": 12},
+    ]
+    names, blocked = rules.apply(rows)
+    assert names == [["big", "spike", "night"], ["big", "odd"], ["odd"], ["big", "spike"]]
+    assert blocked.tolist() == [True, False, False, True]
+    # The shared "amount > 1000" comparison is compiled once
+    assert len(rules._leaves) == 5
+    names, blocked = rules.apply([])
+    assert names == [] and blocked.size == 0
+
+
+def test_rule_engine_rejects_malformed_rules():
+    with pytest.raises(RuleError):
+        CompiledRuleSet([{"name": "x", "when": {"feature": "amount", "op": "~", "value": 1}}])
+    with pytest.raises(RuleError):
+        CompiledRuleSet([{"name": "x", "when": {"any": []}}])
+    with pytest.raises(RuleError):
+        when = {"feature": "amount", "op": ">", "value": 1}
+        CompiledRuleSet([{"name": "x", "when": when, "action": "drop"}])
+
+
+@pytest.mark.parametrize(
+    "when",
+    [
+        {"feature": "hour", "op": "between", "value": [0, 5, 9]},
+        {"feature": "hour", "op": "between", "value": 5},
+        {"feature": "hour", "op": "between", "value": [0, "late"]},
+    ],
+)
+def test_rule_engine_rejects_malformed_between(when):
+    with pytest.raises(RuleError, match="'night'"):
+        CompiledRuleSet([{"name": "night", "when": when}])
+
+
+@pytest.mark.parametrize(
+    "when",
+    [
+        {"feature": "amount", "op": ">", "value": "high"},
+        {"feature": "amount", "op": ">", "value": None},
+        {"feature": "amount", "op": ">", "value": [10_000]},
+        {"feature": "amount", "op": ">", "value": {"feature": "avg", "times": "five"}},
+        {"feature": "merchant_risk", "op": "in", "value": ["risky"]},
+    ],
+)
+def test_rule_engine_rejects_non_numeric_thresholds(when):
+    with pytest.raises(RuleError, match="'large'"):
+        CompiledRuleSet([{"name": "large", "when": when}])
+
+
+def test_sampled_centrality_is_exact_with_every_node_as_pivot():
+    G = nx.gnm_random_graph(120, 300, seed=1)
+    G.add_edges_from([("a", "b"), ("b", "c")])
+    betweenness, closeness = sampled_centrality(G, samples=10_000, exact_component_size=10)
+    assert betweenness == pytest.approx(nx.betweenness_centrality(G))
+    assert closeness == pytest.approx(nx.closeness_centrality(G))
+
+
+def test_sampled_centrality_is_seeded_and_ranks_like_exact():
+    G = nx.gnm_random_graph(400, 900, seed=2)
+    estimate = sampled_centrality(G, samples=80, seed=7)
+    assert estimate == sampled_centrality(G, samples=80, seed=7)
+    assert estimate != sampled_centrality(G, samples=80, seed=8)
+
+    betweenness, closeness = estimate
+    exact = nx.betweenness_centrality(G)
+    top = set(sorted(exact, key=exact.get, reverse=True)[:20])
+    assert len(top & set(sorted(betweenness, key=betweenness.get, reverse=True)[:40])) >= 15
+    exact_closeness = nx.closeness_centrality(G)
+    connected = [v for v in G if exact_closeness[v] > 0]
+    assert (
+        max(abs(closeness[v] - exact_closeness[v]) / exact_closeness[v] for v in connected) < 0.15
+    )
+
+
+def test_graph_analyzer_samples_centrality_above_node_threshold(monkeypatch):
+    G = nx.path_graph(60)
+    analyzer = GraphAnalyzer()
+    assert analyzer.centrality(G)[0] == nx.betweenness_centrality(G)
+    monkeypatch.setattr(settings, "GRAPH_EXACT_CENTRALITY_MAX_NODES", 50)
+    monkeypatch.setattr(settings, "GRAPH_CENTRALITY_SAMPLES", 5)
+    betweenness, _ = analyzer.centrality(G)
+    assert betweenness != nx.betweenness_centrality(G)
+    assert set(analyzer.calculate_node_risks(G)) == set(G)
+
+
+def test_detect_fraud_rings_refines_only_small_components(monkeypatch):
+    G = nx.complete_graph(["A1", "A2", "A3", "A4"])
+    # Two dense clusters joined by one edge: only modularity splits them into rings
+    G.add_edges_from(nx.complete_graph(["B1", "B2", "B3", "B4", "B5"]).edges)
+    G.add_edges_from(nx.complete_graph(["B6", "B7", "B8", "B9", "B10"]).edges)
+    G.add_edge("B5", "B6")
+    G.add_edges_from(nx.path_graph(["P1", "P2", "P3", "P4", "P5"]).edges)
+    analyzer = GraphAnalyzer()
+    rings = sorted(sorted(ring) for ring in analyzer.detect_fraud_rings(G))
+    assert rings == [
+        ["A1", "A2", "A3", "A4"],
+        ["B1", "B2", "B3", "B4", "B5"],
+        ["B10", "B6", "B7", "B8", "B9"],
+    ]
+    monkeypatch.setattr(settings, "GRAPH_RING_REFINE_MAX_NODES", 5)
+    assert [sorted(ring) for ring in analyzer.detect_fraud_rings(G)] == [["A1", "A2", "A3", "A4"]]
+
+
+def test_normalized_adjacency_is_sparse_symmetric_gcn_matrix():
+    G = nx.karate_club_graph()
+    G.add_edge(0, 0)
+    nodes = list(reversed(list(G)))
+    adj = normalized_adjacency(G, nodes)
+    assert adj.layout == torch.sparse_csr
+    assert adj._nnz() == 2 * (G.number_of_edges() - 1) + len(nodes)
+    A = nx.to_numpy_array(G, nodelist=nodes, weight=None)
+    np.fill_diagonal(A, 1)
+    degree = A.sum(axis=1)
+    np.testing.assert_allclose(
+        adj.to_dense().numpy(), A / np.sqrt(np.outer(degree, degree)), atol=1e-6
+    )
+
+
+def test_graph_analyzer_scores_nodes_on_sparse_adjacency_without_autograd():
+    analyzer = GraphAnalyzer()
+    G = analyzer.build_transaction_graph(
+        [
+            {"customer_id": "C1", "card_id": "K1", "ip_address": "I1", "amount": 500.0},
+            {"customer_id": "C2", "card_id": "K1", "ip_address": "I2", "amount": 20.0},
+        ]
+    )
+    nodes, probabilities = analyzer.node_probabilities(G)
+    assert nodes == list(G) and probabilities.shape == (5, 4)
+    assert not probabilities.requires_grad
+    torch.testing.assert_close(probabilities.sum(dim=1), torch.ones(5))
+    # Same as the dense adjacency path
+    with torch.no_grad():
+        dense = analyzer.model(node_features(G, nodes), normalized_adjacency(G, nodes).to_dense())
+    torch.testing.assert_close(probabilities, dense)
+    assert analyzer.node_probabilities(nx.Graph())[1].shape == (0, 4)
+
+
+@pytest.fixture(scope="module")
+def trained_detector():
+    detector = FraudDetector()
+    rng = np.random.default_rng(0)
+    # Unscaled, offset features so the scaler folding in the compiled engine is exercised
+    X = rng.normal(loc=50, scale=20, size=(500, len(detector.feature_names)))
+    X[:, 0] *= 100
+    y = (X[:, 0] / 100 + X[:, 4] + rng.normal(scale=10, size=500) > 100).astype(int)
+    detector.train(X, y)
+    return detector, X
+
+
+def test_fraud_detector_predict_batch_matches_single_predictions(trained_detector):
+    detector, X = trained_detector
+    features_list = [dict(zip(detector.feature_names, row, strict=True)) for row in X[:20]]
+    batch = detector.predict_batch(features_list)
+    single = [detector.predict(features) for features in features_list]
+    assert [p for _, p in batch] == pytest.approx([p for _, p in single], abs=1e-9)
+    assert detector.predict_batch([]) == []
+
+
+def test_compiled_engine_matches_sklearn_predict_proba(trained_detector):
+    detector, X = trained_detector
+    assert detector.engine is not None
+
+    rng = np.random.default_rng(1)
+    X_eval = np.vstack([X, rng.normal(loc=50, scale=40, size=(500, X.shape[1]))])
+    expected = detector.model.predict_proba(detector.scaler.transform(X_eval))[:, 1]
+
+    np.testing.assert_allclose(detector.engine.predict_proba(X_eval), expected, atol=1e-9)
+    single = [
+        detector.engine.predict_proba_one(dict(zip(detector.feature_names, row, strict=True)))
+        for row in X_eval[:50]
+    ]
+    np.testing.assert_allclose(single, expected[:50], atol=1e-9)
+
+
+def test_compiled_engine_matches_hist_gradient_boosting(trained_detector):
+    _, X = trained_detector
+    detector = FraudDetector()
+    y = (X[:, 0] / 100 + X[:, 4] > 100).astype(int)
+    detector.train(X, y, model=HistGradientBoostingClassifier(max_iter=50, random_state=42))
+    assert detector.engine is not None
+
+    expected = detector.model.predict_proba(detector.scaler.transform(X))[:, 1]
+    np.testing.assert_allclose(detector.engine.predict_proba(X), expected, atol=1e-9)
+
+
+def test_compiled_engine_handles_default_model():
+    detector = FraudDetector()
+    detector.model_path = "/nonexistent/fraud_detector.pkl"
+    detector.load_model()
+    features = {name: 0 for name in detector.feature_names}
+    expected = detector.model.predict_proba(detector.scaler.transform([[0] * len(features)]))[0, 1]
+    assert detector.engine.predict_proba_one(features) == pytest.approx(expected, abs=1e-9)
+
+
+def test_micro_batcher_coalesces_concurrent_predictions():
+    calls = []
+
+    def predict_batch(features_list):
+        calls.append(len(features_list))
+        return [(f["amount"] > 50, f["amount"] / 100) for f in features_list]
+
+    batcher = MicroBatcher(predict_batch, max_batch_size=16, max_wait_ms=50)
+    try:
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(lambda i: batcher.predict({"amount": i}), range(32)))
+    finally:
+        batcher.stop()
+
+    assert results == [(i > 50, i / 100) for i in range(32)]
+    assert sum(calls) == 32
+    assert len(calls) < 32
+    assert max(calls) <= 16
+
+
+def test_micro_batcher_propagates_errors_to_callers():
+    def predict_batch(features_list):
+        raise RuntimeError("model unavailable")
+
+    batcher = MicroBatcher(predict_batch, max_wait_ms=1)
+    try:
+        with pytest.raises(RuntimeError, match="model unavailable"):
+            batcher.predict({"amount": 1})
+    finally:
+        batcher.stop()
+
+
+def test_model_registry_versions_and_current_pointer(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    assert registry.current_version() is None
+
+    first = registry.save({"value": 1}, version="v1")
+    registry.save({"value": 2}, version="v2")
+    assert registry.versions() == ["v1", "v2"]
+    assert registry.current_version() == "v2"
+
+    registry.set_current(first)
+    assert registry.current_version() == "v1"
+    assert registry.load("v1") == {"value": 1}
+    with pytest.raises(FileNotFoundError):
+        registry.set_current("missing")
+
+
+def test_fraud_detector_hot_reload_swaps_version(tmp_path, trained_detector):
+    source, X = trained_detector
+    publisher = FraudDetector()
+    publisher.registry = ModelRegistry(str(tmp_path))
+    publisher._active = source._active
+    v1 = publisher.save_model(version="v1")
+
+    serving = FraudDetector()
+    serving.registry = ModelRegistry(str(tmp_path))
+    serving.load_model()
+    assert serving.version == v1
+    features = dict(zip(serving.feature_names, X[0], strict=True))
+    before = serving.predict(features)
+
+    publisher.save_model(version="v2")
+    watcher = ModelWatcher(serving, serving.registry, interval_seconds=0)
+    assert watcher.check() is True
+    assert serving.version == "v2"
+    assert serving.predict(features) == before
+    assert watcher.check() is False
+
+
+def test_model_watcher_skips_broken_version(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    registry.save({"model": None, "scaler": None, "feature_names": []}, version="broken")
+    detector = FraudDetector()
+    detector.registry = registry
+
+    watcher = ModelWatcher(detector, registry, interval_seconds=0)
+    assert watcher.check() is False
+    assert detector.version is None
+    assert watcher.check() is False
+
+
+def test_saved_engine_is_memory_mapped_and_sklearn_loads_lazily(tmp_path, trained_detector):
+    source, X = trained_detector
+    publisher = FraudDetector()
+    publisher.registry = ModelRegistry(str(tmp_path))
+    publisher._active = source._active
+    publisher.save_model(version="v1")
+
+    serving = FraudDetector()
+    serving.registry = ModelRegistry(str(tmp_path))
+    serving.load_model()
+    assert isinstance(serving.engine.threshold, np.memmap)
+    assert serving._active._model is None
+
+    features_list = [dict(zip(serving.feature_names, row, strict=True)) for row in X[:10]]
+    single = [serving.predict(features) for features in features_list]
+    assert serving._active._model is None
+    assert serving.predict_batch(features_list) == source.predict_batch(features_list)
+    assert [p for _, p in single] == pytest.approx(
+        [p for _, p in source.predict_batch(features_list)], abs=1e-9
+    )
+
+
+def test_train_from_database_publishes_loadable_version(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'train.db'}")
+    Base.metadata.create_all(bind=engine)
+    rng = np.random.default_rng(0)
+    now = utcnow()
+    with Session(engine) as db:
+        for i in range(400):
+            fraud = i % 5 == 0
+            db.add(
+                Transaction(
+                    transaction_id=f"TXN-{i}",
+                    customer_id=f"CUST-{i % 20}",
+                    amount=float(rng.uniform(20000, 50000) if fraud else rng.uniform(10, 5000)),
+                    timestamp=now,
+                    features={"new_device": fraud, "vpn_usage": False},
+                )
+            )
+            if fraud:
+                db.add(FraudAlert(transaction_id=f"TXN-{i}", status="Blocked"))
+        db.commit()
+
+    detector = FraudDetector()
+    detector.registry = ModelRegistry(str(tmp_path / "models"))
+    version = train_from_database(detector, engine=engine, chunk_size=64, max_iter=20)
+    assert isinstance(detector.model, HistGradientBoostingClassifier)
+
+    serving = FraudDetector()
+    serving.registry = detector.registry
+    serving.load_model()
+    assert serving.version == version
+    is_fraud, _ = serving.predict({"amount": 40000, "new_device": 1})
+    assert is_fraud
+    assert serving.predict({"amount": 100})[0] is False
+
+
+def test_backfill_scores_jsonl_and_csv_like_online_scoring(tmp_path, monkeypatch, trained_detector):
+    source_detector, _ = trained_detector
+    publisher = FraudDetector()
+    publisher.registry = ModelRegistry(str(tmp_path / "models"))
+    publisher._active = source_detector._active
+    version = publisher.save_model(version="v1")
+    # Forked workers load the version from the global detector's registry
+    monkeypatch.setattr(backfill_module.fraud_detector, "registry", publisher.registry)
+
+    started = datetime(2026, 10, 1, 9, 0)
+    records = [
+        {
+            "transaction_id": f"TXN-BF-{i}",
+            "customer_id": f"CUST-BF-{i % 3}",
+            "amount": 4000.0 + 200 * i,
+            "new_device": i % 2 == 0,
+            "timestamp": (started + timedelta(minutes=i)).isoformat(),
+            "location": {"lat": 19.0 + i % 4, "lon": 72.8},
+        }
+        for i in range(25)
+    ]
+    # Counted and skipped, as /fraud/analyze would reject it
+    incomplete = {"transaction_id": "TXN-BF-X", "customer_id": "CUST-BF-0"}
+    jsonl = tmp_path / "dump.jsonl"
+    jsonl.write_text("\n".join(json.dumps(r) for r in [*records, incomplete]) + "\n")
+    csv_path = tmp_path / "dump.csv"
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(records[0]))
+        writer.writeheader()
+        writer.writerows({**r, "location": json.dumps(r["location"])} for r in records)
+
+    # Online: the same stream through /fraud/analyze's scoring, history from a fresh store
+    online = FraudDetector()
+    online.registry = publisher.registry
+    online.load_model(version)
+    monkeypatch.setattr(fraud_detection, "fraud_detector", online)
+    monkeypatch.setattr(fraud_detection, "feature_store", CustomerFeatureStore())
+    monkeypatch.setattr(settings, "FEATURE_STORE_ENABLED", True)
+    monkeypatch.setattr(settings, "RISK_ENGINE_ENABLED", False)
+    monkeypatch.setattr(settings, "RING_DETECTOR_ENABLED", False)
+    monkeypatch.setattr(settings, "FRAUD_MICROBATCH_ENABLED", False)
+    expected = {
+        r["transaction_id"]: FraudDetectionService.analyze_transaction(dict(r))[1] for r in records
+    }
+    without_history = online.predict_batch([online.extract_features(r) for r in records])
+    assert [p for _, p in without_history] != pytest.approx(list(expected.values()))
+
+    for source in (jsonl, csv_path):
+        output = tmp_path / f"{source.stem}-{source.suffix[1:]}-scores.jsonl"
+        checkpoint = Checkpoint(str(tmp_path / f"{source.name}.ckpt"), str(source), 2, version)
+        sink = FileSink(str(output), version)
+        scored = backfill(str(source), sink, checkpoint, workers=2, chunk_size=4, version=version)
+        sink.close()
+        assert scored == 25
+        scores = [json.loads(line) for line in output.read_text().splitlines()]
+        assert {s["transaction_id"]: s["fraud_probability"] for s in scores} == pytest.approx(
+            expected
+        )
+        assert checkpoint.done == {0, 1}
+        assert not os.path.exists(checkpoint.parts_dir)
+    assert checkpoint.skipped == 0
+    assert json.loads((tmp_path / "dump.jsonl.ckpt").read_text())["skipped"] == 1
+
+    # Resuming with every partition done scores nothing
+    resumed = Checkpoint(str(tmp_path / "dump.jsonl.ckpt"), str(jsonl), 2, version)
+    resumed.load()
+    sink = FileSink(str(tmp_path / "resume.jsonl"), version)
+    assert backfill(str(jsonl), sink, resumed, workers=1, chunk_size=4, version=version) == 0
+    sink.close()
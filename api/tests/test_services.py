@@ -0,0 +1,861 @@
+from datetime import datetime, timedelta
+
+import networkx as nx
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.database import Base, SessionLocal, upgrade_schema
+from app.ml_models.feature_store import CustomerFeatureStore
+from app.ml_models.fraud_detector import FraudDetector
+from app.ml_models.graph_neural_network import graph_analyzer
+from app.ml_models.model_registry import ModelRegistry
+from app.ml_models.rule_engine import CompiledRuleSet
+from app.models.fraud import FraudAlert, GraphEdge, GraphNode, RiskLevelCount, RiskProfile
+from app.models.transaction import Transaction
+from app.services import fraud_detection, graph_analysis
+from app.services.alert_ids import AlertIdAllocator
+from app.services.alert_writer import AlertWriter
+from app.services.fraud_detection import FraudDetectionService
+from app.services.graph_analysis import GraphAnalysisService
+from app.services.ring_detector import StreamingRingDetector
+from app.services.risk_analysis import RISK_LEVELS, RiskAnalysisService, risk_level
+from app.services.risk_engine import IncrementalRiskEngine, risk_inputs
+from app.services.shadow_scoring import ShadowScorer
+from app.services.transaction_graph import LiveTransactionGraph
+from app.services.transaction_ingestor import TransactionIngestor
+from app.utils.batching import BatchWorker
+from app.utils.executors import PoolSaturatedError
+from app.utils.transactions import _copy_value, bulk_insert_transactions
+from app.utils.upsert import upsert_rows
+
+
+def _txn(customer_id: str, amount: float, timestamp: datetime, **extra) -> dict:
+    return {"customer_id": customer_id, "amount": amount, "timestamp": timestamp, **extra}
+
+
+def test_feature_store_tracks_velocity_and_mean_amount():
+    store = CustomerFeatureStore(velocity_window_seconds=3600)
+    start = datetime(2026, 1, 1, 12, 0)
+    for minutes, amount in [(0, 100), (10, 200), (90, 300)]:
+        store.record(_txn("C1", amount, start + timedelta(minutes=minutes)))
+
+    features = store.get_features("C1", start + timedelta(minutes=100))
+    # Only the transaction at +90m is inside the one-hour window
+    assert features["transaction_velocity"] == 1
+    assert features["avg_transaction_amount"] == pytest.approx(200)
+    assert features["account_age_days"] == 0
+    assert store.get_features("unknown", start) is None
+
+
+def test_feature_store_enrich_keeps_caller_values_and_measures_distance():
+    store = CustomerFeatureStore()
+    now = datetime(2026, 1, 1, 12, 0)
+    store.record(_txn("C1", 100, now - timedelta(days=40), location={"lat": 19.07, "lon": 72.87}))
+
+    enriched = store.enrich(
+        _txn("C1", 500, now, transaction_velocity=7, location={"lat": 28.61, "lon": 77.20})
+    )
+    assert enriched["transaction_velocity"] == 7
+    assert enriched["avg_transaction_amount"] == pytest.approx(100)
+    assert enriched["account_age_days"] == 40
+    assert enriched["distance_from_home"] == pytest.approx(1150, rel=0.05)
+    # enrich also records the transaction for the next lookup
+    assert store.get_features("C1", now)["avg_transaction_amount"] == pytest.approx(300)
+
+
+def test_feature_store_evicts_least_recently_active_customer():
+    store = CustomerFeatureStore(max_customers=2)
+    now = datetime(2026, 1, 1)
+    store.record(_txn("C1", 1, now))
+    store.record(_txn("C2", 1, now))
+    store.get_features("C1", now)
+    store.record(_txn("C3", 1, now))
+
+    assert len(store) == 2
+    assert store.get_features("C2", now) is None
+    assert store.get_features("C1", now) is not None
+    assert store.stats()["evictions"] == 1
+
+
+def test_feature_store_bootstraps_from_transactions(client):
+    now = datetime(2030, 6, 1, 12, 0)
+    db = SessionLocal()
+    try:
+        db.add_all(
+            [
+                Transaction(
+                    transaction_id=f"TXN-FS-{i}",
+                    customer_id="CUST-FS-001",
+                    amount=amount,
+                    timestamp=now - timedelta(minutes=minutes),
+                )
+                for i, (amount, minutes) in enumerate([(100, 5), (300, 30), (500, 60 * 24 * 10)])
+            ]
+        )
+        db.commit()
+
+        store = CustomerFeatureStore(velocity_window_seconds=3600)
+        store.bootstrap(db)
+    finally:
+        db.close()
+
+    features = store.get_features("CUST-FS-001", now)
+    assert features["transaction_velocity"] == 2
+    assert features["avg_transaction_amount"] == pytest.approx(300)
+    assert features["account_age_days"] == 10
+
+
+def test_shadow_scorer_writes_comparisons_in_bulk(client, tmp_path):
+    challenger = FraudDetector()
+    challenger.registry = ModelRegistry(str(tmp_path))
+    challenger.model_path = str(tmp_path / "fraud_detector.pkl")
+    challenger.load_model()
+    scorer = ShadowScorer(
+        "default", batch_size=10, flush_interval_seconds=0.05, detector=challenger
+    )
+
+    for i in range(3):
+        scorer.submit(f"TXN-SHADOW-{i}", {"amount": 100.0 * i}, "champion", 0.5, i == 2, 1.0)
+    scorer.stop()
+    assert scorer.stats()["written"] == 3
+
+    db = SessionLocal()
+    try:
+        (summary,) = ShadowScorer.summarize(db, challenger_version="default")
+    finally:
+        db.close()
+    assert summary["champion_version"] == "champion"
+    assert summary["transactions"] == 3
+    # The default model never flags, so it agrees on the two unflagged transactions
+    assert summary["agreement_rate"] == pytest.approx(2 / 3, abs=1e-4)
+    assert summary["flagged"] == {"champion": 1, "challenger": 0}
+    assert summary["latency_ms"]["challenger"] is not None
+
+
+def test_shadow_scorer_with_missing_version_stays_off(tmp_path):
+    challenger = FraudDetector()
+    challenger.registry = ModelRegistry(str(tmp_path))
+    scorer = ShadowScorer("missing", detector=challenger)
+    scorer.submit("TXN-1", {"amount": 1.0}, "champion", 0.1, False, 1.0)
+    assert not scorer.running
+    assert not scorer.enabled
+
+
+def _flagged_txn(transaction_id: str) -> dict:
+    return {
+        "transaction_id": transaction_id,
+        "customer_id": "CUST-WB-001",
+        "amount": 25000.0,
+        "merchant_id": "M-001",
+        "payment_method": "credit_card",
+    }
+
+
+def test_alert_writer_persists_batches_with_pregenerated_ids(client):
+    writer = AlertWriter(batch_size=10, flush_interval_ms=20, allocator=AlertIdAllocator())
+    alert_ids = [
+        writer.submit(_flagged_txn(f"TXN-WB-{i}"), 0.95, ["High-value transaction"])
+        for i in range(3)
+    ]
+    # A retry of an already queued transaction is written once
+    writer.submit(_flagged_txn("TXN-WB-0"), 0.95, [])
+    writer.stop()
+
+    assert len(set(alert_ids)) == 3
+    db = SessionLocal()
+    try:
+        alerts = db.query(FraudAlert).filter(FraudAlert.id.in_(alert_ids)).all()
+        assert {a.transaction_id for a in alerts} == {f"TXN-WB-{i}" for i in range(3)}
+        assert all(a.status == "Blocked" for a in alerts)
+        assert (
+            db.query(Transaction).filter(Transaction.transaction_id.like("TXN-WB-%")).count() == 3
+        )
+    finally:
+        db.close()
+    assert writer.stats()["failed"] == 0
+
+
+def test_alert_writer_shares_ids_with_sync_alerts_and_writes_rows_of_failed_batch(
+    client, monkeypatch
+):
+    monkeypatch.setattr(fraud_detection.settings, "ALERT_WRITE_BEHIND_ENABLED", True)
+    # A fresh allocator: IDs the database assigned earlier in the run are above any
+    # block the global one may still hold
+    allocator = AlertIdAllocator()
+    monkeypatch.setattr(fraud_detection, "alert_id_allocator", allocator)
+    writer = AlertWriter(batch_size=10, flush_interval_ms=60_000, allocator=allocator)
+    alert_ids = [
+        writer.submit(_flagged_txn(f"TXN-WB-SYNC-{i}"), 0.95, ["High-value transaction"])
+        for i in range(3)
+    ]
+    db = SessionLocal()
+    try:
+        # The synchronous batch path draws from the same allocator
+        sync_ids = FraudDetectionService.create_fraud_alerts(
+            [(_flagged_txn("TXN-WB-SYNC-S"), 0.95, [])], db
+        )
+        assert not set(sync_ids) & set(alert_ids)
+        # An ID taken behind the allocator's back fails only its own alert
+        db.add(FraudAlert(id=alert_ids[1], transaction_id="TXN-WB-SYNC-X", status="Blocked"))
+        db.commit()
+    finally:
+        db.close()
+    writer.stop()
+
+    assert writer.stats()["written"] == 2
+    assert writer.stats()["failed"] == 1
+    db = SessionLocal()
+    try:
+        stored = dict(
+            db.query(FraudAlert.id, FraudAlert.transaction_id).filter(
+                FraudAlert.id.in_([*alert_ids, *sync_ids])
+            )
+        )
+    finally:
+        db.close()
+    assert stored == {
+        alert_ids[0]: "TXN-WB-SYNC-0",
+        alert_ids[1]: "TXN-WB-SYNC-X",
+        alert_ids[2]: "TXN-WB-SYNC-2",
+        sync_ids[0]: "TXN-WB-SYNC-S",
+    }
+
+
+def test_sync_alerts_leave_ids_to_the_database_without_write_behind(client, monkeypatch):
+    monkeypatch.setattr(fraud_detection.settings, "ALERT_WRITE_BEHIND_ENABLED", False)
+
+    def fail():
+        raise AssertionError("the allocator is only for write-behind")
+
+    monkeypatch.setattr(fraud_detection.alert_id_allocator, "next_id", fail)
+    db = SessionLocal()
+    try:
+        alert_ids = FraudDetectionService.create_fraud_alerts(
+            [(_flagged_txn(f"TXN-SYNC-DBID-{i}"), 0.95, []) for i in range(2)], db
+        )
+    finally:
+        db.close()
+    assert len(set(alert_ids)) == 2
+    assert all(isinstance(alert_id, int) for alert_id in alert_ids)
+
+
+def test_alert_writer_rejects_when_queue_is_full(client):
+    writer = AlertWriter(max_queue=1, put_timeout_seconds=0.01, allocator=AlertIdAllocator())
+    writer.start = lambda: None  # nothing drains the queue
+    writer.submit(_flagged_txn("TXN-WB-FULL-1"), 0.9, [])
+    with pytest.raises(PoolSaturatedError):
+        writer.submit(_flagged_txn("TXN-WB-FULL-2"), 0.9, [])
+    assert writer.stats()["rejected"] == 1
+
+
+def test_transaction_ingestor_rejects_when_queue_is_full(client):
+    ingestor = TransactionIngestor(max_queue=1, put_timeout_seconds=0.01)
+    ingestor.start = lambda: None  # nothing drains the queue
+    ingestor.record(_flagged_txn("TXN-INGEST-FULL-1"), 0.1)
+    with pytest.raises(PoolSaturatedError):
+        ingestor.record(_flagged_txn("TXN-INGEST-FULL-2"), 0.1)
+    assert ingestor.stats()["rejected"] == 1
+
+
+def test_transaction_ingestor_reserves_room_for_a_whole_batch(client):
+    ingestor = TransactionIngestor(max_queue=2, put_timeout_seconds=0.01)
+    ingestor.start = lambda: None  # nothing drains the queue
+    reserved = ingestor.reserve(2)
+    # Reserved room is taken even before anything is enqueued
+    with pytest.raises(PoolSaturatedError):
+        ingestor.reserve(2)
+    assert ingestor.stats()["queued"] == 0
+
+    ingestor.record_many([(_flagged_txn("TXN-INGEST-RESERVED"), 0.1, [])], reserved)
+    assert ingestor.stats()["queued"] == 1
+    # The unused reserved slot was handed back
+    ingestor.record(_flagged_txn("TXN-INGEST-AFTER"), 0.1)
+    with pytest.raises(PoolSaturatedError):
+        ingestor.record(_flagged_txn("TXN-INGEST-OVER"), 0.1)
+    assert ingestor.stats()["rejected"] == 3
+
+
+class _FailingWorker(BatchWorker):
+    def __init__(self):
+        super().__init__(max_queue=10, batch_size=1, max_wait_ms=1)
+        self.flushed = []
+
+    def _flush(self, batch: list):
+        if batch == ["bad"]:
+            raise RuntimeError("boom")
+        self.flushed.extend(batch)
+
+
+def test_batch_worker_survives_a_failing_flush():
+    worker = _FailingWorker()
+    worker.start()
+    for item in ("bad", "good", "bad", "also good"):
+        assert worker._put(item, timeout=1)
+    worker.stop()
+
+    assert worker.flushed == ["good", "also good"]
+    stats = worker.queue_stats()
+    assert stats["flush_errors"] == 2
+    assert stats["queued"] == 0
+
+
+def test_transaction_ingestor_records_in_bulk_and_skips_duplicates(client):
+    ingestor = TransactionIngestor(batch_size=100, flush_interval_ms=20)
+    for i in range(250):
+        ingestor.record(_flagged_txn(f"TXN-INGEST-{i}"), 0.05)
+    ingestor.record(_flagged_txn("TXN-INGEST-0"), 0.05)
+    ingestor.stop()
+
+    stats = ingestor.stats()
+    assert stats["inserted"] == 250
+    assert stats["failed"] == 0
+    db = SessionLocal()
+    try:
+        assert bulk_insert_transactions(db.connection(), [_flagged_txn("TXN-INGEST-1")]) == 0
+        db.rollback()
+        stored = db.query(Transaction).filter(Transaction.transaction_id == "TXN-INGEST-7").one()
+        assert stored.fraud_probability == pytest.approx(0.05)
+        assert stored.timestamp is not None
+    finally:
+        db.close()
+
+
+def test_copy_value_escapes_postgres_text_format():
+    assert _copy_value("status", None) == "\\N"
+    assert _copy_value("merchant_id", "a\tb\\c") == "a\\tb\\\\c"
+    assert _copy_value("location", {"city": "x\ny"}) == '{"city": "x\\\\ny"}'
+    assert _copy_value("timestamp", datetime(2026, 1, 1, 12, 0)) == "2026-01-01T12:00:00"
+
+
+def test_block_rules_decide_before_model_inference(monkeypatch):
+    rules = CompiledRuleSet(
+        [
+            {"name": "Huge amount", "when": {"feature": "amount", "op": ">", "value": 1e6}},
+            {
+                "name": "Brute force",
+                "when": {"feature": "failed_login_attempts", "op": ">=", "value": 10},
+                "action": "block",
+            },
+        ]
+    )
+    monkeypatch.setattr(fraud_detection, "fraud_rules", rules)
+    scored = []
+    real_predict_batch = fraud_detection.fraud_detector.predict_batch
+
+    def predict_batch(features_list):
+        scored.extend(features_list)
+        return real_predict_batch(features_list)
+
+    monkeypatch.setattr(fraud_detection.fraud_detector, "predict_batch", predict_batch)
+    transactions = [
+        {"transaction_id": "RB-1", "customer_id": "C1", "amount": 50, "failed_login_attempts": 12},
+        {"transaction_id": "RB-2", "customer_id": "C2", "amount": 2e6},
+    ]
+    results = FraudDetectionService.analyze_transactions(transactions)
+
+    assert results[0] == (True, 1.0, ["Brute force"])
+    assert results[1][2] == ["Huge amount"]
+    assert [f["amount"] for f in scored] == [2e6]
+    assert FraudDetectionService.analyze_transaction(transactions[0]) == (
+        True,
+        1.0,
+        ["Brute force"],
+    )
+
+
+def test_bulk_risk_rescore_matches_per_customer_service(client):
+    records = [
+        {"failed_logins": 5, "new_device": True, "account_age": "10 days"},
+        {"transaction_velocity": 4, "chargeback_history": 2, "account_age": 400.0},
+        {"vpn_usage": True, "location_change": False, "high_value_transaction": True},
+        {"account_age": None},
+        {},
+    ]
+    db = SessionLocal()
+    try:
+        expected = []
+        for i, record in enumerate(records):
+            profile = RiskAnalysisService.calculate_customer_risk(
+                {"customer_id": f"RISK-ROW-{i}", **record}, db
+            )
+            expected.append((profile.risk_score, profile.risk_factors, profile.status))
+
+        bulk = [
+            {"customer_id": f"RISK-BULK-{i}", "customer_name": "Bulk", **record}
+            for i, record in enumerate(records)
+        ]
+        assert RiskAnalysisService.rescore_customers(bulk, db.connection()) == len(records)
+        db.commit()
+        # Rescoring updates in place and keeps the name given on insert
+        bulk[0] = {"customer_id": "RISK-BULK-0", "customer_name": "Renamed", "failed_logins": 0}
+        RiskAnalysisService.rescore_customers(bulk[:1], db.connection())
+        db.commit()
+
+        profiles = {
+            p.customer_id: p
+            for p in db.query(RiskProfile).filter(RiskProfile.customer_id.like("RISK-BULK-%"))
+        }
+        assert len(profiles) == len(records)
+        for i in range(1, len(records)):
+            profile = profiles[f"RISK-BULK-{i}"]
+            assert (profile.risk_score, profile.risk_factors, profile.status) == expected[i]
+        first = profiles["RISK-BULK-0"]
+        assert first.customer_name == "Bulk"
+        assert first.risk_factors == []
+        assert (
+            first.risk_score
+            == RiskAnalysisService.calculate_customer_risk(
+                {"customer_id": "RISK-ROW-X", "failed_logins": 0}, db
+            ).risk_score
+        )
+    finally:
+        db.close()
+
+
+def test_risk_distribution_counters_follow_upserts(client):
+    db = SessionLocal()
+    try:
+        RiskAnalysisService.rebuild_risk_level_counts(db)
+        before = RiskAnalysisService.get_risk_distribution(db)
+
+        # New customers, a level change in place, a batch and a bulk rescore
+        low = RiskAnalysisService.calculate_customer_risk(
+            {"customer_id": "LEVEL-1", "account_age": 2000}, db
+        )
+        assert risk_level(low.risk_score) == "low"
+        high = RiskAnalysisService.calculate_customer_risk(
+            {"customer_id": "LEVEL-1", "failed_logins": 5, "chargeback_history": 1}, db
+        )
+        assert risk_level(high.risk_score) in ("high", "critical")
+        RiskAnalysisService.upsert_customer_risks(
+            [{"customer_id": f"LEVEL-{i}", "vpn_usage": i % 2 == 0} for i in range(2, 6)], db
+        )
+        RiskAnalysisService.rescore_customers(
+            [{"customer_id": "LEVEL-2", "account_age": 5000}], db.connection()
+        )
+        db.commit()
+
+        after = RiskAnalysisService.get_risk_distribution(db)
+        assert sum(after.values()) == sum(before.values()) + 5
+        assert after == RiskAnalysisService.rebuild_risk_level_counts(db)
+    finally:
+        db.close()
+
+
+def test_risk_level_counts_are_seeded_once_from_stored_profiles(client):
+    db = SessionLocal()
+    try:
+        RiskAnalysisService.calculate_customer_risk({"customer_id": "SEED-1"}, db)
+        db.query(RiskLevelCount).delete()
+        connection = db.connection()
+        assert RiskAnalysisService.seed_risk_level_counts(connection) == set(RISK_LEVELS)
+        assert RiskAnalysisService.seed_risk_level_counts(connection) == set()
+        db.commit()
+        seeded = RiskAnalysisService.get_risk_distribution(db)
+        assert seeded == RiskAnalysisService.rebuild_risk_level_counts(db)
+    finally:
+        db.close()
+
+
+def test_merge_over_a_profile_created_after_the_lookup(client, monkeypatch):
+    db = SessionLocal()
+    try:
+        RiskAnalysisService.rebuild_risk_level_counts(db)
+        # Another writer creates the profile between this merge's lookup and its insert
+        RiskAnalysisService.calculate_customer_risk(
+            {"customer_id": "RACE-1", "failed_logins": 5, "chargeback_history": 1}, db
+        )
+        lock_profiles = RiskAnalysisService._lock_profiles
+        lookups = []
+
+        def lookup_before_the_other_writer(connection, customer_ids, *columns):
+            lookups.append(list(customer_ids))
+            return {} if len(lookups) == 1 else lock_profiles(connection, customer_ids, *columns)
+
+        monkeypatch.setattr(RiskAnalysisService, "_lock_profiles", lookup_before_the_other_writer)
+        (row,) = RiskAnalysisService.merge_risk_inputs(
+            db.connection(), [{"customer_id": "RACE-1", "risk_inputs": {"vpn_usage": True}}]
+        )
+        db.commit()
+        monkeypatch.undo()
+
+        assert lookups == [["RACE-1"], ["RACE-1"]]
+        assert row["risk_inputs"] == {
+            "failed_logins": 5,
+            "chargeback_history": 1,
+            "vpn_usage": True,
+        }
+        stored = db.query(RiskProfile).filter(RiskProfile.customer_id == "RACE-1").one()
+        assert stored.risk_score == row["risk_score"]
+        # The customer moved from its stored level rather than being counted twice
+        counts = RiskAnalysisService.get_risk_distribution(db)
+        assert counts == RiskAnalysisService.rebuild_risk_level_counts(db)
+    finally:
+        db.close()
+
+
+def test_incremental_risk_engine_rescores_on_changed_terms_and_writes_in_bulk(client):
+    engine = IncrementalRiskEngine(flush_interval_ms=60_000, session_factory=SessionLocal)
+    events = [
+        {"customer_id": "LIVE-1", "customer_name": "Live", "account_age": 20},
+        {"customer_id": "LIVE-1", "new_device": True},
+        {"customer_id": "LIVE-1", "transaction_velocity": 2},
+        # Velocity adds its weight in tenths up to the rule threshold
+        {"customer_id": "LIVE-1", "transaction_velocity": 3},
+        {"customer_id": "LIVE-1", "transaction_velocity": 3},
+        {"customer_id": "LIVE-1", "transaction_velocity": 12, "new_device": False},
+        {"customer_id": "LIVE-2", "failed_logins": 5, "vpn_usage": True},
+    ]
+    db = SessionLocal()
+    try:
+        latest: dict[str, dict] = {}
+        results = []
+        for event in events:
+            latest.setdefault(event["customer_id"], {}).update(event)
+            results.append(engine.observe(event))
+        # Before the stored inputs are loaded every changed input is queued
+        assert results[4] is None
+        assert None not in results[:4] + results[5:]
+        # Only the repeated event changed neither a score term nor a rule input
+        assert engine.stats()["rescored"] == len(events) - 1
+
+        # Queued until the flush; stop() writes the latest profile of each customer
+        live = RiskProfile.customer_id.like("LIVE-%")
+        assert db.query(RiskProfile).filter(live).count() == 0
+        engine.stop()
+        stored = {profile.customer_id: profile for profile in db.query(RiskProfile).filter(live)}
+        for customer_id, inputs in latest.items():
+            expected = RiskAnalysisService.calculate_customer_risk(
+                {**inputs, "customer_id": f"REF-{customer_id}"}, db
+            )
+            profile = stored[customer_id]
+            assert (profile.risk_score, profile.risk_factors, profile.status) == (
+                expected.risk_score,
+                expected.risk_factors,
+                expected.status,
+            )
+        assert stored["LIVE-1"].customer_name == "Live"
+        assert engine.stats()["batches"] == 1
+        assert engine.stats()["written"] == 2
+
+        # Loaded now: capped velocity still above the rule threshold leaves it unchanged
+        assert engine.observe({"customer_id": "LIVE-1", "transaction_velocity": 11}) is None
+        engine.stop()
+    finally:
+        db.close()
+
+
+def test_incremental_risk_engine_merges_partial_events_into_stored_profiles(client):
+    seed = {
+        "customer_id": "MERGE-1",
+        "failed_logins": 5,
+        "new_device": True,
+        "chargeback_history": 1,
+        "account_age": 400,
+    }
+    db = SessionLocal()
+    try:
+        # Written outside the engine, e.g. by a bulk rescore or before a restart
+        seeded = RiskAnalysisService.calculate_customer_risk(seed, db)
+        assert len(seeded.risk_factors) == 3
+
+        engine = IncrementalRiskEngine(flush_interval_ms=60_000, session_factory=SessionLocal)
+        assert engine.observe({"customer_id": "MERGE-1", "vpn_usage": True}) is not None
+        engine.stop()
+
+        expected = RiskAnalysisService.calculate_customer_risk(
+            {**seed, "vpn_usage": True, "customer_id": "REF-MERGE-1"}, db
+        )
+        stored = (
+            db.query(RiskProfile)
+            .filter(RiskProfile.customer_id == "MERGE-1")
+            .populate_existing()
+            .one()
+        )
+        assert (stored.risk_score, stored.risk_factors, stored.status) == (
+            expected.risk_score,
+            expected.risk_factors,
+            expected.status,
+        )
+        assert stored.risk_score > seeded.risk_score
+        inputs = {name: value for name, value in seed.items() if name != "customer_id"}
+        assert stored.risk_inputs == {**inputs, "vpn_usage": True}
+        # The stored inputs are loaded into the state after the write
+        assert engine.observe({"customer_id": "MERGE-1", "vpn_usage": True}) is None
+        engine.stop()
+    finally:
+        db.close()
+
+
+def test_incremental_risk_engine_requeues_a_dropped_update(client):
+    engine = IncrementalRiskEngine(max_queue=1, session_factory=SessionLocal)
+    engine.start = lambda: True  # nothing drains the queue
+    assert engine.observe({"customer_id": "DROP-1", "vpn_usage": True}) is not None
+    event = {"customer_id": "DROP-2", "vpn_usage": True}
+    engine.observe(event)
+    assert engine.stats()["dropped"] == 1
+    # The same event again: not written yet, so it is queued (and dropped) again
+    engine.observe(event)
+    assert engine.stats()["dropped"] == 2
+
+
+def test_risk_inputs_from_transaction_payload():
+    sent = {
+        "customer_id": "C1",
+        "amount": 25_000,
+        "failed_login_attempts": 4,
+        "account_age_days": 12,
+        "new_device": True,
+        "merchant_id": "M1",
+    }
+    event = risk_inputs(sent)
+    assert event == {
+        "customer_id": "C1",
+        "customer_name": None,
+        "failed_logins": 4,
+        "account_age": 12,
+        "new_device": True,
+        "high_value_transaction": True,
+    }
+
+    # From the enriched payload only the velocity; the store's account age is when it
+    # first saw the customer
+    sent = {"customer_id": "C1", "amount": 500}
+    enriched = {**sent, "transaction_velocity": 3, "account_age_days": 0}
+    event = risk_inputs(sent, enriched)
+    assert event == {"customer_id": "C1", "customer_name": None, "transaction_velocity": 3}
+
+
+def test_risk_profile_semantics_from_transactions(client):
+    engine = IncrementalRiskEngine(flush_interval_ms=60_000, session_factory=SessionLocal)
+    sent = [
+        {"customer_id": "SEM-1", "amount": 25_000},
+        # A small purchase after a high-value one keeps the flag
+        {"customer_id": "SEM-1", "amount": 40},
+    ]
+    for velocity, txn in enumerate(sent, start=1):
+        enriched = {**txn, "transaction_velocity": velocity, "account_age_days": 0}
+        engine.observe(risk_inputs(txn, enriched))
+    engine.stop()
+    db = SessionLocal()
+    try:
+        profile = db.query(RiskProfile).filter_by(customer_id="SEM-1").one()
+        assert profile.risk_inputs == {"transaction_velocity": 2, "high_value_transaction": True}
+        # Two transactions in the window add a fifth of the velocity weight, and an
+        # account age the caller never sent does not make the account new
+        assert profile.risk_score == 50 + 4 + 15
+        assert profile.risk_factors == ["High-value purchases"]
+        expected = RiskAnalysisService.calculate_customer_risk(
+            {"customer_id": "REF-SEM-1", **profile.risk_inputs}, db
+        )
+        assert (expected.risk_score, expected.risk_factors) == (
+            profile.risk_score,
+            profile.risk_factors,
+        )
+    finally:
+        db.close()
+
+
+def test_store_graph_upserts_nodes_and_skips_stored_edges(client):
+    G = nx.Graph()
+    G.add_node("STORE-C1", node_type="customer")
+    G.add_node("STORE-CARD", node_type="card")
+    G.add_node("STORE-C2", node_type="customer")
+    G.add_edge("STORE-C1", "STORE-CARD", weight=250.0)
+    G.add_edge("STORE-C2", "STORE-CARD", weight=75.0)
+    db = SessionLocal()
+    try:
+        GraphAnalysisService._store_graph(G, {"STORE-CARD": 0.1}, db)
+        # Stored again with a higher risk and one more edge
+        G.add_edge("STORE-C1", "STORE-C2")
+        GraphAnalysisService._store_graph(G, {"STORE-CARD": 0.85}, db)
+
+        nodes = {
+            node.node_id: node
+            for node in db.query(GraphNode).filter(GraphNode.node_id.like("STORE-%"))
+        }
+        assert len(nodes) == 3
+        card = nodes["STORE-CARD"]
+        assert (card.group, card.size, card.label) == ("Detected", 30, "card_STORE-CARD")
+        assert card.meta_data == {"node_type": "card", "risk_score": 0.85}
+        edges = db.query(GraphEdge).filter(GraphEdge.from_node.like("STORE-%")).all()
+        assert sorted((*sorted((e.from_node, e.to_node)), e.weight) for e in edges) == [
+            ("STORE-C1", "STORE-C2", 1.0),
+            ("STORE-C1", "STORE-CARD", 250.0),
+            ("STORE-C2", "STORE-CARD", 75.0),
+        ]
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("dialect", ["sqlite", "generic"])
+def test_upsert_rows_updates_only_the_given_columns(client, monkeypatch, dialect):
+    db = SessionLocal()
+    try:
+        connection = db.connection()
+        if dialect == "generic":
+            # Databases without ON CONFLICT take the lookup, INSERT and UPDATE path
+            monkeypatch.setattr(connection.dialect, "name", "generic")
+        prefix = f"UPSERT-{dialect}"
+        columns = ("group", "size")
+        first = [
+            {"node_id": f"{prefix}-{i}", "label": "first", "group": "Safe", "size": 10}
+            for i in range(2)
+        ]
+        assert upsert_rows(connection, GraphNode, "node_id", columns, first) == 2
+        again = [
+            {"node_id": f"{prefix}-1", "label": "second", "group": "Suspicious", "size": 12},
+            {"node_id": f"{prefix}-1", "label": "second", "group": "Detected", "size": 30},
+            {"node_id": f"{prefix}-2", "label": "second", "group": "Safe", "size": 10},
+        ]
+        assert upsert_rows(connection, GraphNode, "node_id", columns, again) == 2
+        db.commit()
+
+        rows = db.query(GraphNode.node_id, GraphNode.label, GraphNode.group, GraphNode.size)
+        assert sorted(rows.filter(GraphNode.node_id.like(f"{prefix}-%"))) == [
+            (f"{prefix}-0", "first", "Safe", 10),
+            (f"{prefix}-1", "first", "Detected", 30),
+            (f"{prefix}-2", "second", "Safe", 10),
+        ]
+    finally:
+        db.close()
+
+
+def test_live_graph_reanalyses_only_components_with_new_edges(client, monkeypatch):
+    graph = LiveTransactionGraph()
+    monkeypatch.setattr(graph_analysis, "live_graph", graph)
+    now = datetime(2024, 1, 1)
+    ring = [
+        _txn(f"LIVE-C{i}", 100.0, now, card_id="LIVE-CARD", ip_address=f"LIVE-IP{i % 2}")
+        for i in range(4)
+    ]
+    db = SessionLocal()
+    try:
+        first = GraphAnalysisService.analyze_transaction_patterns(ring, db)
+        assert graph.hydrated
+        assert first["analyzed_nodes"] == 7
+        # Repeating a transaction adds no edge, so nothing is re-analysed
+        repeat = GraphAnalysisService.analyze_transaction_patterns(ring[:1], db)
+        assert repeat["analyzed_nodes"] == 0
+        # A customer on its own card and IP only analyses its new component
+        single = _txn("LIVE-C9", 5.0, now, card_id="LIVE-CARD9", ip_address="LIVE-IP9")
+        second = GraphAnalysisService.analyze_transaction_patterns([single], db)
+        assert second["analyzed_nodes"] == 3
+        assert second["total_nodes"] == first["total_nodes"] + 3
+
+        # Risks are normalized as a full analysis of the whole graph would be
+        full = graph_analyzer.calculate_node_risks(graph.graph)
+        stored = {
+            node.node_id: node.meta_data["risk_score"]
+            for node in db.query(GraphNode).filter(GraphNode.node_id.like("LIVE-%9"))
+        }
+        assert len(stored) == 3
+        assert stored == pytest.approx({node: full[node] for node in stored})
+
+        # A fresh graph hydrates the same nodes and edges from the database
+        hydrated = LiveTransactionGraph()
+        hydrated.hydrate(db)
+        live_nodes = [node for node in graph.graph if node.startswith("LIVE-")]
+        assert set(map(frozenset, hydrated.graph.subgraph(live_nodes).edges)) == set(
+            map(frozenset, graph.graph.subgraph(live_nodes).edges)
+        )
+    finally:
+        db.close()
+
+
+def test_live_graph_takes_transactions_only_after_they_are_stored(client, monkeypatch):
+    graph = LiveTransactionGraph()
+    monkeypatch.setattr(graph_analysis, "live_graph", graph)
+    now = datetime(2024, 1, 1)
+    txn = _txn("FAIL-C1", 80.0, now, card_id="FAIL-CARD", ip_address="FAIL-IP")
+    store_graph = GraphAnalysisService._store_graph
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("database unavailable")
+
+    db = SessionLocal()
+    try:
+        monkeypatch.setattr(GraphAnalysisService, "_store_graph", fail)
+        with pytest.raises(RuntimeError):
+            GraphAnalysisService.analyze_transaction_patterns([txn], db)
+        db.rollback()
+        assert "FAIL-C1" not in graph.graph
+        assert graph.stats()["transactions"] == 0
+
+        # Still new on the next attempt, so its edges are analysed and stored then
+        monkeypatch.setattr(GraphAnalysisService, "_store_graph", store_graph)
+        result = GraphAnalysisService.analyze_transaction_patterns([txn], db)
+        assert result["analyzed_nodes"] == 3
+        assert graph.graph.has_edge("FAIL-C1", "FAIL-CARD")
+        stored = db.query(GraphEdge).filter(GraphEdge.from_node == "FAIL-C1").count()
+        assert stored == 2
+    finally:
+        db.close()
+
+
+def test_ring_detector_merges_shared_identifiers_and_applies_thresholds():
+    detector = StreamingRingDetector(min_customers=3, max_customers=4)
+    assert not detector.observe({"customer_id": "R1", "card_id": "K1", "ip_address": "I1"})
+    assert not detector.observe({"customer_id": "R2", "card_id": "K1", "device_id": "D1"})
+    assert detector.ring("R1") is None
+    # A third customer on the shared device: 3 customers over 3 identifiers
+    assert detector.observe({"customer_id": "R3", "device_id": "D1"})
+    ring = detector.ring("R1")
+    assert sorted(ring["customers"]) == ["R1", "R2", "R3"]
+    assert (ring["size"], ring["cards"], ring["ips"], ring["devices"]) == (
+        6,
+        ["K1"],
+        ["I1"],
+        ["D1"],
+    )
+    assert detector.rings() == [ring]
+
+    # Each customer on its own identifiers stays out of rings
+    for i in range(3):
+        detector.observe({"customer_id": f"S{i}", "card_id": f"SK{i}", "ip_address": f"SI{i}"})
+    assert detector.ring("S0") is None
+    # Too many identifiers per customer, then too many customers
+    assert not detector.observe({"customer_id": "R3", "ip_address": "I2", "device_id": "D2"})
+    assert detector.observe({"customer_id": "R4", "card_id": "K1"})
+    assert not detector.observe({"customer_id": "R5", "card_id": "K1"})
+    assert detector.rings() == []
+    stats = detector.stats()
+    assert (stats["flagged"], stats["rings"], stats["components"]) == (2, 0, 4)
+
+
+def test_ring_detector_starts_over_past_max_nodes():
+    detector = StreamingRingDetector(max_nodes=4)
+    detector.observe({"customer_id": "A", "card_id": "K", "ip_address": "I"})
+    detector.observe({"customer_id": "B", "card_id": "K"})
+    assert len(detector) == 4
+    detector.observe({"customer_id": "C", "card_id": "K"})
+    assert (len(detector), detector.stats()["resets"]) == (2, 1)
+
+
+def test_upgrade_schema_adds_missing_columns_and_indexes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        # risk_profiles as created before risk_inputs and the keyset indexes existed
+        connection.execute(
+            text(
+                "CREATE TABLE risk_profiles (id INTEGER PRIMARY KEY, customer_id VARCHAR UNIQUE, "
+                "customer_name VARCHAR, risk_score FLOAT, risk_level VARCHAR, "
+                "risk_factors JSON, status VARCHAR, account_age VARCHAR, "
+                "last_activity DATETIME, created_at DATETIME, updated_at DATETIME)"
+            )
+        )
+        connection.execute(
+            text("INSERT INTO risk_profiles (customer_id, risk_score) VALUES ('C-OLD', 40)")
+        )
+    Base.metadata.create_all(bind=engine)
+
+    added = upgrade_schema(engine)
+    assert "risk_profiles.risk_inputs" in added
+    assert "ix_risk_profiles_risk_score_id" in added
+    assert upgrade_schema(engine) == []
+    with engine.connect() as connection:
+        row = connection.execute(
+            text("SELECT risk_score, risk_inputs FROM risk_profiles WHERE customer_id = 'C-OLD'")
+        ).one()
+    assert tuple(row) == (40, None)
+    engine.dispose()
@@ -0,0 +1,54 @@
+import argparse
+
+from app.ml_models.fraud_detector import fraud_detector
+from app.ml_models.training import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_POSITIVE_STATUSES,
+    train_from_database,
+)
+from app.utils.logger import logger
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Train the fraud model from the transactions table and publish a new version"
+    )
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--limit", type=int, default=None, help="Only read the first N rows")
+    parser.add_argument(
+        "--positive-status",
+        action="append",
+        dest="positive_statuses",
+        help=f"Alert status counted as fraud (repeatable, default {DEFAULT_POSITIVE_STATUSES[0]})",
+    )
+    parser.add_argument(
+        "--no-replay",
+        action="store_true",
+        help="Use stored feature values only, without rebuilding history features",
+    )
+    parser.add_argument("--max-iter", type=int, default=300)
+    parser.add_argument("--learning-rate", type=float, default=0.1)
+    parser.add_argument("--max-leaf-nodes", type=int, default=31)
+    parser.add_argument(
+        "--no-activate",
+        action="store_true",
+        help="Publish the version without pointing CURRENT at it",
+    )
+    args = parser.parse_args()
+
+    version = train_from_database(
+        fraud_detector,
+        chunk_size=args.chunk_size,
+        positive_statuses=tuple(args.positive_statuses or DEFAULT_POSITIVE_STATUSES),
+        limit=args.limit,
+        replay_features=not args.no_replay,
+        max_iter=args.max_iter,
+        learning_rate=args.learning_rate,
+        max_leaf_nodes=args.max_leaf_nodes,
+        activate=not args.no_activate,
+    )
+    logger.info(f"Published model version {version}")
+
+
+if __name__ == "__main__":
+    main()